@@ -0,0 +1,456 @@
+"""Rendering-benchmarks, run with `py benchmark.py`.
+
+Every benchmark renders the same scenes: the seeded world from `variables.py`,
+stepped for a fixed number of ticks, seen at a few fixed zooms.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pygame
+from pygame import Color
+from pygame._sdl2.video import Window
+from pygame.math import Vector2 as Vec2
+
+from camera import Camera
+from domain import DomainDecomposition
+from interest import ClientInterest
+from netcode import (
+    ENTITY_DTYPE,
+    FRAME_HEADER,
+    POSITION_SCALE,
+    SNAPSHOT_HEADER,
+    decode_delta,
+    encode_delta,
+)
+from render_backend import RenderBackend, Sdl2RendererBackend, create_backend
+import variables
+from universe import Asteroid, Planet, Universe
+
+SEED = 0
+BENCHMARK_DT = 1 / 60
+SCENE_ZOOMS = [1.0, 0.3, 0.05]
+# Regions along x and y, compared when benchmarking domain decomposition
+DOMAIN_GRIDS = [(1, 1), (2, 1), (2, 2), (4, 2)]
+# Entities in the world, compared when benchmarking interest management
+INTEREST_ENTITY_COUNTS = [1_000, 3_000, 10_000, 30_000]
+# Steps it takes clients to acknowledge a snapshot when benchmarking interest
+# management, like over a network with a round trip of about 50 ms
+INTEREST_ACK_LAG = 3
+# Saved by the snapshot-benchmark, start from it with `SNAPSHOT_PATH` in variables.py
+SNAPSHOT_FILE = "benchmark.snapshot"
+
+
+def build_universe(ticks: int) -> Universe:
+    """Build the world from `variables.py` and step it.
+
+    Needs a display-mode to be set, to load the backgrounds.
+
+    Args:
+    ----
+        ticks (int): Number of steps to run before benchmarking
+
+    Returns:
+    -------
+        Universe: The stepped universe
+
+    """
+    universe = variables.build_universe(SEED)
+    for _ in range(ticks):
+        universe.step(BENCHMARK_DT)
+    return universe
+
+
+def render_scenes(
+    universe: Universe,
+    screen: pygame.Surface,
+    backend: RenderBackend,
+    frames: int,
+) -> float:
+    """Render every scene `frames` times, and measure the time it took.
+
+    Args:
+    ----
+        universe (Universe): Universe to render
+        screen (pygame.Surface): Surface holding the whole frame
+        backend (RenderBackend): Backend to render with
+        frames (int): Number of frames per scene
+
+    Returns:
+    -------
+        float: Average time per frame, in milliseconds
+
+    """
+    center = universe.player_ships[0].pos
+    start = time.perf_counter()
+    for zoom in SCENE_ZOOMS:
+        camera = Camera(center, zoom, screen, backend=backend)
+        for _ in range(frames):
+            camera.start_drawing_new_frame()
+            universe.draw_background(camera)
+            universe.draw_grid(camera)
+            universe.draw(camera)
+            backend.present(screen, [])
+    return (time.perf_counter() - start) * 1000 / (frames * len(SCENE_ZOOMS))
+
+
+def benchmark_backends(frames: int, ticks: int) -> None:
+    """Compare all render backends on the same scenes.
+
+    Args:
+    ----
+        frames (int): Number of frames per scene
+        ticks (int): Number of steps to run before benchmarking
+
+    """
+    screen_size = (1600, 900)
+    screen = pygame.display.set_mode(screen_size)
+    universe = build_universe(ticks)
+
+    for name in ["gfxdraw", "draw"]:
+        ms = render_scenes(universe, screen, create_backend(name), frames)
+        print(f"{name:>8}: {ms:7.2f} ms/frame")
+
+    window = Window("Benchmark", screen_size)
+    offscreen = pygame.Surface(screen_size)
+    backend = Sdl2RendererBackend(window, offscreen)
+    ms = render_scenes(universe, offscreen, backend, frames)
+    print(f"{'sdl2':>8}: {ms:7.2f} ms/frame")
+    window.destroy()
+
+
+def render_split_screen(
+    universe: Universe,
+    screen: pygame.Surface,
+    viewport_count: int,
+    frames: int,
+    pool: ThreadPoolExecutor | None,
+) -> float:
+    """Render side-by-side viewports, one after another or on a thread pool.
+
+    Args:
+    ----
+        universe (Universe): Universe to render
+        screen (pygame.Surface): Surface holding the whole frame
+        viewport_count (int): Number of side-by-side viewports
+        frames (int): Number of frames per scene
+        pool (ThreadPoolExecutor | None): Pool to render viewports on,
+            None renders them one after another
+
+    Returns:
+    -------
+        float: Average time per frame, in milliseconds
+
+    """
+    width, height = screen.get_size()
+    viewport_width = width // viewport_count
+    subsurfaces = [
+        screen.subsurface((ix * viewport_width, 0), (viewport_width, height))
+        for ix in range(viewport_count)
+    ]
+    # Built up front, so the viewports' threads only ever read it
+    universe.get_spatial_index()
+
+    def render_viewport(camera: Camera) -> None:
+        camera.start_drawing_new_frame()
+        universe.draw_background(camera)
+        universe.draw_grid(camera)
+        universe.draw(camera)
+
+    center = universe.player_ships[0].pos
+    start = time.perf_counter()
+    for zoom in SCENE_ZOOMS:
+        cameras = [Camera(center, zoom, subsurface) for subsurface in subsurfaces]
+        for _ in range(frames):
+            if pool is None:
+                for camera in cameras:
+                    render_viewport(camera)
+            else:
+                for future in [pool.submit(render_viewport, c) for c in cameras]:
+                    future.result()
+            pygame.display.flip()
+    return (time.perf_counter() - start) * 1000 / (frames * len(SCENE_ZOOMS))
+
+
+def benchmark_threads(frames: int, ticks: int) -> None:
+    """Compare rendering split-screen viewports sequentially and in parallel.
+
+    Args:
+    ----
+        frames (int): Number of frames per scene
+        ticks (int): Number of steps to run before benchmarking
+
+    """
+    screen = pygame.display.set_mode((1600, 900))
+    universe = build_universe(ticks)
+
+    for viewport_count in [2, 4]:
+        sequential_ms = render_split_screen(
+            universe, screen, viewport_count, frames, None,
+        )
+        with ThreadPoolExecutor(viewport_count) as pool:
+            parallel_ms = render_split_screen(
+                universe, screen, viewport_count, frames, pool,
+            )
+        print(
+            f"{viewport_count} viewports: {sequential_ms:7.2f} ms/frame sequential,"
+            f" {parallel_ms:7.2f} ms/frame parallel,"
+            f" {sequential_ms / parallel_ms:.2f}x speedup",
+        )
+
+
+def benchmark_domains(steps: int, body_count: int) -> None:
+    """Compare stepping a huge asteroid field on different numbers of regions.
+
+    Args:
+    ----
+        steps (int): Number of steps per grid of regions
+        body_count (int): Number of asteroids
+
+    """
+    world_size = Vec2(200_000, 200_000)
+    random.seed(SEED)
+    planets = [
+        Planet(
+            Vec2(random.uniform(0, world_size.x), random.uniform(0, world_size.y)),
+            1,
+            random.uniform(500, 5_000),
+            Color("blue"),
+            Color("white"),
+        )
+        for _ in range(100)
+    ]
+    asteroids = [
+        Asteroid(
+            Vec2(random.uniform(0, world_size.x), random.uniform(0, world_size.y)),
+            Vec2(random.uniform(-300, 300), random.uniform(-300, 300)),
+            1,
+            random.uniform(10, 200),
+            Color("white"),
+        )
+        for _ in range(body_count)
+    ]
+
+    baseline_ms = None
+    for columns, rows in DOMAIN_GRIDS:
+        domain = DomainDecomposition(world_size, planets, asteroids, columns, rows)
+        start = time.perf_counter()
+        for _ in range(steps):
+            domain.step(BENCHMARK_DT)
+        # Wait for the last step to finish everywhere
+        domain.gather()
+        ms = (time.perf_counter() - start) * 1000 / steps
+        domain.close()
+        baseline_ms = baseline_ms or ms
+        print(
+            f"{columns}x{rows} regions: {ms:7.2f} ms/step,"
+            f" {baseline_ms / ms:.2f}x speedup",
+        )
+
+
+def benchmark_snapshot(entity_count: int, repeats: int) -> None:
+    """Measure saving and loading a world of many entities.
+
+    The world from `variables.py` is filled up with asteroids, saved to
+    SNAPSHOT_FILE and left there, to start the game from.
+
+    Args:
+    ----
+        entity_count (int): Number of entities, at least the world's own
+        repeats (int): Number of saves and loads measured
+
+    """
+    universe = variables.build_universe(SEED, [])
+    random.seed(SEED)
+    others = len(universe.planets) + len(universe.player_ships)
+    others += len(universe.enemy_ships)
+    while others + len(universe.asteroids) < entity_count:
+        pos = Vec2(
+            random.uniform(0, universe.size.x), random.uniform(0, universe.size.y),
+        )
+        if universe.asteroids_or_planets_intersect_point(pos):
+            continue
+        vel = Vec2(random.uniform(-50, 50), random.uniform(-50, 50))
+        universe.asteroids.append(
+            Asteroid(pos, vel, 1, random.uniform(5, 40), Color("gray")),
+        )
+    universe.mark_static_changed()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        universe.save_snapshot(SNAPSHOT_FILE)
+    save_ms = (time.perf_counter() - start) * 1000 / repeats
+    loaded = variables.build_universe(SEED, [])
+    start = time.perf_counter()
+    for _ in range(repeats):
+        loaded.load_snapshot(SNAPSHOT_FILE)
+    load_ms = (time.perf_counter() - start) * 1000 / repeats
+
+    size_kib = os.path.getsize(SNAPSHOT_FILE) / 1024
+    matches = "matches" if loaded.checksum() == universe.checksum() else "DIFFERS"
+    print(
+        f"{len(universe.asteroids)} asteroids, {size_kib:.0f} KiB:"
+        f" {save_ms:.2f} ms/save, {load_ms:.2f} ms/load, loaded state {matches}",
+    )
+    print(f"Saved to {SNAPSHOT_FILE}")
+
+
+def benchmark_interest(steps: int, client_count: int) -> None:
+    """Compare the bytes sent per client and step, with and without interest.
+
+    Entities drift through a 30k x 30k world, moved directly instead of
+    simulated, so that only replication is measured. Each client follows an
+    entity of its own. Every snapshot is encoded as by the server and decoded
+    as by the client, in this process, and acknowledged INTEREST_ACK_LAG
+    steps later.
+
+    Args:
+    ----
+        steps (int): Number of steps per entity-count
+        client_count (int): Number of clients
+
+    """
+    rng = np.random.default_rng(SEED)
+    world_size = 30_000
+    half_extent = (variables.SCREEN_SIZE.x / 2, variables.SCREEN_SIZE.y / 2)
+    no_records = np.zeros(0, ENTITY_DTYPE)
+    for entity_count in INTEREST_ENTITY_COUNTS:
+        initial_pos = rng.uniform(0, world_size, (entity_count, 2))
+        vel = rng.uniform(-100, 100, (entity_count, 2))
+        focus_ids = rng.choice(entity_count, client_count, replace=False)
+        for byte_budget in [None, variables.INTEREST_BYTE_BUDGET]:
+            pos = initial_pos.copy()
+            records = np.zeros(entity_count, ENTITY_DTYPE)
+            records["id"] = np.arange(entity_count)
+            records["vx"] = vel[:, 0]
+            records["vy"] = vel[:, 1]
+            interests = [
+                ClientInterest(
+                    byte_budget,
+                    variables.INTEREST_ENTER_MARGIN,
+                    variables.INTEREST_EXIT_MARGIN,
+                )
+                if byte_budget is not None
+                else None
+                for _ in range(client_count)
+            ]
+            # Snapshots each client decoded, by step
+            received: list[dict[int, np.ndarray]] = [{} for _ in interests]
+            sent_bytes = 0
+            seconds = 0.0
+            for step in range(steps):
+                pos += vel * BENCHMARK_DT
+                records["x"] = np.rint(pos[:, 0] * POSITION_SCALE)
+                records["y"] = np.rint(pos[:, 1] * POSITION_SCALE)
+                # The latest snapshot acknowledged by now
+                baseline_step = step - 1 - INTEREST_ACK_LAG
+                baselines = [
+                    snapshots.get(baseline_step, no_records) for snapshots in received
+                ]
+                start = time.perf_counter()
+                # Without interest, every client is sent the same snapshot
+                shared = None
+                if byte_budget is None:
+                    shared = encode_delta(records, baselines[0])
+                encoded = []
+                for interest, baseline, focus_id in zip(
+                    interests, baselines, focus_ids,
+                ):
+                    if interest is None:
+                        encoded.append((records, shared))
+                        continue
+                    center = tuple(pos[focus_id])
+                    view = interest.update(
+                        records, center, half_extent, baseline, focus_id,
+                    )
+                    encoded.append((view, encode_delta(view, baseline)))
+                seconds += time.perf_counter() - start
+                for snapshots, baseline, (_, data) in zip(received, baselines, encoded):
+                    snapshots[step] = decode_delta(data, baseline)
+                    # Later steps are compressed against later snapshots
+                    snapshots.pop(baseline_step, None)
+                    sent_bytes += FRAME_HEADER.size + SNAPSHOT_HEADER.size + len(data)
+                decoded_all = all(
+                    np.array_equal(snapshots[step], view)
+                    for snapshots, (view, _) in zip(received, encoded)
+                )
+                if not decoded_all:
+                    msg = "A client decoded something else than was encoded"
+                    raise RuntimeError(msg)
+
+            mode = "everything" if byte_budget is None else f"{byte_budget} B budget"
+            line = (
+                f"{entity_count:6} entities, {mode:>14}:"
+                f" {sent_bytes / steps / client_count:8.0f} bytes/step per client,"
+                f" {seconds * 1000 / steps:7.2f} ms/step encoding for all clients"
+            )
+            if byte_budget is not None:
+                # Entities the clients have at all, up to date or not
+                held = sum(len(interest.view) for interest in interests)
+                interesting = sum(len(interest.ids) for interest in interests)
+                line += f", {held / max(interesting, 1):4.0%} of interesting held"
+            print(line)
+
+
+def main() -> None:
+    """Parse arguments and run the chosen benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "benchmark",
+        choices=["backends", "threads", "domains", "snapshot", "interest"],
+    )
+    parser.add_argument(
+        "--frames",
+        type=int,
+        default=100,
+        help="frames per scene of backends and threads",
+    )
+    parser.add_argument(
+        "--ticks", type=int, default=300, help="steps before backends and threads",
+    )
+    parser.add_argument(
+        "--steps", type=int, default=100, help="steps measured by domains and interest",
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=10, help="saves and loads measured by snapshot",
+    )
+    parser.add_argument(
+        "--bodies", type=int, default=50_000, help="asteroids stepped by domains",
+    )
+    parser.add_argument(
+        "--entities", type=int, default=10_000, help="entities saved by snapshot",
+    )
+    parser.add_argument(
+        "--clients", type=int, default=8, help="clients replicated to by interest",
+    )
+    parser.add_argument(
+        "--headless", action="store_true", help="render without showing a window",
+    )
+    args = parser.parse_args()
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+    if args.benchmark == "backends":
+        benchmark_backends(args.frames, args.ticks)
+    elif args.benchmark == "threads":
+        benchmark_threads(args.frames, args.ticks)
+    elif args.benchmark == "domains":
+        benchmark_domains(args.steps, args.bodies)
+    elif args.benchmark == "snapshot":
+        benchmark_snapshot(args.entities, args.repeats)
+    elif args.benchmark == "interest":
+        benchmark_interest(args.steps, args.clients)
+    pygame.quit()
+    sys.exit()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,16 +6,43 @@ screenspace == Coordinates on the screen
 
 from __future__ import annotations
 
+import math
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
 import pygame
-import pygame.gfxdraw
 from pygame import Color, Rect
 from pygame.math import Vector2 as Vec2
 
+from render_backend import GfxdrawBackend, RenderBackend
+
+if TYPE_CHECKING:
+    from display_list import DisplayList
+
+# Levels of detail, from most to least detailed
+LOD_FULL = 0
+LOD_SIMPLE = 1
+LOD_DOT = 2
+
+# Screenspace-sizes, in pixels, below which objects are drawn
+# as a simplified silhouette, and as a single dot, respectively
+DEFAULT_LOD_THRESHOLDS = (6.0, 1.5)
+
+DEFAULT_BACKEND = GfxdrawBackend()
+
 
 class Camera:
     """A camera with dynamic position and zoom, drawing to a fixed Surface."""
 
-    def __init__(self, center: Vec2, zoom: float, surface: pygame.Surface) -> None:
+    def __init__(
+        self,
+        center: Vec2,
+        zoom: float,
+        surface: pygame.Surface,
+        lod_thresholds: tuple[float, float] = DEFAULT_LOD_THRESHOLDS,
+        backend: RenderBackend = DEFAULT_BACKEND,
+        render_scale: float = 1.0,
+    ) -> None:
         """Construct a new camera.
 
         Args:
@@ -24,12 +51,73 @@ class Camera:
             zoom (float): Higher = Fewer objects fit on screen,
                 zoom==1 corresponds to 1 pixel per unit
             surface (pygame.Surface): Surface to draw on
+            lod_thresholds (tuple[float, float], optional): Screenspace-sizes
+                below which objects are drawn simplified, and as a dot.
+                Defaults to DEFAULT_LOD_THRESHOLDS.
+            backend (RenderBackend, optional): Backend rasterizing primitives.
+                Defaults to anti-aliased drawing with `pygame.gfxdraw`.
+            render_scale (float, optional): Resolution of the world, relative to
+                `surface`. Below 1, the world is drawn into a smaller offscreen
+                surface, which `upscale` scales onto `surface`. Defaults to 1.0.
 
         """
-        self.zoom: float = zoom
-        self.surface: pygame.Surface = surface
+        # Surface everything ends up on, text is drawn here directly
+        self.target: pygame.Surface = surface
+        self.render_scale: float = render_scale
+        self.surface: pygame.Surface = self._create_render_surface()
+        # Zoom and all screenspace-coordinates refer to `self.surface`
+        self.zoom: float = zoom * render_scale
+        self.lod_thresholds: tuple[float, float] = lod_thresholds
+        self.backend: RenderBackend = backend
         # Convert `center` to topleft corner
-        self.pos: Vec2 = Vec2(center) - Vec2(surface.get_size()) / (2 * zoom)
+        self.pos: Vec2 = Vec2(center) - Vec2(self.surface.get_size()) / (2 * self.zoom)
+
+        # Set once per frame by a visibility-pass, see `set_visibility`
+        self.visible_objects: list[Any] | None = None
+        self.screen_bounds: dict[int, Rect] = {}
+        self._needs_culling: bool = True
+
+        # If not None, draw-calls are recorded here instead of rasterized
+        self.recording: DisplayList | None = None
+
+    def _create_render_surface(self) -> pygame.Surface:
+        """Get the surface to draw the world on at `self.render_scale`.
+
+        Returns
+        -------
+            pygame.Surface: The target itself, or a smaller offscreen surface
+
+        """
+        if self.render_scale == 1:
+            return self.target
+        width, height = self.target.get_size()
+        return pygame.Surface(
+            (
+                max(1, round(width * self.render_scale)),
+                max(1, round(height * self.render_scale)),
+            ),
+        )
+
+    def set_render_scale(self, render_scale: float) -> None:
+        """Change the resolution the world is drawn at, keeping the view as is.
+
+        Args:
+        ----
+            render_scale (float): New resolution relative to the target surface,
+                see `__init__`
+
+        """
+        if render_scale == self.render_scale:
+            return
+        half_size = Vec2(self.surface.get_size()) / 2
+        center = self.pos + half_size / self.zoom
+        target_zoom = self.zoom / self.render_scale
+
+        self.render_scale = render_scale
+        self.surface = self._create_render_surface()
+        self.zoom = target_zoom * render_scale
+        self.pos = center - Vec2(self.surface.get_size()) / (2 * self.zoom)
+        self.clear_visibility()
 
     def smoothly_transition_to(
         self,
@@ -49,6 +137,7 @@ class Camera:
                 the camera will have fully transitioned. Defaults to 0.25
 
         """
+        self.clear_visibility()
         dist = self.pos.distance_to(new_pos)
         self.pos.move_towards_ip(new_pos, dist * dt / transition_time)
 
@@ -113,6 +202,73 @@ class Camera:
         buffed_rect = enclosing_rect.inflate(2 * buff, 2 * buff)
         self.smoothly_focus_rect(buffed_rect, dt, transition_time)
 
+    def get_world_rect(self) -> Rect:
+        """Get the worldspace-rectangle visible on the camera's screen.
+
+        Returns
+        -------
+            Rect: Worldspace-rectangle, rounded outwards to whole units
+
+        """
+        size = Vec2(self.surface.get_size()) / self.zoom
+        return Rect(self.pos, size).inflate(2, 2)
+
+    def set_visibility(
+        self, visible_objects: list[Any], screen_bounds: dict[int, Rect],
+    ) -> None:
+        """Hand the camera the result of this frame's visibility-pass.
+
+        Args:
+        ----
+            visible_objects (list[Any]): Objects visible on screen, in drawing-order
+            screen_bounds (dict[int, Rect]): Screenspace-bounding-rectangle
+                of each visible object, by `id` of the object
+
+        """
+        self.visible_objects = visible_objects
+        self.screen_bounds = screen_bounds
+
+    def clear_visibility(self) -> None:
+        """Discard visibility-information, e.g. because it became stale."""
+        self.visible_objects = None
+        self.screen_bounds = {}
+
+    def begin_object(self, obj: Any) -> None:
+        """Announce that `obj` is about to be drawn.
+
+        If the visibility-pass found `obj` to be entirely on screen,
+        its primitives skip their own on-screen checks.
+
+        Args:
+        ----
+            obj (Any): Object about to be drawn
+
+        """
+        bounds = self.screen_bounds.get(id(obj))
+        self._needs_culling = bounds is None or not Rect(
+            (0, 0), self.surface.get_size(),
+        ).contains(bounds)
+
+    def end_object(self) -> None:
+        """Announce that the object announced by `begin_object` is drawn."""
+        self._needs_culling = True
+
+    def start_recording(self, display_list: DisplayList) -> None:
+        """Record worldspace draw-calls into `display_list` instead of drawing them.
+
+        Text is unaffected, it is always drawn right away.
+
+        Args:
+        ----
+            display_list (DisplayList): Display list to record into
+
+        """
+        self.recording = display_list
+
+    def stop_recording(self) -> None:
+        """Go back to drawing draw-calls right away."""
+        self.recording = None
+
     def _rectangle_intersects_screen(self, rect: Rect) -> bool:
         """Determine whether a screenspace-rectangle intersects the camera's screen.
 
@@ -143,10 +299,112 @@ class Camera:
         """
         return (vec - self.pos) * self.zoom
 
+    def world_to_screen_array(self, points: np.ndarray) -> np.ndarray:
+        """Transform many worldspace-points to screenspace at once.
+
+        Args:
+        ----
+            points (np.ndarray): (N, 2)-array of worldspace-points
+
+        Returns:
+        -------
+            np.ndarray: (N, 2)-array of screenspace-points
+
+        """
+        return (points - (self.pos.x, self.pos.y)) * self.zoom
+
+    def shapes_to_screen(
+        self, points: np.ndarray, offsets: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Transform the points of many shapes to screenspace, and bound each shape.
+
+        Args:
+        ----
+            points (np.ndarray): (N, 2)-array of the worldspace-points of all shapes
+            offsets (np.ndarray): (S + 1)-array of indices into `points`,
+                shape i owning the points `offsets[i]:offsets[i + 1]`.
+                Every shape needs at least one point.
+
+        Returns:
+        -------
+            tuple[np.ndarray, np.ndarray]: (N, 2)-array of screenspace-points,
+                and (S, 4)-array of screenspace-bounds (minx, miny, maxx, maxy)
+
+        """
+        screen_points = self.world_to_screen_array(points)
+        starts = offsets[:-1]
+        bounds = np.hstack(
+            (
+                np.minimum.reduceat(screen_points, starts, axis=0),
+                np.maximum.reduceat(screen_points, starts, axis=0),
+            ),
+        )
+        return screen_points, bounds
+
+    def get_lod(self, size: float) -> int:
+        """Get the level of detail to draw an object of a given size with.
+
+        Args:
+        ----
+            size (float): Worldspace-size of the object, e.g. its diameter
+
+        Returns:
+        -------
+            int: LOD_FULL, LOD_SIMPLE or LOD_DOT
+
+        """
+        screen_size = size * self.zoom
+        simple_threshold, dot_threshold = self.lod_thresholds
+        if screen_size >= simple_threshold:
+            return LOD_FULL
+        if screen_size >= dot_threshold:
+            return LOD_SIMPLE
+        return LOD_DOT
+
+    def get_lod_sizes(self) -> tuple[float, float]:
+        """Get the worldspace-sizes below which objects are drawn simplified,
+        and as a dot. Cameras with equal sizes choose the same level of detail
+        for every object.
+
+        Returns
+        -------
+            tuple[float, float]: Worldspace-sizes, see `get_lod`
+
+        """
+        simple_threshold, dot_threshold = self.lod_thresholds
+        return simple_threshold / self.zoom, dot_threshold / self.zoom
+
+    def get_lod_key(self, steps_per_octave: int) -> tuple[int, int]:
+        """Get the LOD-sizes, quantized to steps of a fraction of an octave.
+        Cameras with equal keys are zoomed nearly alike, and choose the same
+        level of detail for all but objects close to a threshold.
+
+        Args:
+        ----
+            steps_per_octave (int): Number of steps between a zoom and its double
+
+        Returns:
+        -------
+            tuple[int, int]: Quantized LOD-sizes, see `get_lod_sizes`
+
+        """
+        simple_size, dot_size = self.get_lod_sizes()
+        return (
+            math.floor(math.log2(simple_size) * steps_per_octave),
+            math.floor(math.log2(dot_size) * steps_per_octave),
+        )
+
     def start_drawing_new_frame(self) -> None:
         """Fill the camera's surface black to prepare for drawing a new frame."""
         self.surface.fill(Color("black"))
 
+    def upscale(self) -> None:
+        """Scale the drawn world onto the target surface, if drawn at a lower
+        resolution. Call this after the world is drawn, and before text is.
+        """
+        if self.surface is not self.target:
+            pygame.transform.scale(self.surface, self.target.get_size(), self.target)
+
     def draw_circle(self, color: Color, center: Vec2, radius: float) -> None:
         """Draw an anti-aliased worldspace-circle on screen.
 
@@ -157,15 +415,33 @@ class Camera:
             radius (float): Worldspace-radius of the circle
 
         """
+        if self.recording is not None:
+            self.recording.add_circle(color, center, radius)
+            return
         ccenter, cradius = self.world_to_screen(center), radius * self.zoom
         # ??? Why only ints?
         x, y, r = int(ccenter.x), int(ccenter.y), int(cradius)
 
         # soft check for circle-screen-intersection:
-        enclosing_rect = Rect((x - r, y - r), (2 * r, 2 * r))
-        if self._rectangle_intersects_screen(enclosing_rect):
-            pygame.gfxdraw.aacircle(self.surface, x, y, r, color)
-            pygame.gfxdraw.filled_circle(self.surface, x, y, r, color)
+        if not self._needs_culling or self._rectangle_intersects_screen(
+            Rect((x - r, y - r), (2 * r, 2 * r)),
+        ):
+            self.backend.circle(self.surface, x, y, r, color)
+
+    def draw_dot(self, color: Color, pos: Vec2) -> None:
+        """Draw a single pixel at a worldspace-position.
+
+        Args:
+        ----
+            color (Color): Pixel's color
+            pos (Vec2): Worldspace-position
+
+        """
+        if self.recording is not None:
+            self.recording.add_dot(color, pos)
+            return
+        x, y = (pos - self.pos) * self.zoom
+        self.backend.pixel(self.surface, int(x), int(y), color)
 
     def draw_polygon(self, color: Color, points: list[Vec2]) -> None:
         """Draw an anti-aliased worldspace-polygon on screen.
@@ -176,12 +452,63 @@ class Camera:
             points (list[Vec2]): Worldspace-points
 
         """
-        cpoints = [self.world_to_screen(p) for p in points]
-        # Soft check for points-screen-intersection:
-        enclosing_rect = _get_enclosing_rect(cpoints)
-        if self._rectangle_intersects_screen(enclosing_rect):
-            pygame.gfxdraw.aapolygon(self.surface, cpoints, color)
-            pygame.gfxdraw.filled_polygon(self.surface, cpoints, color)
+        if self.recording is not None:
+            self.recording.add_polygon(color, points)
+            return
+        px, py = self.pos
+        zoom = self.zoom
+        cpoints = [((p.x - px) * zoom, (p.y - py) * zoom) for p in points]
+        if self._needs_culling:
+            # Soft check for points-screen-intersection:
+            xs = [x for x, _ in cpoints]
+            ys = [y for _, y in cpoints]
+            width, height = self.surface.get_size()
+            if max(xs) < -1 or min(xs) > width or max(ys) < -1 or min(ys) > height:
+                return
+        self.backend.polygon(self.surface, cpoints, color)
+
+    def draw_polygons(
+        self, color: Color, points: np.ndarray, offsets: np.ndarray,
+    ) -> int:
+        """Draw many anti-aliased worldspace-polygons of the same color on screen.
+
+        All polygons are transformed and bounded in one go,
+        see `shapes_to_screen`.
+
+        Args:
+        ----
+            color (Color): Border- and fill-color
+            points (np.ndarray): (N, 2)-array of the worldspace-points of all polygons
+            offsets (np.ndarray): (S + 1)-array of indices into `points`,
+                polygon i having the points `offsets[i]:offsets[i + 1]`
+
+        Returns:
+        -------
+            int: Number of polygons drawn, i.e. not culled
+
+        """
+        if self.recording is not None:
+            for start, end in zip(offsets[:-1], offsets[1:]):
+                self.recording.add_polygon(
+                    color, [Vec2(p) for p in points[start:end].tolist()],
+                )
+            return len(offsets) - 1
+        screen_points, bounds = self.shapes_to_screen(points, offsets)
+        width, height = self.surface.get_size()
+        visible = np.flatnonzero(
+            (bounds[:, 2] >= -1)
+            & (bounds[:, 0] <= width)
+            & (bounds[:, 3] >= -1)
+            & (bounds[:, 1] <= height),
+        )
+        # Slicing Python-lists is much cheaper than slicing arrays
+        coords = screen_points.tolist()
+        starts = offsets[:-1].tolist()
+        ends = offsets[1:].tolist()
+        backend, surface = self.backend, self.surface
+        for i in visible.tolist():
+            backend.polygon(surface, coords[starts[i] : ends[i]], color)
+        return len(visible)
 
     def draw_line(self, color: Color, start: Vec2, end: Vec2, thickness: float) -> None:
         """Draw an anti-aliased worldspace-line with a given thickness.
@@ -194,15 +521,17 @@ class Camera:
             thickness (float): Line's worldspace-thickness
 
         """
-        delta = end - start
-        if delta == Vec2(0, 0):
+        dx, dy = end.x - start.x, end.y - start.y
+        length = math.hypot(dx, dy)
+        if length == 0:
             return
-        orthogonal = Vec2(-delta.y, delta.x).normalize() * thickness / 2
+        # Half-thickness offset, orthogonal to the line
+        ox, oy = -dy * thickness / (2 * length), dx * thickness / (2 * length)
         points = [
-            start + orthogonal,
-            end + orthogonal,
-            end - orthogonal,
-            start - orthogonal,
+            Vec2(start.x + ox, start.y + oy),
+            Vec2(end.x + ox, end.y + oy),
+            Vec2(end.x - ox, end.y - oy),
+            Vec2(start.x - ox, start.y - oy),
         ]
         # Need not check whether this is on-screen, as
         # draw_polygon does it for us
@@ -218,12 +547,15 @@ class Camera:
             end (Vec2): Line's end-worldspace-point
 
         """
+        if self.recording is not None:
+            self.recording.add_hairline(color, start, end)
+            return
         tstart, tend = self.world_to_screen(start), self.world_to_screen(end)
         screen_rect = Rect((0, 0), self.surface.get_size())
         clipped_line = screen_rect.clipline(tstart, tend)
         if clipped_line:
             ((x1, y1), (x2, y2)) = clipped_line
-            pygame.gfxdraw.line(self.surface, x1, y1, x2, y2, color)
+            self.backend.line(self.surface, x1, y1, x2, y2, color)
 
     def draw_vertical_hairline(
         self, color: Color, x: float, starty: float, endy: float,
@@ -238,6 +570,9 @@ class Camera:
             endy (float): Line's ending point
 
         """
+        if self.recording is not None:
+            self.recording.add_vertical_hairline(color, x, starty, endy)
+            return
         tstart, tend = (
             self.world_to_screen(Vec2(x, starty)),
             self.world_to_screen(Vec2(x, endy)),
@@ -246,7 +581,7 @@ class Camera:
         clipped_line = screen_rect.clipline(tstart, tend)
         if clipped_line:
             ((x, y1), (_, y2)) = clipped_line
-            pygame.gfxdraw.vline(self.surface, x, y1, y2, color)
+            self.backend.line(self.surface, x, y1, x, y2, color)
 
     def draw_horizontal_hairline(
         self, color: Color, startx: float, endx: float, y: float,
@@ -261,6 +596,9 @@ class Camera:
             y (float): Line's vertical position
 
         """
+        if self.recording is not None:
+            self.recording.add_horizontal_hairline(color, startx, endx, y)
+            return
         tstart, tend = (
             self.world_to_screen(Vec2(startx, y)),
             self.world_to_screen(Vec2(endx, y)),
@@ -269,7 +607,7 @@ class Camera:
         clipped_line = screen_rect.clipline(tstart, tend)
         if clipped_line:
             ((x1, y), (x2, _)) = clipped_line
-            pygame.gfxdraw.hline(self.surface, x1, x2, y, color)
+            self.backend.line(self.surface, x1, y, x2, y, color)
 
     def draw_rect(self, color: Color, rect: Rect) -> None:
         """Draw an anti-aliased worldspace-rectangle.
@@ -280,17 +618,27 @@ class Camera:
             rect (Rect): Worldspace rectangle to draw
 
         """
-        ttopleft = self.world_to_screen(Vec2(rect.topleft))
-        tbottomright = self.world_to_screen(Vec2(rect.bottomright))
-        screen_rect = Rect(ttopleft, tbottomright - ttopleft)
-        if self._rectangle_intersects_screen(screen_rect):
-            pygame.gfxdraw.box(self.surface, screen_rect, color)
+        if self.recording is not None:
+            self.recording.add_rect(color, rect)
+            return
+        px, py = self.pos
+        zoom = self.zoom
+        left, top = (rect.left - px) * zoom, (rect.top - py) * zoom
+        screen_rect = Rect(
+            (left, top),
+            ((rect.right - px) * zoom - left, (rect.bottom - py) * zoom - top),
+        )
+        if not self._needs_culling or self._rectangle_intersects_screen(screen_rect):
+            self.backend.box(self.surface, screen_rect, color)
 
     def draw_text(
         self, text: str, pos: Vec2 | None, font: pygame.font.Font, color: Color,
     ) -> None:
         """Draw text on screen at screenspace-position, or centered on screen.
 
+        Text is drawn onto the target surface at its native resolution,
+        so `pos` is relative to the target, not scaled by `render_scale`.
+
         Args:
         ----
             text (str): Text to render
@@ -302,12 +650,12 @@ class Camera:
         """
         rendered = font.render(text, True, color)
         if pos is None:
-            width, height = self.surface.get_size()
+            width, height = self.target.get_size()
             pos = Vec2(
                 (width - rendered.get_width()) / 2,
                 (height - rendered.get_height()) / 2,
             )
-        self.surface.blit(rendered, pos)
+        self.backend.text(self.target, rendered, pos)
 
 
 def _get_enclosing_rect(points: list[Vec2]) -> Rect:
@@ -0,0 +1,234 @@
+"""Recording frames to disk without stalling the game loop.
+
+The game loop only copies a frame's raw pixel-buffer into a bounded queue.
+Worker threads convert the pixels and encode them, as PNGs or as raw RGB-dumps.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+
+import numpy as np
+import pygame
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class CapturedFrame:
+    """A copy of a frame's pixels, in the layout of the surface it came from."""
+
+    def __init__(self, index: int, surface: pygame.Surface) -> None:
+        """Copy the pixels of `surface`.
+
+        32-bit surfaces, like the display's, are copied as raw bytes,
+        which is by far the cheapest. Other surfaces are converted to RGB.
+
+        Args:
+        ----
+            index (int): Number of the frame, counting all frames seen
+            surface (pygame.Surface): Surface to copy
+
+        """
+        self.index = index
+        self.size = surface.get_size()
+        if surface.get_bytesize() == 4:
+            self.pixels = surface.get_buffer().raw
+            self.pitch = surface.get_pitch()
+            self.shifts = surface.get_shifts()[:3]
+        else:
+            self.pixels = pygame.image.tobytes(surface, "RGB")
+            self.pitch = 3 * self.size[0]
+            self.shifts = None
+
+    def to_rgb(self) -> np.ndarray:
+        """Convert the copied pixels to RGB.
+
+        Returns
+        -------
+            np.ndarray: (height, width, 3)-array of 8-bit RGB-values
+
+        """
+        width, height = self.size
+        rows = np.frombuffer(self.pixels, dtype=np.uint8).reshape(height, self.pitch)
+        if self.shifts is None:
+            return rows[:, : 3 * width].reshape(height, width, 3)
+        pixels = rows[:, : 4 * width].reshape(height, width, 4)
+        # Byte of each channel within a pixel, from the channel's bit-shift
+        channel_bytes = [shift // 8 for shift in self.shifts]
+        if sys.byteorder == "big":
+            channel_bytes = [3 - byte for byte in channel_bytes]
+        return pixels[:, :, channel_bytes]
+
+
+def encode_png(rgb: np.ndarray, compression_level: int) -> bytes:
+    """Encode RGB-pixels as a PNG, without any filtering.
+
+    Args:
+    ----
+        rgb (np.ndarray): (height, width, 3)-array of 8-bit RGB-values
+        compression_level (int): zlib-compression-level, from 0 to 9
+
+    Returns:
+    -------
+        bytes: Content of the PNG-file
+
+    """
+    height, width, _ = rgb.shape
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        checksum = zlib.crc32(data, zlib.crc32(kind))
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", checksum)
+
+    # Every scanline starts with its filter-type, 0 being no filter
+    scanlines = np.zeros((height, 1 + 3 * width), dtype=np.uint8)
+    scanlines[:, 1:] = rgb.reshape(height, 3 * width)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), compression_level))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FrameCapture:
+    """Captures every `every_nth` frame, and writes it to disk on worker threads.
+
+    If the workers fall behind and the queue is full, frames are dropped
+    and counted in `dropped_frames`, instead of blocking the game loop.
+    Frames that can't be written, e.g. as the disk is full, are counted in
+    `failed_frames`, and the latest error is kept in `write_error`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        every_nth: int = 1,
+        file_format: str = "png",
+        queue_size: int = 8,
+        worker_count: int = 2,
+        compression_level: int = 1,
+    ) -> None:
+        """Create a new capture, and start its workers.
+
+        Args:
+        ----
+            directory (str): Directory to write frames to, created if missing
+            every_nth (int, optional): Capture one out of this many frames.
+                Defaults to 1.
+            file_format (str, optional): "png" for PNG-files, "raw" for raw
+                RGB-dumps, named with their size. Defaults to "png".
+            queue_size (int, optional): Maximum number of frames waiting to be
+                written. Defaults to 8.
+            worker_count (int, optional): Number of writing threads. Defaults to 2.
+            compression_level (int, optional): zlib-compression-level of PNGs,
+                low levels keep up with higher frame rates. Defaults to 1.
+
+        """
+        if file_format not in ("png", "raw"):
+            msg = f"Unknown capture format {file_format!r}"
+            raise ValueError(msg)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.every_nth = every_nth
+        self.file_format = file_format
+        self.compression_level = compression_level
+
+        self.frames_seen = 0
+        self.frames_captured = 0
+        self.dropped_frames = 0
+        self.frames_written = 0
+        self.failed_frames = 0
+        self.write_error: OSError | None = None
+        self._written_lock = threading.Lock()
+
+        self._queue: queue.Queue[CapturedFrame | None] = queue.Queue(queue_size)
+        self._workers = [
+            threading.Thread(target=self._work, daemon=True)
+            for _ in range(worker_count)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def capture(self, surface: pygame.Surface) -> bool:
+        """Hand a frame to the workers, if it's due and they can keep up.
+
+        Args:
+        ----
+            surface (pygame.Surface): Surface holding the finished frame
+
+        Returns:
+        -------
+            bool: True iff the frame was queued
+
+        """
+        index = self.frames_seen
+        self.frames_seen += 1
+        if index % self.every_nth != 0:
+            return False
+        # Check before copying, so dropping a frame is cheap
+        if self._queue.full():
+            self.dropped_frames += 1
+            return False
+        try:
+            self._queue.put_nowait(CapturedFrame(index, surface))
+        except queue.Full:
+            self.dropped_frames += 1
+            return False
+        self.frames_captured += 1
+        return True
+
+    def _work(self) -> None:
+        """Write queued frames, until told to stop by a None."""
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                return
+            try:
+                self._write(frame)
+            except OSError as error:
+                # Keep draining the queue, so that neither `capture` nor `close`
+                # waits for workers that stopped
+                with self._written_lock:
+                    self.failed_frames += 1
+                    self.write_error = error
+                continue
+            with self._written_lock:
+                self.frames_written += 1
+
+    def _write(self, frame: CapturedFrame) -> None:
+        """Convert, encode and write a single frame.
+
+        Args:
+        ----
+            frame (CapturedFrame): Frame to write
+
+        """
+        rgb = frame.to_rgb()
+        if self.file_format == "png":
+            name = f"frame_{frame.index:06}.png"
+            data = encode_png(rgb, self.compression_level)
+        else:
+            width, height = frame.size
+            name = f"frame_{frame.index:06}_{width}x{height}.rgb"
+            data = np.ascontiguousarray(rgb).tobytes()
+        with open(os.path.join(self.directory, name), "wb") as file:
+            file.write(data)
+
+    def close(self) -> None:
+        """Write all queued frames, and stop the workers."""
+        for _ in self._workers:
+            # Dead workers never make room in the queue, so don't wait for them
+            while any(worker.is_alive() for worker in self._workers):
+                try:
+                    self._queue.put(None, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+        for worker in self._workers:
+            worker.join()
@@ -0,0 +1,363 @@
+"""A client of server.py, run with `py client.py`.
+
+The client builds its own copy of the server's world, moves it to every received
+snapshot, and renders it with a camera following its player-ship. The player
+steers with the keys of the first player.
+
+With `--bots`, it instead load-tests the server with many headless clients,
+which press random keys, and reports what they received.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pygame
+from pygame import Color
+from pygame.math import Vector2 as Vec2
+
+from camera import Camera
+from netcode import (
+    ENTITY_DTYPE,
+    FRAME_HEADER,
+    INPUT,
+    MESSAGE_INPUT,
+    MESSAGE_SNAPSHOT,
+    MESSAGE_WELCOME,
+    NO_TICK,
+    PROTOCOL_VERSION,
+    SNAPSHOT_HEADER,
+    SNAPSHOT_HISTORY,
+    WELCOME,
+    WorldMirror,
+    decode_delta,
+    frame,
+    read_frame,
+)
+from render_backend import create_backend
+from replay import pack_input
+from variables import (
+    FRAME_RATE_LIMIT,
+    LOD_THRESHOLDS,
+    RENDER_BACKEND,
+    SCREEN_SIZE,
+    SERVER_HOST,
+    SERVER_PORT,
+    build_universe,
+)
+
+if TYPE_CHECKING:
+    from ship import PlayerShip
+
+_NO_RECORDS = np.zeros(0, ENTITY_DTYPE)
+
+
+class SnapshotReceiver:
+    """Decodes snapshots, keeping those the server may delta-compress against."""
+
+    def __init__(self) -> None:
+        """Create a receiver, which hasn't received anything yet."""
+        self.snapshots: dict[int, np.ndarray] = {}
+        self.latest_tick = NO_TICK
+        self.bytes_received = 0
+        self.snapshot_count = 0
+        self.decode_seconds = 0.0
+
+    def receive(self, payload: bytes) -> tuple[np.ndarray, float, int]:
+        """Decode a snapshot.
+
+        Args:
+        ----
+            payload (bytes): Snapshot-message, without its frame
+
+        Returns:
+        -------
+            tuple[np.ndarray, float, int]: The entities' records, and the
+                client's own fuel and ammo
+
+        """
+        start = time.perf_counter()
+        tick, baseline_tick, fuel, ammo = SNAPSHOT_HEADER.unpack_from(payload)
+        baseline = (
+            _NO_RECORDS if baseline_tick == NO_TICK else self.snapshots[baseline_tick]
+        )
+        records = decode_delta(payload[SNAPSHOT_HEADER.size :], baseline)
+        self.snapshots[tick] = records
+        # The server never goes back to a baseline older than the latest one
+        for old_tick in list(self.snapshots):
+            if baseline_tick != NO_TICK and old_tick < baseline_tick:
+                del self.snapshots[old_tick]
+        if len(self.snapshots) > SNAPSHOT_HISTORY:
+            del self.snapshots[next(iter(self.snapshots))]
+        self.latest_tick = tick
+        self.bytes_received += FRAME_HEADER.size + len(payload)
+        self.snapshot_count += 1
+        self.decode_seconds += time.perf_counter() - start
+        return records, fuel, ammo
+
+    def summary(self) -> str:
+        """Describe what was received.
+
+        Returns
+        -------
+            str: Human-readable statistics
+
+        """
+        count = max(self.snapshot_count, 1)
+        return (
+            f"{self.snapshot_count} snapshots,"
+            f" {self.bytes_received / count:.0f} bytes/snapshot,"
+            f" {self.decode_seconds * 1000 / count:.3f} ms/snapshot decoding"
+        )
+
+
+async def join(
+    host: str, port: int,
+) -> tuple[asyncio.StreamReader, asyncio.StreamWriter, int, int, int, float]:
+    """Connect to a server, and read its welcome.
+
+    Args:
+    ----
+        host (str): Address of the server
+        port (int): Port of the server
+
+    Returns:
+    -------
+        tuple[asyncio.StreamReader, asyncio.StreamWriter, int, int, int, float]:
+            Streams from and to the server, the world's seed, the number of
+            player-ships, the client's player-ship, and the server's tick rate
+
+    Raises:
+    ------
+        ConnectionError: If the server turned the client away
+
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        message_type, payload = await read_frame(reader)
+    except asyncio.IncompleteReadError:
+        writer.close()
+        msg = "The server is full"
+        raise ConnectionRefusedError(msg) from None
+    if (
+        message_type != MESSAGE_WELCOME
+        or WELCOME.unpack(payload)[0] != PROTOCOL_VERSION
+    ):
+        writer.close()
+        msg = f"The server doesn't speak protocol version {PROTOCOL_VERSION}"
+        raise ConnectionError(msg)
+    _, seed, player_count, slot, tick_rate = WELCOME.unpack(payload)
+    return reader, writer, seed, player_count, slot, tick_rate
+
+
+async def receive_snapshots(
+    reader: asyncio.StreamReader,
+    receiver: SnapshotReceiver,
+    mirror: WorldMirror,
+    ship: PlayerShip,
+    camera: Camera,
+) -> None:
+    """Mirror every received snapshot into the world, until the server leaves.
+
+    Args:
+    ----
+        reader (asyncio.StreamReader): Stream from the server
+        receiver (SnapshotReceiver): Decodes the snapshots
+        mirror (WorldMirror): Mirrors them into the world
+        ship (PlayerShip): The client's player-ship
+        camera (Camera): Camera showing the world
+
+    """
+    try:
+        while True:
+            message_type, payload = await read_frame(reader)
+            if message_type == MESSAGE_SNAPSHOT:
+                records, fuel, ammo = receiver.receive(payload)
+                mirror.apply(records, camera.get_world_rect())
+                ship.fuel = fuel
+                ship.ammo = ammo
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+
+
+async def play(host: str, port: int) -> None:
+    """Join a server, and render its world until the window is closed.
+
+    Args:
+    ----
+        host (str): Address of the server
+        port (int): Port of the server
+
+    """
+    reader, writer, seed, player_count, slot, tick_rate = await join(host, port)
+    pygame.init()
+    pygame.display.set_caption("Space Game")
+    screen = pygame.display.set_mode(SCREEN_SIZE)
+    universe = build_universe(seed, player_count=player_count)
+    mirror = WorldMirror(universe)
+    # sdl2 needs a window of its own, see main.py
+    backend = create_backend(
+        "gfxdraw" if RENDER_BACKEND == "sdl2" else RENDER_BACKEND,
+    )
+    ship = universe.player_ships[slot]
+    controls = universe.player_ships[0]
+    camera = Camera(ship.pos, 1.0, screen, LOD_THRESHOLDS, backend)
+    receiver = SnapshotReceiver()
+    receiving = asyncio.create_task(
+        receive_snapshots(reader, receiver, mirror, ship, camera),
+    )
+    font = pygame.font.Font(None, 32)
+
+    frame_time = 1 / FRAME_RATE_LIMIT if FRAME_RATE_LIMIT else 0
+    last_frame = time.perf_counter()
+    sent = (NO_TICK, 0)
+    while not receiving.done():
+        now = time.perf_counter()
+        dt = now - last_frame
+        last_frame = now
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+
+        # Every ship is controlled like the first player's
+        state = controls.read_input(pygame.key.get_pressed())
+        view = camera.get_world_rect()
+        # Rounded, so that smooth zooming doesn't send input every frame
+        half_extent = (
+            min(-(-view.width // 200) * 100, 65_535),
+            min(-(-view.height // 200) * 100, 65_535),
+        )
+        message = (receiver.latest_tick, pack_input(state), *half_extent)
+        # Input is sent when it changed, and acknowledges every new snapshot
+        if message != sent:
+            writer.write(frame(MESSAGE_INPUT, INPUT.pack(*message)))
+            sent = message
+
+        universe.step_particles(dt)
+        # Other players' ships come and go, as they enter and leave the view
+        player_ix = universe.player_ships.index(ship)
+        universe.move_camera(camera, player_ix, dt)
+        camera.start_drawing_new_frame()
+        universe.draw_background(camera)
+        universe.draw_grid(camera)
+        universe.draw(camera)
+        universe.particles.draw(camera)
+        camera.upscale()
+        universe.draw_text(camera, player_ix)
+        if receiver.snapshot_count:
+            camera.draw_text(
+                f"{receiver.bytes_received / receiver.snapshot_count:.0f}"
+                f" bytes/snapshot at {tick_rate:.0f} Hz",
+                Vec2(10, screen.get_height() - 40),
+                font,
+                Color("white"),
+            )
+        pygame.display.flip()
+        await asyncio.sleep(max(frame_time - (time.perf_counter() - now), 0))
+
+    receiving.cancel()
+    writer.close()
+    print(receiver.summary())
+    pygame.quit()
+
+
+async def run_bot(
+    host: str, port: int, seconds: float, rng: random.Random,
+) -> SnapshotReceiver | None:
+    """Play as a headless client pressing random keys, decoding every snapshot.
+
+    Args:
+    ----
+        host (str): Address of the server
+        port (int): Port of the server
+        seconds (float): Time to play for
+        rng (random.Random): Random numbers choosing the keys
+
+    Returns:
+    -------
+        SnapshotReceiver | None: What the bot received, None if it was turned away
+
+    """
+    try:
+        reader, writer, *_ = await join(host, port)
+    except ConnectionRefusedError:
+        return None
+    receiver = SnapshotReceiver()
+    bits = 0
+    # Bots look around like an unzoomed camera
+    extent = (int(SCREEN_SIZE.x) // 2, int(SCREEN_SIZE.y) // 2)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    try:
+        while loop.time() < deadline:
+            message_type, payload = await read_frame(reader)
+            if message_type != MESSAGE_SNAPSHOT:
+                continue
+            receiver.receive(payload)
+            # Keys change every second or so
+            if rng.random() < 0.02:
+                bits = rng.randrange(32)
+            writer.write(
+                frame(MESSAGE_INPUT, INPUT.pack(receiver.latest_tick, bits, *extent)),
+            )
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    writer.close()
+    return receiver
+
+
+async def load_test(host: str, port: int, bot_count: int, seconds: float) -> None:
+    """Play with many bots at once, and report what they received.
+
+    Args:
+    ----
+        host (str): Address of the server
+        port (int): Port of the server
+        bot_count (int): Number of bots
+        seconds (float): Time to play for
+
+    """
+    receivers = await asyncio.gather(
+        *(
+            run_bot(host, port, seconds, random.Random(bot_ix))
+            for bot_ix in range(bot_count)
+        ),
+    )
+    joined = [receiver for receiver in receivers if receiver is not None]
+    print(f"{len(joined)} bots joined, {bot_count - len(joined)} were turned away")
+    if not joined:
+        return
+    snapshots = sum(receiver.snapshot_count for receiver in joined)
+    received = sum(receiver.bytes_received for receiver in joined)
+    decoding = sum(receiver.decode_seconds for receiver in joined)
+    print(
+        f"Per bot: {snapshots / len(joined) / seconds:.1f} snapshots/s,"
+        f" {received / max(snapshots, 1):.0f} bytes/snapshot,"
+        f" {received / len(joined) / seconds / 1024:.1f} KiB/s,"
+        f" {decoding * 1000 / max(snapshots, 1):.3f} ms/snapshot decoding",
+    )
+
+
+def main() -> None:
+    """Parse arguments, and play or load-test."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=SERVER_HOST, help="address of the server")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--bots", type=int, help="load-test with this many bots")
+    parser.add_argument(
+        "--seconds", type=float, default=10, help="time the bots play for",
+    )
+    args = parser.parse_args()
+
+    if args.bots is None:
+        asyncio.run(play(args.host, args.port))
+    else:
+        asyncio.run(load_test(args.host, args.port, args.bots, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
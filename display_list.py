@@ -0,0 +1,327 @@
+"""Worldspace draw-commands, recorded once per frame and replayed to many cameras.
+
+Recording happens through a `Camera` (see `Camera.start_recording`), so the
+`draw`-methods of objects need not know whether they rasterize or record.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pygame import Color, Rect
+from pygame.math import Vector2 as Vec2
+
+if TYPE_CHECKING:
+    from camera import Camera
+
+# Primitive kinds, also used to order commands within a batchable layer
+CIRCLE = 0
+POLYGON = 1
+RECT = 2
+HAIRLINE = 3
+VERTICAL_HAIRLINE = 4
+HORIZONTAL_HAIRLINE = 5
+DOT = 6
+# Never recorded, only produced by merging runs of polygons
+POLYGON_BATCH = 7
+
+type Bounds = tuple[float, float, float, float]
+type RGBA = tuple[int, int, int, int]
+type Command = tuple[tuple, int, RGBA, tuple, Bounds]
+
+
+class DisplayList:
+    """A list of worldspace draw-commands, sorted into layers.
+
+    Commands of a batchable layer are sorted by primitive kind and color,
+    so runs of equal primitives are drawn together. Commands of other
+    layers keep the order they were recorded in.
+
+    Once recorded, a display list may be replayed from several threads at once.
+    """
+
+    def __init__(self) -> None:
+        """Create a new, empty display list."""
+        self.commands: list[Command] = []
+        self._layer: int = 0
+        self._batchable: bool = False
+        self._sorted: bool = True
+        self._static_layers: set[int] = set()
+        # Sorted commands, with runs of polygons merged into batches
+        self._batched: list[Command] | None = None
+        self._batch_lock = threading.Lock()
+
+    def clear(self) -> None:
+        """Remove all commands, to prepare for recording a new frame."""
+        self.commands.clear()
+        self._layer = 0
+        self._batchable = False
+        self._sorted = True
+        self._static_layers.clear()
+        self._batched = None
+
+    def begin_layer(self, batchable: bool, static: bool = False) -> None:
+        """Start a new layer, drawn above all previously recorded ones.
+
+        Args:
+        ----
+            batchable (bool): Whether commands in this layer may be reordered
+                by kind and color. Only allow this if overlapping commands
+                of the layer may be drawn in any order.
+            static (bool, optional): Whether the layer holds unmoving content,
+                which `replay` can be told to skip. Defaults to False.
+
+        """
+        self._layer += 1
+        self._batchable = batchable
+        if static:
+            self._static_layers.add(self._layer)
+
+    def _add(self, kind: int, color: Color, data: tuple, bounds: Bounds) -> None:
+        """Record a single command in the current layer.
+
+        Args:
+        ----
+            kind (int): Primitive kind, e.g. `POLYGON`
+            color (Color): Color of the primitive
+            data (tuple): Worldspace-data of the primitive, depending on `kind`
+            bounds (Bounds): Worldspace-bounds (minx, miny, maxx, maxy)
+
+        """
+        seq = len(self.commands)
+        rgba = tuple(color)
+        if self._batchable:
+            key = (self._layer, kind, rgba, seq)
+        else:
+            key = (self._layer, 0, (), seq)
+        self.commands.append((key, kind, rgba, data, bounds))
+        self._sorted = False
+        self._batched = None
+
+    def add_circle(self, color: Color, center: Vec2, radius: float) -> None:
+        """Record a filled circle.
+
+        Args:
+        ----
+            color (Color): Border- and fill-color
+            center (Vec2): Worldspace-center
+            radius (float): Worldspace-radius
+
+        """
+        x, y = center
+        bounds = (x - radius, y - radius, x + radius, y + radius)
+        self._add(CIRCLE, color, (x, y, radius), bounds)
+
+    def add_dot(self, color: Color, pos: Vec2) -> None:
+        """Record a single pixel.
+
+        Args:
+        ----
+            color (Color): Pixel's color
+            pos (Vec2): Worldspace-position
+
+        """
+        x, y = pos
+        self._add(DOT, color, (x, y), (x, y, x, y))
+
+    def add_polygon(self, color: Color, points: list[Vec2]) -> None:
+        """Record a filled polygon.
+
+        Args:
+        ----
+            color (Color): Border- and fill-color
+            points (list[Vec2]): Worldspace-points
+
+        """
+        coords = tuple((p.x, p.y) for p in points)
+        xs = [x for x, _ in coords]
+        ys = [y for _, y in coords]
+        self._add(POLYGON, color, coords, (min(xs), min(ys), max(xs), max(ys)))
+
+    def add_rect(self, color: Color, rect: Rect) -> None:
+        """Record a filled rectangle.
+
+        Args:
+        ----
+            color (Color): Fill-color
+            rect (Rect): Worldspace-rectangle
+
+        """
+        bounds = (rect.left, rect.top, rect.right, rect.bottom)
+        self._add(RECT, color, bounds, bounds)
+
+    def add_hairline(self, color: Color, start: Vec2, end: Vec2) -> None:
+        """Record a line of single-pixel-thickness.
+
+        Args:
+        ----
+            color (Color): Line's color
+            start (Vec2): Worldspace-start
+            end (Vec2): Worldspace-end
+
+        """
+        bounds = (
+            min(start.x, end.x), min(start.y, end.y),
+            max(start.x, end.x), max(start.y, end.y),
+        )
+        self._add(HAIRLINE, color, (Vec2(start), Vec2(end)), bounds)
+
+    def add_vertical_hairline(
+        self, color: Color, x: float, starty: float, endy: float,
+    ) -> None:
+        """Record a vertical line of single-pixel-thickness.
+
+        Args:
+        ----
+            color (Color): Line's color
+            x (float): Line's horizontal position
+            starty (float): Line's starting point
+            endy (float): Line's ending point
+
+        """
+        bounds = (x, min(starty, endy), x, max(starty, endy))
+        self._add(VERTICAL_HAIRLINE, color, (x, starty, endy), bounds)
+
+    def add_horizontal_hairline(
+        self, color: Color, startx: float, endx: float, y: float,
+    ) -> None:
+        """Record a horizontal line of single-pixel-thickness.
+
+        Args:
+        ----
+            color (Color): Line's color
+            startx (float): Line's starting point
+            endx (float): Line's ending point
+            y (float): Line's vertical position
+
+        """
+        bounds = (min(startx, endx), y, max(startx, endx), y)
+        self._add(HORIZONTAL_HAIRLINE, color, (startx, endx, y), bounds)
+
+    def _sort(self) -> None:
+        """Sort commands by layer, and batchable layers by kind and color."""
+        if not self._sorted:
+            self.commands.sort(key=lambda command: command[0])
+            self._sorted = True
+
+    def _batch(self) -> list[Command]:
+        """Sort commands, and merge runs of same-colored polygons of a layer.
+
+        A merged run is a single `POLYGON_BATCH`-command, whose data are
+        the (N, 2)-array of all points and the (S + 1)-array of offsets
+        expected by `Camera.draw_polygons`, and whose bounds enclose all
+        polygons. Batches are built once, and reused by every replay.
+
+        Returns:
+        -------
+            list[Command]: The sorted and batched commands
+
+        """
+        with self._batch_lock:
+            if self._batched is None:
+                self._sort()
+                self._batched = self._merge_polygon_runs()
+            return self._batched
+
+    def _merge_polygon_runs(self) -> list[Command]:
+        """Merge runs of same-colored polygons of a layer, see `_batch`.
+
+        Returns
+        -------
+            list[Command]: The sorted commands, with runs merged
+
+        """
+        batched: list[Command] = []
+        run: list[Command] = []
+
+        def flush_run() -> None:
+            if len(run) == 1:
+                batched.append(run[0])
+            elif run:
+                key, _, rgba, _, _ = run[0]
+                coords = [point for command in run for point in command[3]]
+                offsets = np.cumsum([0] + [len(command[3]) for command in run])
+                bounds = (
+                    min(command[4][0] for command in run),
+                    min(command[4][1] for command in run),
+                    max(command[4][2] for command in run),
+                    max(command[4][3] for command in run),
+                )
+                data = (np.array(coords, dtype=np.float64), offsets)
+                batched.append((key, POLYGON_BATCH, rgba, data, bounds))
+            run.clear()
+
+        for command in self.commands:
+            key, kind, rgba, _, _ = command
+            if run and (
+                kind != POLYGON or rgba != run[0][2] or key[0] != run[0][0][0]
+            ):
+                flush_run()
+            if kind == POLYGON:
+                run.append(command)
+            else:
+                batched.append(command)
+        flush_run()
+        return batched
+
+    def replay(self, camera: Camera, include_static: bool = True) -> int:
+        """Rasterize all commands visible on `camera`, using its transform.
+
+        Args:
+        ----
+            camera (Camera): Camera to draw on
+            include_static (bool, optional): Whether to replay static layers.
+                Defaults to True.
+
+        Returns:
+        -------
+            int: Number of commands that were drawn
+
+        """
+        commands = self._batch()
+        surface = camera.surface
+        zoom = camera.zoom
+        px, py = camera.pos
+        width, height = surface.get_size()
+        # Worldspace-rectangle of the screen, with a pixel of leeway
+        left, top = px - 1 / zoom, py - 1 / zoom
+        right, bottom = px + (width + 1) / zoom, py + (height + 1) / zoom
+
+        backend = camera.backend
+
+        skipped_layers = set() if include_static else self._static_layers
+        drawn = 0
+        for key, kind, color, data, (minx, miny, maxx, maxy) in commands:
+            if maxx < left or minx > right or maxy < top or miny > bottom:
+                continue
+            if key[0] in skipped_layers:
+                continue
+            if kind == POLYGON_BATCH:
+                drawn += camera.draw_polygons(color, *data)
+                continue
+            drawn += 1
+            if kind == POLYGON:
+                cpoints = [((x - px) * zoom, (y - py) * zoom) for x, y in data]
+                backend.polygon(surface, cpoints, color)
+            elif kind == DOT:
+                x, y = data
+                x, y = int((x - px) * zoom), int((y - py) * zoom)
+                backend.pixel(surface, x, y, color)
+            elif kind == CIRCLE:
+                x, y, r = data
+                x, y, r = int((x - px) * zoom), int((y - py) * zoom), int(r * zoom)
+                backend.circle(surface, x, y, r, color)
+            elif kind == RECT:
+                x0, y0, x1, y1 = data
+                topleft = Vec2((x0 - px) * zoom, (y0 - py) * zoom)
+                bottomright = Vec2((x1 - px) * zoom, (y1 - py) * zoom)
+                backend.box(surface, Rect(topleft, bottomright - topleft), color)
+            elif kind == HAIRLINE:
+                camera.draw_hairline(color, *data)
+            elif kind == VERTICAL_HAIRLINE:
+                camera.draw_vertical_hairline(color, *data)
+            else:
+                camera.draw_horizontal_hairline(color, *data)
+        return drawn
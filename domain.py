@@ -0,0 +1,534 @@
+"""Stepping huge numbers of asteroids on worker processes, split up by space.
+
+The world is cut into a grid of regions, each owned by a worker process that
+steps the asteroids inside it with NumPy. Every step, the workers send each
+other copies of asteroids close to their borders, the halo, so collisions
+across borders are seen by both sides, and hand over asteroids that crossed
+into another region. Planets never move, and are shared read-only with all
+workers through shared memory.
+
+Bodies are stored as rows of BODY_FIELDS floats, so that they're cheap to
+slice, send and concatenate.
+
+This isn't wired into `Universe` or the game, whose asteroids are stepped by
+`Universe.step`. Only `benchmark.py domains` uses it, to measure how stepping
+scales with the number of regions.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pygame.math import Vector2 as Vec2
+
+from physics import BOUNCINESS, GRAVITATIONAL_CONSTANT
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+    from universe import Asteroid, Planet
+
+# Columns of body-rows
+BODY_ID, BODY_X, BODY_Y, BODY_VX, BODY_VY, BODY_RADIUS, BODY_MASS = range(7)
+BODY_FIELDS = 7
+# Columns of planet-rows
+PLANET_X, PLANET_Y, PLANET_RADIUS, PLANET_MASS = range(4)
+PLANET_FIELDS = 4
+
+# Offsets to a cell's neighbors, and itself, in a grid
+NEIGHBOR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def region_of(
+    xs: np.ndarray, ys: np.ndarray, region_size: Vec2, columns: int, rows: int,
+) -> np.ndarray:
+    """Get the regions owning positions. Regions on the edge extend endlessly.
+
+    Args:
+    ----
+        xs (np.ndarray): x-coordinates
+        ys (np.ndarray): y-coordinates
+        region_size (Vec2): Worldspace-size of a region
+        columns (int): Number of regions along x
+        rows (int): Number of regions along y
+
+    Returns:
+    -------
+        np.ndarray: Index of the owning region of each position, row by row
+
+    """
+    column = np.clip(np.floor(xs / region_size.x), 0, columns - 1).astype(np.intp)
+    row = np.clip(np.floor(ys / region_size.y), 0, rows - 1).astype(np.intp)
+    return row * columns + column
+
+
+def find_contacts(
+    bodies: np.ndarray, owned_count: int, cell_size: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Find all pairs of intersecting disks, with the first one owned.
+
+    Disks are sorted into a grid of cells, at least as large as any disk,
+    so only disks in neighboring cells are compared.
+
+    Args:
+    ----
+        bodies (np.ndarray): Body-rows, owned ones first
+        owned_count (int): Number of owned bodies
+        cell_size (float): Size of the grid's cells, at least the largest diameter
+
+    Returns:
+    -------
+        tuple[np.ndarray, np.ndarray]: Indices into `bodies` of both disks
+            of each intersecting pair, each pair appearing in both orders
+            if both disks are owned
+
+    """
+    cells_x = np.floor(bodies[:, BODY_X] / cell_size).astype(np.int64)
+    cells_y = np.floor(bodies[:, BODY_Y] / cell_size).astype(np.int64)
+    # Keys of cells, room for 2^31 cells each way and a neighbor in every direction
+    keys = (cells_x << 32) + cells_y
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    owned = np.arange(owned_count)
+    firsts = []
+    seconds = []
+    for dx, dy in NEIGHBOR_OFFSETS:
+        neighbor_keys = keys[:owned_count] + ((dx << 32) + dy)
+        starts = np.searchsorted(sorted_keys, neighbor_keys, "left")
+        counts = np.searchsorted(sorted_keys, neighbor_keys, "right") - starts
+        total = int(counts.sum())
+        if total == 0:
+            continue
+        # Expand every owned disk's range of candidates, one pair per candidate
+        first = np.repeat(owned, counts)
+        range_starts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        second = order[range_starts + np.arange(total)]
+        firsts.append(first)
+        seconds.append(second)
+    if not firsts:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+    first = np.concatenate(firsts)
+    second = np.concatenate(seconds)
+
+    delta = bodies[first, BODY_X : BODY_Y + 1] - bodies[second, BODY_X : BODY_Y + 1]
+    reach = bodies[first, BODY_RADIUS] + bodies[second, BODY_RADIUS]
+    touching = (first != second) & (np.einsum("ij,ij->i", delta, delta) < reach**2)
+    return first[touching], second[touching]
+
+
+def bounce(
+    bodies: np.ndarray,
+    owned_count: int,
+    other_pos: np.ndarray,
+    other_radius: np.ndarray,
+    other_mass: np.ndarray,
+    first: np.ndarray,
+    second: np.ndarray,
+) -> None:
+    """Bounce owned disks off of others, like `Disk.bounce_off_of_disk` does.
+
+    Only the owned disks are changed, the others bounce in their own turn.
+    All contacts are resolved against the positions before any of them.
+
+    Args:
+    ----
+        bodies (np.ndarray): Body-rows, owned ones first, changed in place
+        owned_count (int): Number of owned bodies
+        other_pos (np.ndarray): (n, 2)-positions of the disks bounced off of
+        other_radius (np.ndarray): Radii of the disks bounced off of
+        other_mass (np.ndarray): Masses of the disks bounced off of
+        first (np.ndarray): Indices of the owned disk of each contact
+        second (np.ndarray): Indices into the others of each contact
+
+    """
+    if len(first) == 0:
+        return
+    delta = bodies[first, BODY_X : BODY_Y + 1] - other_pos[second]
+    distance = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+    # Disks exactly on top of each other have no normal to bounce along
+    apart = distance > 0
+    first, second = first[apart], second[apart]
+    delta, distance = delta[apart], distance[apart]
+    normal = delta / distance[:, np.newaxis]
+
+    mass = bodies[first, BODY_MASS]
+    vel_along_normal = np.einsum(
+        "ij,ij->i", bodies[first, BODY_VX : BODY_VY + 1], normal,
+    )
+    impulse = -(1 + BOUNCINESS) * vel_along_normal
+    impulse /= 1 / mass + 1 / other_mass[second]
+    overlap = bodies[first, BODY_RADIUS] + other_radius[second] - distance
+
+    vel_change = np.zeros((owned_count, 2))
+    np.add.at(vel_change, first, normal * (impulse / mass)[:, np.newaxis])
+    pos_change = np.zeros((owned_count, 2))
+    np.add.at(pos_change, first, normal * overlap[:, np.newaxis])
+    bodies[:owned_count, BODY_VX : BODY_VY + 1] += vel_change
+    bodies[:owned_count, BODY_X : BODY_Y + 1] += pos_change
+
+
+class Region:
+    """A rectangle of the world, and the bodies inside of it. Lives in a worker."""
+
+    def __init__(
+        self,
+        index: int,
+        region_size: Vec2,
+        columns: int,
+        rows: int,
+        halo_width: float,
+    ) -> None:
+        """Create a new region without any bodies.
+
+        Args:
+        ----
+            index (int): Index of the region, row by row
+            region_size (Vec2): Worldspace-size of every region
+            columns (int): Number of regions along x
+            rows (int): Number of regions along y
+            halo_width (float): Distance to its borders, within which
+                a body might touch one of another region
+
+        """
+        self.index = index
+        self.region_size = Vec2(region_size)
+        self.columns = columns
+        self.rows = rows
+        self.halo_width = halo_width
+        self.bodies = np.zeros((0, BODY_FIELDS))
+        # Bodies handed over on the last step, still seen like halo-rows
+        self._departed = np.zeros((0, BODY_FIELDS))
+
+        # Every neighbor, with its rectangle grown by the halo
+        column, row = index % columns, index // columns
+        self.neighbors: list[tuple[int, tuple[float, float, float, float]]] = []
+        for dx, dy in NEIGHBOR_OFFSETS:
+            neighbor_column, neighbor_row = column + dx, row + dy
+            if (dx, dy) == (0, 0) or not (
+                0 <= neighbor_column < columns and 0 <= neighbor_row < rows
+            ):
+                continue
+            left = neighbor_column * region_size.x - halo_width
+            top = neighbor_row * region_size.y - halo_width
+            right = left + region_size.x + 2 * halo_width
+            bottom = top + region_size.y + 2 * halo_width
+            # Regions on the edge extend endlessly
+            self.neighbors.append(
+                (
+                    neighbor_row * columns + neighbor_column,
+                    (
+                        -np.inf if neighbor_column == 0 else left,
+                        -np.inf if neighbor_row == 0 else top,
+                        np.inf if neighbor_column == columns - 1 else right,
+                        np.inf if neighbor_row == rows - 1 else bottom,
+                    ),
+                ),
+            )
+
+    def advance(self, planets: np.ndarray, dt: float) -> None:
+        """Move the bodies, and apply the planets' gravity and bounces.
+
+        Args:
+        ----
+            planets (np.ndarray): Planet-rows
+            dt (float): Passed time
+
+        """
+        bodies = self.bodies
+        pos = bodies[:, BODY_X : BODY_Y + 1]
+        vel = bodies[:, BODY_VX : BODY_VY + 1]
+        pos += dt * vel
+        if len(planets) == 0 or len(bodies) == 0:
+            return
+
+        planet_pos = planets[:, PLANET_X : PLANET_Y + 1]
+        # (bodies, planets, 2)-array pointing from each body to each planet
+        delta = planet_pos[np.newaxis] - pos[:, np.newaxis]
+        distance_squared = np.einsum("ijk,ijk->ij", delta, delta)
+        # The body's mass cancels out, leaving its acceleration
+        acceleration = GRAVITATIONAL_CONSTANT * planets[:, PLANET_MASS] / (
+            distance_squared * np.sqrt(distance_squared)
+        )
+        vel += dt * np.einsum("ij,ijk->ik", acceleration, delta)
+
+        reach = bodies[:, BODY_RADIUS, np.newaxis] + planets[:, PLANET_RADIUS]
+        first, second = np.nonzero(distance_squared < reach**2)
+        bounce(
+            bodies,
+            len(bodies),
+            planet_pos,
+            planets[:, PLANET_RADIUS],
+            planets[:, PLANET_MASS],
+            first,
+            second,
+        )
+
+    def outbound(self) -> tuple[dict[int, np.ndarray], dict[int, np.ndarray]]:
+        """Hand over the bodies that left, and copy the ones near the borders.
+
+        Returns
+        -------
+            tuple[dict[int, np.ndarray], dict[int, np.ndarray]]: Body-rows that
+                migrate to, and halo-rows seen by, each neighboring region
+
+        """
+        bodies = self.bodies
+        owners = region_of(
+            bodies[:, BODY_X],
+            bodies[:, BODY_Y],
+            self.region_size,
+            self.columns,
+            self.rows,
+        )
+        migrants = {}
+        ghosts = {}
+        for neighbor_ix, (left, top, right, bottom) in self.neighbors:
+            owned_by_neighbor = owners == neighbor_ix
+            if owned_by_neighbor.any():
+                migrants[neighbor_ix] = bodies[owned_by_neighbor]
+            near = (
+                (bodies[:, BODY_X] >= left)
+                & (bodies[:, BODY_X] < right)
+                & (bodies[:, BODY_Y] >= top)
+                & (bodies[:, BODY_Y] < bottom)
+                & ~owned_by_neighbor
+            )
+            if near.any():
+                ghosts[neighbor_ix] = bodies[near]
+        # Bodies moving faster than a region per step skip over regions,
+        # and are handed to their new owner wherever that is
+        for owner in np.unique(owners):
+            owner = int(owner)
+            if owner != self.index and owner not in migrants:
+                migrants[owner] = bodies[owners == owner]
+        self.bodies = bodies[owners == self.index]
+        self._departed = bodies[owners != self.index]
+        return migrants, ghosts
+
+    def settle(
+        self, migrants: list[np.ndarray], ghosts: list[np.ndarray],
+    ) -> None:
+        """Take in migrated bodies, and bounce all bodies off of each other.
+
+        Args:
+        ----
+            migrants (list[np.ndarray]): Body-rows migrated to `self`
+            ghosts (list[np.ndarray]): Halo-rows of neighboring regions
+
+        """
+        self.bodies = np.concatenate([self.bodies, *migrants])
+        owned_count = len(self.bodies)
+        if owned_count == 0:
+            return
+        everything = np.concatenate([self.bodies, self._departed, *ghosts])
+        first, second = find_contacts(everything, owned_count, self.halo_width)
+        # Sum up each body's contacts in an order independent of the rows' order,
+        # which depends on how the world is split up
+        order = np.lexsort(
+            (everything[second, BODY_ID], everything[first, BODY_ID]),
+        )
+        first, second = first[order], second[order]
+        bounce(
+            self.bodies,
+            owned_count,
+            everything[:, BODY_X : BODY_Y + 1],
+            everything[:, BODY_RADIUS],
+            everything[:, BODY_MASS],
+            first,
+            second,
+        )
+
+
+def run_region(
+    region: Region,
+    planet_memory_name: str,
+    planet_count: int,
+    connection: Connection,
+) -> None:
+    """Serve a region's commands, until told to stop. Runs in a worker.
+
+    Commands are tuples, starting with their name:
+    ("add", body_rows), ("advance", dt), answered with the result of
+    `Region.outbound`, ("settle", migrants, ghosts), ("gather",), answered
+    with the region's body-rows, and ("stop",).
+
+    Args:
+    ----
+        region (Region): Region to step
+        planet_memory_name (str): Name of the shared memory holding planet-rows
+        planet_count (int): Number of planets
+        connection (Connection): Pipe to the coordinating process
+
+    """
+    memory = shared_memory.SharedMemory(planet_memory_name)
+    planets = np.ndarray((planet_count, PLANET_FIELDS), np.float64, memory.buf)
+    planets.flags.writeable = False
+    try:
+        while True:
+            command, *args = connection.recv()
+            if command == "add":
+                region.bodies = np.concatenate([region.bodies, *args])
+            elif command == "advance":
+                region.advance(planets, *args)
+                connection.send(region.outbound())
+            elif command == "settle":
+                region.settle(*args)
+            elif command == "gather":
+                connection.send(region.bodies)
+            elif command == "stop":
+                return
+    finally:
+        del planets
+        memory.close()
+
+
+class DomainDecomposition:
+    """Steps asteroids on a grid of regions, each on a worker process of its own.
+
+    Unlike `Universe.step`, all collisions of a step are resolved against the
+    positions from before any of them, so the outcome doesn't depend on the
+    order of the asteroids, or on how they're split up.
+    """
+
+    def __init__(
+        self,
+        world_size: Vec2,
+        planets: list[Planet],
+        asteroids: list[Asteroid],
+        columns: int,
+        rows: int,
+    ) -> None:
+        """Start a worker per region, and hand it the asteroids inside.
+
+        Args:
+        ----
+            world_size (Vec2): Worldspace-size of the area split into regions
+            planets (list[Planet]): Stationary planets, exerting gravity
+            asteroids (list[Asteroid]): Asteroids to step, identified by their
+                index from then on
+            columns (int): Number of regions along x
+            rows (int): Number of regions along y
+
+        """
+        self.region_size = Vec2(world_size.x / columns, world_size.y / rows)
+        self.columns = columns
+        self.rows = rows
+
+        bodies = np.array(
+            [
+                (ix, a.pos.x, a.pos.y, a.vel.x, a.vel.y, a.radius, a.mass)
+                for ix, a in enumerate(asteroids)
+            ],
+        ).reshape(-1, BODY_FIELDS)
+        # Disks further apart than the largest diameter can't touch
+        halo_width = 2 * max((a.radius for a in asteroids), default=1)
+        # Halos reach into direct neighbors only
+        if halo_width > min(self.region_size.x, self.region_size.y):
+            msg = "Regions must be larger than the largest asteroid's diameter"
+            raise ValueError(msg)
+
+        planet_rows = np.array(
+            [(p.pos.x, p.pos.y, p.radius, p.mass) for p in planets],
+        ).reshape(-1, PLANET_FIELDS)
+        self._planet_memory = shared_memory.SharedMemory(
+            create=True, size=max(1, planet_rows.nbytes),
+        )
+        shared_planets = np.ndarray(
+            planet_rows.shape, np.float64, self._planet_memory.buf,
+        )
+        shared_planets[:] = planet_rows
+        del shared_planets
+
+        owners = region_of(
+            bodies[:, BODY_X], bodies[:, BODY_Y], self.region_size, columns, rows,
+        )
+        self._connections: list[Connection] = []
+        self._workers: list[multiprocessing.Process] = []
+        for region_ix in range(columns * rows):
+            connection, worker_connection = multiprocessing.Pipe()
+            region = Region(region_ix, self.region_size, columns, rows, halo_width)
+            worker = multiprocessing.Process(
+                target=run_region,
+                args=(
+                    region,
+                    self._planet_memory.name,
+                    len(planet_rows),
+                    worker_connection,
+                ),
+                daemon=True,
+            )
+            worker.start()
+            worker_connection.close()
+            connection.send(("add", bodies[owners == region_ix]))
+            self._connections.append(connection)
+            self._workers.append(worker)
+
+    def step(self, dt: float) -> None:
+        """Step all regions at once, and exchange halos and migrating bodies.
+
+        Args:
+        ----
+            dt (float): Passed time
+
+        """
+        for connection in self._connections:
+            connection.send(("advance", dt))
+        migrants: list[list[np.ndarray]] = [[] for _ in self._connections]
+        ghosts: list[list[np.ndarray]] = [[] for _ in self._connections]
+        for connection in self._connections:
+            outbound_migrants, outbound_ghosts = connection.recv()
+            for region_ix, rows in outbound_migrants.items():
+                migrants[region_ix].append(rows)
+            for region_ix, rows in outbound_ghosts.items():
+                ghosts[region_ix].append(rows)
+        for region_ix, connection in enumerate(self._connections):
+            connection.send(("settle", migrants[region_ix], ghosts[region_ix]))
+
+    def _gather_regions(self) -> list[np.ndarray]:
+        """Collect the bodies of each region from the workers.
+
+        Returns
+        -------
+            list[np.ndarray]: Body-rows owned by each region, row by row
+
+        """
+        for connection in self._connections:
+            connection.send(("gather",))
+        return [connection.recv() for connection in self._connections]
+
+    def gather(self) -> np.ndarray:
+        """Collect all bodies from the workers.
+
+        Returns
+        -------
+            np.ndarray: Body-rows of all asteroids, ordered by their index
+
+        """
+        bodies = np.concatenate(self._gather_regions())
+        return bodies[np.argsort(bodies[:, BODY_ID])]
+
+    def region_body_counts(self) -> list[int]:
+        """Count the bodies in each region, e.g. to judge the balance of load.
+
+        Returns
+        -------
+            list[int]: Number of bodies owned by each region, row by row
+
+        """
+        return [len(bodies) for bodies in self._gather_regions()]
+
+    def close(self) -> None:
+        """Stop the workers, and free the shared memory."""
+        for connection in self._connections:
+            connection.send(("stop",))
+        for worker in self._workers:
+            worker.join()
+        for connection in self._connections:
+            connection.close()
+        self._planet_memory.close()
+        self._planet_memory.unlink()
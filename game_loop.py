@@ -0,0 +1,105 @@
+"""Running the simulation at a fixed rate, independent of the frame rate."""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+
+
+class FixedTimestepLoop:
+    """Accumulates frame time, and pays it out in steps of a fixed duration.
+
+    Time left over after stepping is kept for the next frame. `alpha` tells
+    how far the simulation is between its last two steps, for interpolating.
+    With a `warp` above 1, simulated time passes that many times faster,
+    in more steps of the same duration.
+    """
+
+    def __init__(self, tick_rate: float, max_steps_per_frame: int) -> None:
+        """Create a new loop.
+
+        Args:
+        ----
+            tick_rate (float): Simulation steps per second
+            max_steps_per_frame (int): Most steps run in a single frame. After
+                a long stall, the time beyond this is dropped instead of caught up,
+                so a slow simulation can't drag the frame rate down further.
+
+        """
+        self.tick_dt = 1 / tick_rate
+        self.max_steps_per_frame = max_steps_per_frame
+        self.warp = 1
+        self.alpha = 0.0
+        self._accumulator = 0.0
+
+        # Statistics
+        self.tick_count = 0
+        self.frame_count = 0
+        self.ticks_last_frame = 0
+        self.dropped_time = 0.0
+        self._total_tick_time = 0.0
+
+    def advance(
+        self, frame_dt: float, step: Callable[[float, int], None],
+    ) -> int:
+        """Run as many fixed steps as the passed time pays for, all at once.
+
+        Args:
+        ----
+            frame_dt (float): Time passed since the last frame, in seconds
+            step (Callable[[float, int], None]): Steps the simulation the passed
+                number of times, by the passed time each
+
+        Returns:
+        -------
+            int: Number of steps run
+
+        """
+        self._accumulator += frame_dt * self.warp
+        ticks = min(
+            int(self._accumulator / self.tick_dt),
+            self.max_steps_per_frame * self.warp,
+        )
+        if ticks > 0:
+            start = time.perf_counter()
+            step(self.tick_dt, ticks)
+            self._total_tick_time += time.perf_counter() - start
+            self._accumulator -= ticks * self.tick_dt
+        if self._accumulator >= self.tick_dt:
+            # Keep the fraction of a step, drop all whole steps left behind
+            dropped = self._accumulator - self._accumulator % self.tick_dt
+            self.dropped_time += dropped
+            self._accumulator -= dropped
+
+        self.alpha = self._accumulator / self.tick_dt
+        self.tick_count += ticks
+        self.frame_count += 1
+        self.ticks_last_frame = ticks
+        return ticks
+
+    def mean_tick_ms(self) -> float:
+        """Get the average duration of a single step.
+
+        Returns
+        -------
+            float: Average wall-clock time per step, in milliseconds
+
+        """
+        if self.tick_count == 0:
+            return 0.0
+        return self._total_tick_time * 1_000 / self.tick_count
+
+    def summary(self) -> str:
+        """Describe the loop's statistics in a line.
+
+        Returns
+        -------
+            str: Human-readable statistics
+
+        """
+        ticks_per_frame = self.tick_count / max(1, self.frame_count)
+        return (
+            f"{self.tick_count} ticks in {self.frame_count} frames"
+            f" ({ticks_per_frame:.2f} per frame), {self.mean_tick_ms():.2f} ms/tick,"
+            f" {self.dropped_time:.2f} s dropped catching up"
+        )
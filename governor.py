@@ -0,0 +1,151 @@
+"""Adapting rendering-quality to keep render times within a budget."""
+
+from __future__ import annotations
+
+from collections import deque
+
+import pygame
+
+# Posted whenever the governor changes the quality level. Attributes:
+# `level` and `previous_level` (indices into QUALITY_LEVELS), `name` of the
+# new level, and `render_ms`, the rolling render time that caused the change.
+QUALITY_CHANGED = pygame.event.custom_type()
+
+
+class QualityLevel:
+    """A combination of quality knobs, relative to the configured settings."""
+
+    def __init__(
+        self,
+        name: str,
+        background_layers: int | None,
+        anti_aliasing: bool,
+        minimap_refresh_factor: float,
+        render_scale_factor: float,
+        lod_factor: float,
+    ) -> None:
+        """Create a new quality level.
+
+        Args:
+        ----
+            name (str): Name of the level, for logging
+            background_layers (int | None): Number of parallax-layers drawn,
+                dropping the farthest ones first. None draws all of them.
+            anti_aliasing (bool): Whether to draw with an anti-aliasing backend
+            minimap_refresh_factor (float): Factor on the minimap's refresh rate
+            render_scale_factor (float): Factor on the cameras' render scale
+            lod_factor (float): Factor on the LOD-thresholds, higher values
+                simplify objects sooner
+
+        """
+        self.name = name
+        self.background_layers = background_layers
+        self.anti_aliasing = anti_aliasing
+        self.minimap_refresh_factor = minimap_refresh_factor
+        self.render_scale_factor = render_scale_factor
+        self.lod_factor = lod_factor
+
+
+# From best to cheapest, each level giving up a little more than the one before
+QUALITY_LEVELS: list[QualityLevel] = [
+    QualityLevel("full", None, True, 1.0, 1.0, 1.0),
+    QualityLevel("slow minimap", None, True, 0.5, 1.0, 1.0),
+    QualityLevel("one background", 1, True, 0.5, 1.0, 1.0),
+    QualityLevel("no anti-aliasing", 1, False, 0.5, 1.0, 1.0),
+    QualityLevel("coarse LOD", 1, False, 0.5, 1.0, 2.0),
+    QualityLevel("3/4 resolution", 1, False, 0.25, 0.75, 2.0),
+    QualityLevel("1/2 resolution", 0, False, 0.25, 0.5, 3.0),
+]
+
+
+class QualityGovernor:
+    """Steps through QUALITY_LEVELS based on the rolling average render time.
+
+    Only the time spent rendering and presenting a frame is measured, not
+    time spent waiting for the frame-rate limit, or simulating.
+
+    Quality is lowered when the average exceeds the target by `lower_margin`,
+    and raised when it's below the target by `raise_margin`. The gap between
+    both, a cooldown after each change, and a fresh measurement-window for each
+    level keep the governor from oscillating between two levels.
+    """
+
+    def __init__(
+        self,
+        target_ms: float,
+        window: int = 60,
+        lower_margin: float = 0.1,
+        raise_margin: float = 0.3,
+        cooldown: float = 1.0,
+    ) -> None:
+        """Create a new governor, starting at the best quality level.
+
+        Args:
+        ----
+            target_ms (float): Render-time budget, in milliseconds
+            window (int, optional): Number of frames averaged. Defaults to 60.
+            lower_margin (float, optional): Relative amount the average may exceed
+                the target by, before quality is lowered. Defaults to 0.1.
+            raise_margin (float, optional): Relative amount the average must stay
+                below the target by, before quality is raised. Defaults to 0.3.
+            cooldown (float, optional): Seconds to wait after a change,
+                before the next one. Defaults to 1.0.
+
+        """
+        self.target_ms = target_ms
+        self.lower_margin = lower_margin
+        self.raise_margin = raise_margin
+        self.cooldown = cooldown
+        self.level_ix = 0
+        self.level = QUALITY_LEVELS[0]
+        self._render_times: deque[float] = deque(maxlen=window)
+        self._time_since_change = 0.0
+
+    def update(self, render_time: float, dt: float) -> bool:
+        """Measure a frame, and change the quality level if it's due.
+
+        Posts a QUALITY_CHANGED-event on every change.
+
+        Args:
+        ----
+            render_time (float): Time spent rendering and presenting the last
+                frame, in seconds
+            dt (float): Duration of the last frame, in seconds, counting
+                towards the cooldown
+
+        Returns:
+        -------
+            bool: True iff the quality level changed
+
+        """
+        self._render_times.append(render_time * 1_000)
+        self._time_since_change += dt
+        if (
+            len(self._render_times) < self._render_times.maxlen
+            or self._time_since_change < self.cooldown
+        ):
+            return False
+
+        render_ms = sum(self._render_times) / len(self._render_times)
+        previous_ix = self.level_ix
+        if render_ms > self.target_ms * (1 + self.lower_margin):
+            self.level_ix = min(self.level_ix + 1, len(QUALITY_LEVELS) - 1)
+        elif render_ms < self.target_ms * (1 - self.raise_margin):
+            self.level_ix = max(self.level_ix - 1, 0)
+        if self.level_ix == previous_ix:
+            return False
+
+        self.level = QUALITY_LEVELS[self.level_ix]
+        # Judge the new level only by frames rendered with it
+        self._render_times.clear()
+        self._time_since_change = 0.0
+        pygame.event.post(
+            pygame.event.Event(
+                QUALITY_CHANGED,
+                level=self.level_ix,
+                previous_level=previous_ix,
+                name=self.level.name,
+                render_ms=render_ms,
+            ),
+        )
+        return True
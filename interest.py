@@ -0,0 +1,196 @@
+"""Choosing which entities a client is sent, and which first, see server.py.
+
+A client is only interested in entities around its ship, within its camera's
+view plus a margin. Entities enter at a small margin, and only leave beyond a
+larger one, so that ones near the edge don't flicker in and out.
+
+Every changed entity the client doesn't have the latest state of gains priority
+each step, the more the closer it is to the ship. The highest-priority entities
+are sent, as many as fit into the client's byte budget per step, so far-away
+entities are updated less often, but never starve.
+
+Snapshots are delta-compressed against the last one the client acknowledged,
+so a state sent, but not acknowledged yet, has to be sent again. It's resent as
+it was, not as it is now, so that it stops costing anything once acknowledged.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from netcode import ENTITY_DTYPE, POSITION_SCALE
+from state_export import ENTITY_KINDS
+
+# Distance from the ship, in worldspace-units, at which an entity's priority
+# grows half as fast as that of one right at the ship
+PRIORITY_DISTANCE = 1_000
+_PROJECTILE_KINDS = [ENTITY_KINDS.index("Bullet"), ENTITY_KINDS.index("Rocket")]
+
+
+def _lookup_ids(ids: np.ndarray, wanted: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Find ids in a sorted array of ids.
+
+    Args:
+    ----
+        ids (np.ndarray): Sorted ids
+        wanted (np.ndarray): Ids to find
+
+    Returns:
+    -------
+        tuple[np.ndarray, np.ndarray]: Whether each wanted id was found,
+            and its index, which is meaningless for ids that weren't
+
+    """
+    if len(ids) == 0:
+        return np.zeros(len(wanted), bool), np.zeros(len(wanted), np.intp)
+    ixs = np.searchsorted(ids, wanted)
+    np.minimum(ixs, len(ids) - 1, out=ixs)
+    return ids[ixs] == wanted, ixs
+
+
+def _highest(ixs: np.ndarray, priority: np.ndarray, count: int) -> np.ndarray:
+    """Choose the indices of highest priority.
+
+    Args:
+    ----
+        ixs (np.ndarray): Indices to choose from
+        priority (np.ndarray): Priority of every index
+        count (int): Most indices to choose
+
+    Returns:
+    -------
+        np.ndarray: Chosen indices, in no particular order
+
+    """
+    if len(ixs) <= count:
+        return ixs
+    if count <= 0:
+        return ixs[:0]
+    return ixs[np.argpartition(-priority[ixs], count - 1)[:count]]
+
+
+def _lookup(records: np.ndarray, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Find the records of entities by their ids.
+
+    Args:
+    ----
+        records (np.ndarray): Records of ENTITY_DTYPE, sorted by id
+        ids (np.ndarray): Ids to find
+
+    Returns:
+    -------
+        tuple[np.ndarray, np.ndarray]: Whether each id was found, and its
+            record, which is meaningless for ids that weren't
+
+    """
+    if len(records) == 0:
+        return np.zeros(len(ids), bool), np.zeros(len(ids), ENTITY_DTYPE)
+    found, ixs = _lookup_ids(records["id"], ids)
+    return found, records[ixs]
+
+
+class ClientInterest:
+    """The entities a client is interested in, and the state it was sent of them."""
+
+    def __init__(
+        self, byte_budget: int, enter_margin: float, exit_margin: float,
+    ) -> None:
+        """Create a new client's interest, which starts out empty.
+
+        Args:
+        ----
+            byte_budget (int): Bytes of entity-records sent per step, before
+                compression. Entities leaving the client's interest are sent
+                on top, as ids.
+            enter_margin (float): Worldspace-distance beyond the camera's view
+                within which entities become interesting
+            exit_margin (float): Worldspace-distance beyond the camera's view
+                beyond which entities stop being interesting, at least
+                `enter_margin`
+
+        """
+        self.byte_budget = byte_budget
+        self.enter_margin = enter_margin
+        self.exit_margin = exit_margin
+        # Interesting entities, sorted, and their priorities
+        self.ids = np.zeros(0, np.uint32)
+        self.priority = np.zeros(0, np.float64)
+        # The state the client has after the latest snapshot, of ENTITY_DTYPE
+        self.view = np.zeros(0, ENTITY_DTYPE)
+        # Interesting entities whose latest state wasn't sent, at the last step
+        self.deferred_count = 0
+
+    def update(
+        self,
+        records: np.ndarray,
+        center: tuple[float, float],
+        half_extent: tuple[float, float],
+        baseline: np.ndarray,
+        focus_id: int,
+    ) -> np.ndarray:
+        """Choose the state to send the client at this step.
+
+        Args:
+        ----
+            records (np.ndarray): Current records of every entity, sorted by id
+            center (tuple[float, float]): Worldspace-position of the client's ship
+            half_extent (tuple[float, float]): Half the worldspace-size of the
+                client's camera-view
+            baseline (np.ndarray): Records the client acknowledged, which the
+                state will be delta-compressed against
+            focus_id (int): Id of the client's ship, which is always sent
+
+        Returns:
+        -------
+            np.ndarray: Records the client should have after this step,
+                sorted by id
+
+        """
+        # Distance beyond the view's edge, along the axis it's farther along
+        offset_x = records["x"] / POSITION_SCALE - center[0]
+        offset_y = records["y"] / POSITION_SCALE - center[1]
+        outside = np.maximum(
+            np.abs(offset_x) - half_extent[0], np.abs(offset_y) - half_extent[1],
+        )
+        was_interesting, _ = _lookup_ids(self.ids, records["id"])
+        interesting = (outside <= self.enter_margin) | (
+            was_interesting & (outside <= self.exit_margin)
+        )
+        interesting |= records["id"] == focus_id
+        # Projectiles bring their ships along, which they're drawn with
+        projectiles = interesting & np.isin(records["kind"], _PROJECTILE_KINDS)
+        interesting |= np.isin(records["id"], records["owner"][projectiles])
+        current = records[interesting]
+        distance = np.hypot(offset_x[interesting], offset_y[interesting])
+
+        known, ixs = _lookup_ids(self.ids, current["id"])
+        priority = np.zeros(len(current))
+        priority[known] = self.priority[ixs[known]]
+        in_view, view_rows = _lookup(self.view, current["id"])
+        in_baseline, baseline_rows = _lookup(baseline, current["id"])
+        stale = ~in_view | (view_rows != current)
+        unacknowledged = in_view & (~in_baseline | (view_rows != baseline_rows))
+        priority += stale / (1 + distance / PRIORITY_DISTANCE)
+
+        # Only records differing from the baseline cost anything
+        send = current["id"] == focus_id
+        free_rows = self.byte_budget // ENTITY_DTYPE.itemsize - int(send.sum())
+        unacknowledged_ixs = np.flatnonzero(unacknowledged & ~send)
+        resend = np.zeros(len(current), bool)
+        resend[_highest(unacknowledged_ixs, priority, free_rows)] = True
+        free_rows -= int(resend.sum())
+        candidates = np.flatnonzero(stale & ~unacknowledged & ~send)
+        send[_highest(candidates, priority, free_rows)] = True
+        priority[send] = 0
+
+        # Everything else stays as the client acknowledged it, if it did
+        view = current.copy()
+        view[resend] = view_rows[resend]
+        keep_baseline = ~send & ~resend & in_baseline
+        view[keep_baseline] = baseline_rows[keep_baseline]
+        self.ids = current["id"]
+        self.priority = priority
+        self.view = view[send | resend | keep_baseline]
+        self.deferred_count = int((stale & ~send).sum())
+        return self.view
+
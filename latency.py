@@ -0,0 +1,109 @@
+"""Measuring the latency from reading input to presenting its outcome."""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+
+import numpy as np
+
+# Stages of a frame, after input was read, in the order they happen
+LATENCY_STAGES = ["simulated", "rendered", "presented"]
+
+
+class LatencyTracker:
+    """Timestamps every frame's stages, relative to when input was read.
+
+    Presenting is the last stage measurable from here. The display adds its own
+    latency on top, e.g. waiting for vertical sync and scanning out the image.
+    """
+
+    def __init__(self, window: int = 1_000) -> None:
+        """Create a new tracker.
+
+        Args:
+        ----
+            window (int, optional): Number of frames the statistics are taken
+                over. Defaults to 1_000.
+
+        """
+        self.latencies: dict[str, deque[float]] = {
+            stage: deque(maxlen=window) for stage in LATENCY_STAGES
+        }
+        self.frame_count = 0
+        self.discarded_frames = 0
+        self._sampled_at: float | None = None
+        self._marks: dict[str, float] = {}
+
+    def sample(self) -> None:
+        """Note that input was read just now. A later sample replaces an earlier one."""
+        self._sampled_at = time.perf_counter()
+
+    def mark(self, stage: str) -> None:
+        """Note that `stage` of the current frame was completed just now.
+
+        Args:
+        ----
+            stage (str): One of LATENCY_STAGES
+
+        """
+        self._marks[stage] = time.perf_counter()
+
+    def discard(self) -> None:
+        """Don't measure the current frame, e.g. as no step consumed its input."""
+        self._sampled_at = None
+
+    def end_frame(self) -> None:
+        """Record the current frame's latencies, and start the next frame."""
+        self.frame_count += 1
+        if self._sampled_at is None:
+            self.discarded_frames += 1
+        else:
+            for stage, marked_at in self._marks.items():
+                self.latencies[stage].append((marked_at - self._sampled_at) * 1_000)
+        self._sampled_at = None
+        self._marks.clear()
+
+    def percentiles(
+        self, stage: str, percents: tuple[float, ...] = (50, 95, 99),
+    ) -> list[float]:
+        """Get percentiles of the latency from reading input to `stage`.
+
+        Args:
+        ----
+            stage (str): One of LATENCY_STAGES
+            percents (tuple[float, ...], optional): Percentiles to get.
+                Defaults to (50, 95, 99).
+
+        Returns:
+        -------
+            list[float]: Latencies in milliseconds, one per percentile,
+                or none if `stage` was never measured
+
+        """
+        latencies = self.latencies[stage]
+        if not latencies:
+            return []
+        return np.percentile(np.array(latencies), percents).tolist()
+
+    def summary(self) -> str:
+        """Describe the latency-percentiles of every measured stage.
+
+        Returns
+        -------
+            str: Human-readable statistics, a line per stage
+
+        """
+        lines = [
+            f"Latency over {self.frame_count} frames,"
+            f" {self.discarded_frames} without consumed input:",
+        ]
+        for stage in LATENCY_STAGES:
+            percentiles = self.percentiles(stage)
+            if percentiles:
+                p50, p95, p99 = percentiles
+                lines.append(
+                    f"  input to {stage}: {p50:.2f} ms p50, {p95:.2f} ms p95,"
+                    f" {p99:.2f} ms p99, {max(self.latencies[stage]):.2f} ms max",
+                )
+        return "\n".join(lines)
@@ -2,24 +2,62 @@
 
 from __future__ import annotations
 
+import random
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import pygame
-from pygame import Color
+from pygame import Color, Rect
+from pygame.math import Vector2 as Vec2
+from pygame._sdl2.video import Window
 
 from camera import Camera
-from universe import Universe
+from capture import FrameCapture
+from display_list import DisplayList
+from game_loop import FixedTimestepLoop
+from governor import QualityGovernor, QualityLevel
+from latency import LatencyTracker
+from minimap import HeatmapMinimap, Minimap
+from render_backend import DrawBackend, Sdl2RendererBackend, create_backend
+from replay import InputRecorder
+from sim_process import SimulationProcess
+from static_layer import StaticLayerCache
+from visibility import FrameVisibility
 
 from variables import (
     TEST_MODE,
+    SIMULATION_TICK_RATE,
+    MAX_CATCH_UP_STEPS,
+    FRAME_RATE_LIMIT,
+    SIMULATION_PROCESS,
+    TIME_WARP_FACTORS,
+    TIME_WARP_UP_KEY,
+    TIME_WARP_DOWN_KEY,
+    TIME_WARP_SAFE_DISTANCE,
+    LATE_INPUT_SAMPLING,
+    RECORDING_PATH,
+    SNAPSHOT_PATH,
+    RENDER_BACKEND,
+    RETAINED_RENDERING,
+    STATIC_TILE_CACHE,
+    STATIC_TILE_SIZE,
+    STATIC_TILE_CACHE_MAX_TILES,
     SCREEN_SIZE,
     MINIMAP_SIZE,
-    WORLD_SIZE,
-    planets,
-    player_ships,
-    asteroids,
-    enemy_ships,
-    areas,
+    MINIMAP_REFRESH_RATE,
+    MINIMAP_MODE,
+    LOD_SHARING_STEPS,
+    LOD_THRESHOLDS,
+    RENDER_SCALE,
+    QUALITY_GOVERNOR,
+    QUALITY_TARGET_FRAME_MS,
+    PARALLEL_RENDERING,
+    CAPTURE_DIRECTORY,
+    CAPTURE_EVERY_NTH_FRAME,
+    CAPTURE_FORMAT,
+    WORLD_SEED,
+    build_universe,
 )
 
 # Initialize Pygame
@@ -27,19 +65,32 @@ pygame.init()
 pygame.display.set_caption("Space Game")
 
 
-SCREEN_SURFACE = pygame.display.set_mode(SCREEN_SIZE)
+if RENDER_BACKEND == "sdl2":
+    # The renderer needs a window of its own, the display-module's hidden window
+    # only lets images be converted to the display's pixel format.
+    pygame.display.set_mode((1, 1), pygame.HIDDEN)
+    window = Window("Space Game", SCREEN_SIZE)
+    SCREEN_SURFACE = pygame.Surface(SCREEN_SIZE)
+    backend = Sdl2RendererBackend(window, SCREEN_SURFACE)
+else:
+    SCREEN_SURFACE = pygame.display.set_mode(SCREEN_SIZE)
+    backend = create_backend(RENDER_BACKEND)
 
 
-universe = Universe(
-    WORLD_SIZE,
-    planets,
-    asteroids,
-    player_ships,
-    areas,
-    enemy_ships,
-    ["assets/astral-0.png", "assets/astral-1.png", "assets/astral-1.png"],
+seed = WORLD_SEED if WORLD_SEED is not None else random.randrange(2**32)
+universe = build_universe(seed)
+if SNAPSHOT_PATH is not None:
+    universe.load_snapshot(SNAPSHOT_PATH)
+player_ships = universe.player_ships
+# Forked before any thread is started, as forking copies only the calling thread
+simulation = (
+    SimulationProcess(universe, SIMULATION_TICK_RATE, MAX_CATCH_UP_STEPS)
+    if SIMULATION_PROCESS
+    else None
 )
 cameras: list[Camera] = []
+# Screen-region of each camera, pushed to the display when it changed
+viewports: list[Rect] = []
 
 player_count = len(player_ships)
 for player_ix, player in enumerate(player_ships):
@@ -47,55 +98,319 @@ for player_ix, player in enumerate(player_ships):
     topleft = (player_ix * SCREEN_SIZE.x / player_count, 0)
     size = (SCREEN_SIZE.x / player_count, SCREEN_SIZE.y)
     subsurface = SCREEN_SURFACE.subsurface((topleft, size))
-    camera = Camera(player.pos, 1.0, subsurface)
+    camera = Camera(
+        player.pos, 1.0, subsurface, LOD_THRESHOLDS, backend, RENDER_SCALE,
+    )
     cameras.append(camera)
+    viewports.append(Rect(subsurface.get_abs_offset(), subsurface.get_size()))
+
+minimap_rect = Rect((SCREEN_SIZE.x - MINIMAP_SIZE.x, 0), MINIMAP_SIZE)
+minimap_surface = SCREEN_SURFACE.subsurface(minimap_rect)
+
+minimap_class = HeatmapMinimap if MINIMAP_MODE == "heatmap" else Minimap
+minimap = minimap_class(universe, minimap_surface, MINIMAP_REFRESH_RATE)
 
-minimap_surface = SCREEN_SURFACE.subsurface(
-    ((SCREEN_SIZE.x - MINIMAP_SIZE.x, 0), MINIMAP_SIZE),
+visibility = FrameVisibility()
+# One display list per level of detail, which any number of cameras may share
+display_lists = [DisplayList() for _ in range(player_count)]
+# The display list each active camera replays, by the camera's id
+camera_display_lists: dict[int, DisplayList] = {}
+static_layer = StaticLayerCache(
+    universe, STATIC_TILE_SIZE, STATIC_TILE_CACHE_MAX_TILES,
 )
 
-minimap_camera = Camera(WORLD_SIZE / 2, MINIMAP_SIZE.x / WORLD_SIZE.x, minimap_surface)
+governor = QualityGovernor(QUALITY_TARGET_FRAME_MS)
+# Swapped in for `backend` when the governor turns anti-aliasing off
+aliased_backend = DrawBackend() if RENDER_BACKEND == "gfxdraw" else backend
+
+
+def apply_quality(level: QualityLevel) -> None:
+    """Apply a quality level's knobs to the cameras and the minimap.
+
+    The number of background-layers is read from the governor when drawing.
+
+    Args:
+    ----
+        level (QualityLevel): Quality level to apply
+
+    """
+    simple_threshold, dot_threshold = LOD_THRESHOLDS
+    for camera in cameras:
+        camera.backend = backend if level.anti_aliasing else aliased_backend
+        camera.lod_thresholds = (
+            simple_threshold * level.lod_factor,
+            dot_threshold * level.lod_factor,
+        )
+        camera.set_render_scale(RENDER_SCALE * level.render_scale_factor)
+    minimap.refresh_rate = MINIMAP_REFRESH_RATE * level.minimap_refresh_factor
+
+
+def draw_world(camera: Camera, include_static: bool) -> None:
+    """Draw the universe's objects on `camera`, from the display list if enabled.
+
+    Args:
+    ----
+        camera (Camera): Camera to draw on
+        include_static (bool): Whether to draw areas and planets
+
+    """
+    if RETAINED_RENDERING:
+        camera_display_lists[id(camera)].replay(camera, include_static)
+    else:
+        universe.draw(camera, include_static)
+
+
+def render_viewport(player_ix: int, gameover: bool) -> None:
+    """Render a player's viewport, touching nothing but its own subsurface.
+
+    Args:
+    ----
+        player_ix (int): Player whose viewport to render
+        gameover (bool): Whether to show "GAME OVER" instead of the world
+
+    """
+    player_camera = cameras[player_ix]
+    player_camera.start_drawing_new_frame()
+    if not gameover:
+        universe.draw_background(player_camera, governor.level.background_layers)
+        if STATIC_TILE_CACHE:
+            static_layer.draw(player_camera)
+            draw_world(player_camera, include_static=False)
+        else:
+            universe.draw_grid(player_camera)
+            draw_world(player_camera, include_static=True)
+        universe.particles.draw(player_camera)
+    # The HUD is drawn after upscaling, to stay at native resolution
+    player_camera.upscale()
+    if gameover:
+        font = pygame.font.Font(None, int(64 / player_count))
+        player_camera.draw_text("GAME OVER", None, font, Color("red"))
+    else:
+        universe.draw_text(player_camera, player_ix)
+        if game_loop.warp > 1:
+            font = pygame.font.Font(None, 32)
+            height = player_camera.target.get_height()
+            player_camera.draw_text(
+                f"Time warp: {game_loop.warp}x",
+                Vec2(10, height - 40),
+                font,
+                Color("white"),
+            )
+
+
+# Viewports and the minimap render in parallel on this, if enabled
+render_pool = ThreadPoolExecutor(player_count + 1) if PARALLEL_RENDERING else None
+
+def render_frame(dt: float, gameovers: list[bool]) -> list[Rect]:
+    """Render all viewports and the minimap onto the screen, without presenting.
+
+    Args:
+    ----
+        dt (float): Time passed since the last frame
+        gameovers (list[bool]): Whether each player's game is over
+
+    Returns:
+    -------
+        list[Rect]: Regions of the screen that changed
+
+    """
+    # Move all cameras first, so that visibility is computed once for all of them
+    for player_ix, player_camera in enumerate(cameras):
+        if not gameovers[player_ix]:
+            universe.move_camera(player_camera, player_ix, dt)
+    active_cameras = [c for c, gameover in zip(cameras, gameovers) if not gameover]
+    visibility.compute(universe, active_cameras)
+    if RETAINED_RENDERING:
+        # Run every object's `draw` once per level of detail, no matter how many
+        # cameras see it. Cameras zoomed nearly alike share a recording of what
+        # any of them sees, recorded through the first of them.
+        camera_display_lists.clear()
+        lod_groups: dict[tuple[int, int], list[Camera]] = {}
+        for player_camera in active_cameras:
+            lod_key = player_camera.get_lod_key(LOD_SHARING_STEPS)
+            lod_groups.setdefault(lod_key, []).append(player_camera)
+        for display_list, group in zip(display_lists, lod_groups.values()):
+            if len(group) == 1:
+                objects = group[0].visible_objects
+            else:
+                seen = {id(obj) for camera in group for obj in camera.visible_objects}
+                objects = [obj for obj in visibility.union if id(obj) in seen]
+            display_list.clear()
+            universe.record(
+                group[0],
+                display_list,
+                objects,
+                include_static=not STATIC_TILE_CACHE,
+            )
+            for player_camera in group:
+                camera_display_lists[id(player_camera)] = display_list
+
+    dirty_rects: list[Rect] = []
+    rendered_ixs = []
+    for player_ix, gameover in enumerate(gameovers):
+        if not (gameover and gameover_shown[player_ix]):
+            # The sdl2 backend draws text only for the frame it is queued in
+            gameover_shown[player_ix] = gameover and RENDER_BACKEND != "sdl2"
+            dirty_rects.append(viewports[player_ix])
+            rendered_ixs.append(player_ix)
+
+    if render_pool is None:
+        for player_ix in rendered_ixs:
+            render_viewport(player_ix, gameovers[player_ix])
+        minimap_changed = minimap.render(dt)
+    else:
+        futures = [
+            render_pool.submit(render_viewport, player_ix, gameovers[player_ix])
+            for player_ix in rendered_ixs
+        ]
+        minimap_future = render_pool.submit(minimap.render, dt)
+        for future in futures:
+            future.result()
+        minimap_changed = minimap_future.result()
+
+    # The minimap is blitted every frame, as viewports may draw over it
+    minimap.blit()
+    if minimap_changed:
+        dirty_rects.append(minimap_rect)
+    return dirty_rects
+
+
+capture = None
+# sdl2 draws the world on the renderer, which the screen-surface doesn't hold
+if CAPTURE_DIRECTORY is not None and RENDER_BACKEND != "sdl2":
+    capture = FrameCapture(CAPTURE_DIRECTORY, CAPTURE_EVERY_NTH_FRAME, CAPTURE_FORMAT)
 
 clock = pygame.time.Clock()
+game_loop = FixedTimestepLoop(SIMULATION_TICK_RATE, MAX_CATCH_UP_STEPS)
+latency = LatencyTracker()
+
+recorder = None
+if RECORDING_PATH is not None and simulation is None and SNAPSHOT_PATH is None:
+    recorder = InputRecorder(universe, seed, game_loop.tick_dt)
+# Takes the players' input and steps the simulation, recording both if enabled
+simulated = recorder if recorder is not None else universe
+
+
+def sample_input() -> list[tuple[bool, ...]]:
+    """Read the players' input, noting the time for `latency`.
+
+    Returns
+    -------
+        list[tuple[bool, ...]]: Input-state of each player-ship
+
+    """
+    latency.sample()
+    return universe.read_inputs(pygame.key.get_pressed())
+
+
+def step_with_input(dt: float, ticks: int) -> None:
+    """Apply the players' input, and step the universe.
+
+    With LATE_INPUT_SAMPLING, the input is read right before the last step,
+    else the input read at the frame's start is applied before the first step.
+
+    Args:
+    ----
+        dt (float): Passed time per step
+        ticks (int): Number of steps
+
+    """
+    inputs = frame_inputs
+    if LATE_INPUT_SAMPLING:
+        if ticks > 1:
+            simulated.step_ticks(dt, ticks - 1)
+        # Fetch the newest key-states, leaving the events queued for the next frame
+        pygame.event.pump()
+        inputs = sample_input()
+        ticks = 1
+    simulated.apply_inputs(inputs)
+    simulated.step_ticks(dt, ticks)
+
+# Whether a viewport's "GAME OVER" is on screen already, and needn't be redrawn
+gameover_shown = [False] * player_count
+# Whether the whole window must be presented, e.g. after it was uncovered
+full_update = True
+# Warp factor chosen by the players, capped when anything is near them
+time_warp_ix = 0
 
 while True:
-    dt = clock.tick() / 1_000
+    dt = clock.tick(FRAME_RATE_LIMIT) / 1_000
 
-    if any(e.type == pygame.QUIT for e in pygame.event.get()):
+    events = pygame.event.get()
+    if any(e.type == pygame.QUIT for e in events):
         break
+    for event in events:
+        if event.type == pygame.WINDOWEXPOSED:
+            full_update = True
+        elif event.type == pygame.KEYDOWN and event.key == TIME_WARP_UP_KEY:
+            time_warp_ix = min(time_warp_ix + 1, len(TIME_WARP_FACTORS) - 1)
+        elif event.type == pygame.KEYDOWN and event.key == TIME_WARP_DOWN_KEY:
+            time_warp_ix = max(time_warp_ix - 1, 0)
 
-    universe.handle_input(pygame.key.get_pressed())
-    universe.step(dt)
-
-    for player_ix, player_ship in enumerate(player_ships):
-        player_camera = cameras[player_ix]
-        player_camera.start_drawing_new_frame()
-        gameover = (
-            not universe.contains_point(player_ship.pos) or player_ship.health <= 0
-        ) and not TEST_MODE
-        if gameover:
-            font = pygame.font.Font(None, int(64 / player_count))
-            player_camera.draw_text("GAME OVER", None, font, Color("red"))
+    if simulation is None:
+        frame_inputs = [] if LATE_INPUT_SAMPLING else sample_input()
+        game_loop.warp = min(
+            TIME_WARP_FACTORS[time_warp_ix],
+            universe.max_time_warp(TIME_WARP_FACTORS, TIME_WARP_SAFE_DISTANCE),
+        )
+        if game_loop.advance(dt, step_with_input) > 0:
+            latency.mark("simulated")
         else:
-            universe.move_camera(player_camera, player_ix, dt)
-            universe.draw_background(player_camera)
-            universe.draw_grid(player_camera)
-            universe.draw(player_camera)
-            universe.draw_text(player_camera, player_ix)
-
-    minimap_camera.start_drawing_new_frame()
-    universe.draw(minimap_camera)
-    # Draw minimap border
-    # This being worldspace is a kinda bad hack.
-    MINIMAP_BORDER_COLOR = Color("aquamarine")
-    minimap_camera.draw_vertical_hairline(MINIMAP_BORDER_COLOR, 0, 0, WORLD_SIZE.y)
-    minimap_camera.draw_horizontal_hairline(
-        MINIMAP_BORDER_COLOR,
-        0,
-        WORLD_SIZE.x,
-        WORLD_SIZE.y - 1,
+            # The input is read again before it's first used
+            latency.discard()
+        alpha = game_loop.alpha
+    else:
+        latency.sample()
+        simulation.send_input(universe.read_inputs(pygame.key.get_pressed()))
+        simulation.sync()
+        universe.step_particles(dt)
+        # The published state is the latest one, there's none to interpolate to
+        alpha = 1.0
+
+    gameovers = [
+        (not universe.contains_point(player_ship.pos) or player_ship.health <= 0)
+        and not TEST_MODE
+        for player_ship in player_ships
+    ]
+
+    render_start = time.perf_counter()
+    with universe.interpolated(alpha):
+        dirty_rects = render_frame(dt, gameovers)
+    latency.mark("rendered")
+    backend.present(
+        SCREEN_SURFACE, [minimap_rect], None if full_update else dirty_rects,
     )
-    pygame.display.flip()
+    latency.mark("presented")
+    # Judged by rendering alone, as the frame-rate limit, catch-up steps
+    # and time warp all stretch a frame without quality being at fault
+    render_time = time.perf_counter() - render_start
+    if QUALITY_GOVERNOR and governor.update(render_time, dt):
+        apply_quality(governor.level)
+    latency.end_frame()
+    full_update = False
+    if capture is not None:
+        capture.capture(SCREEN_SURFACE)
 
+if render_pool is not None:
+    render_pool.shutdown()
+if simulation is not None:
+    simulation.close()
+if capture is not None:
+    capture.close()
+    print(
+        f"Captured {capture.frames_written} frames,"
+        f" dropped {capture.dropped_frames} to keep up",
+    )
+    if capture.write_error is not None:
+        print(
+            f"Failed to write {capture.failed_frames} frames:"
+            f" {capture.write_error}",
+        )
+if recorder is not None:
+    recording = recorder.save(RECORDING_PATH)
+    print(f"Recorded {len(recording.ticks)} steps of seed {seed} to {RECORDING_PATH}")
+if simulation is None:
+    print(game_loop.summary())
+print(latency.summary())
 pygame.quit()
 sys.exit()
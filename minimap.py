@@ -0,0 +1,229 @@
+"""A cheap overview of the whole universe."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pygame
+import pygame.surfarray
+from pygame import Color
+
+from camera import Camera
+from state_export import ENTITY_KINDS
+
+if TYPE_CHECKING:
+    from universe import Universe
+
+MINIMAP_BORDER_COLOR = Color("aquamarine")
+
+# Number of objects in a single heatmap-pixel at which its color saturates
+HEATMAP_SATURATION = 3
+# Kinds of entities, see state_export.py, drawn by each heatmap
+_ASTEROID_KINDS = [ENTITY_KINDS.index("Asteroid")]
+_ENEMY_KINDS = [ENTITY_KINDS.index("BulletEnemy"), ENTITY_KINDS.index("RocketEnemy")]
+_PROJECTILE_KINDS = [ENTITY_KINDS.index("Bullet"), ENTITY_KINDS.index("Rocket")]
+
+
+class Minimap:
+    """Draws a universe's areas, planets and border once into a cached surface,
+    and overlays moving objects as dots at a reduced rate.
+    """
+
+    def __init__(
+        self, universe: Universe, surface: pygame.Surface, refresh_rate: float,
+    ) -> None:
+        """Create a new minimap covering the whole universe.
+
+        Args:
+        ----
+            universe (Universe): Universe to display
+            surface (pygame.Surface): Surface to draw on
+            refresh_rate (float): How often per second moving objects are redrawn,
+                0 to redraw them every frame
+
+        """
+        self.universe = universe
+        self.surface = surface
+        self.refresh_rate = refresh_rate
+        zoom = surface.get_width() / universe.size.x
+        self.camera = Camera(universe.size / 2, zoom, surface)
+
+        self._static_surface = pygame.Surface(surface.get_size())
+        self._static_version: int | None = None
+        self._composed_surface = pygame.Surface(surface.get_size())
+        self._time_since_refresh = float("inf")
+
+    def _render_static(self) -> None:
+        """Render areas, planets and border into the cached static surface."""
+        static_camera = Camera(
+            self.universe.size / 2, self.camera.zoom, self._static_surface,
+        )
+        static_camera.start_drawing_new_frame()
+        self.universe.draw_static(static_camera, include_grid=False)
+        # This being worldspace is a kinda bad hack.
+        width, height = self.universe.size
+        static_camera.draw_vertical_hairline(MINIMAP_BORDER_COLOR, 0, 0, height)
+        static_camera.draw_horizontal_hairline(
+            MINIMAP_BORDER_COLOR, 0, width, height - 1,
+        )
+        self._static_version = self.universe.static_version
+
+    def _render_dynamic(self) -> None:
+        """Compose the static surface with dots for all moving objects."""
+        surface = self._composed_surface
+        surface.blit(self._static_surface, (0, 0))
+        zoom = self.camera.zoom
+        px, py = self.camera.pos
+        universe = self.universe
+
+        for asteroid in universe.asteroids:
+            center = ((asteroid.pos.x - px) * zoom, (asteroid.pos.y - py) * zoom)
+            pygame.draw.circle(
+                surface, asteroid.color, center, max(1, asteroid.radius * zoom),
+            )
+        for ship in universe.enemy_ships + universe.player_ships:
+            for projectile in ship.projectiles:
+                surface.set_at(
+                    (
+                        int((projectile.pos.x - px) * zoom),
+                        int((projectile.pos.y - py) * zoom),
+                    ),
+                    projectile.color,
+                )
+        for ship in universe.enemy_ships + universe.player_ships:
+            x, y = int((ship.pos.x - px) * zoom), int((ship.pos.y - py) * zoom)
+            surface.fill(ship.color, ((x - 1, y - 1), (3, 3)))
+
+    def render(self, dt: float) -> bool:
+        """Refresh the minimap's private surfaces, if it's due, without drawing it.
+
+        Touches nothing but the minimap itself, so it may run on another thread
+        while the screen is drawn.
+
+        Args:
+        ----
+            dt (float): Passed time since the last call
+
+        Returns:
+        -------
+            bool: True iff the minimap's content changed
+
+        """
+        changed = False
+        if self._static_version != self.universe.static_version:
+            self._render_static()
+            self._time_since_refresh = float("inf")
+
+        self._time_since_refresh += dt
+        interval = 1 / self.refresh_rate if self.refresh_rate else 0
+        if self._time_since_refresh >= interval:
+            self._render_dynamic()
+            self._time_since_refresh = 0
+            changed = True
+        return changed
+
+    def blit(self) -> None:
+        """Draw the most recently rendered minimap onto its surface."""
+        self.surface.blit(self._composed_surface, (0, 0))
+
+    def draw(self, dt: float) -> bool:
+        """Draw the minimap, refreshing moving objects if they are due.
+
+        Args:
+        ----
+            dt (float): Passed time since the last call
+
+        Returns:
+        -------
+            bool: True iff the minimap's content changed
+
+        """
+        changed = self.render(dt)
+        self.blit()
+        return changed
+
+
+class HeatmapMinimap(Minimap):
+    """A minimap drawing asteroids, enemies and projectiles as density-heatmaps,
+    so its cost doesn't grow with the number of objects drawn.
+
+    Player ships and areas are still drawn as exact markers on top.
+    """
+
+    # Heat-color per kind of object, added up where kinds overlap
+    ASTEROID_COLOR = np.array([160, 160, 160], dtype=np.float32)
+    ENEMY_COLOR = np.array([0, 255, 0], dtype=np.float32)
+    PROJECTILE_COLOR = np.array([255, 40, 160], dtype=np.float32)
+
+    def __init__(
+        self, universe: Universe, surface: pygame.Surface, refresh_rate: float,
+    ) -> None:
+        """Create a new heatmap-minimap covering the whole universe.
+
+        Args:
+        ----
+            universe (Universe): Universe to display
+            surface (pygame.Surface): Surface to draw on
+            refresh_rate (float): How often per second the heatmap is redrawn,
+                0 to redraw it every frame
+
+        """
+        super().__init__(universe, surface, refresh_rate)
+        width, height = surface.get_size()
+        self._heat = np.zeros((width, height, 3), dtype=np.float32)
+        self._static_array = np.zeros((width, height, 3), dtype=np.float32)
+
+    def _render_static(self) -> None:
+        """Render the static surface, and keep a copy of it as an array."""
+        super()._render_static()
+        self._static_array[...] = pygame.surfarray.pixels3d(self._static_surface)
+
+    def _add_heat(self, positions: np.ndarray, color: np.ndarray) -> None:
+        """Bin worldspace-positions into minimap-pixels, and add their heat.
+
+        Args:
+        ----
+            positions (np.ndarray): Worldspace-positions, of shape (count, 2)
+            color (np.ndarray): Color of a saturated pixel
+
+        """
+        if len(positions) == 0:
+            return
+        width, height = self._heat.shape[:2]
+        counts, _, _ = np.histogram2d(
+            positions[:, 0],
+            positions[:, 1],
+            bins=(width, height),
+            range=((0, self.universe.size.x), (0, self.universe.size.y)),
+        )
+        # Square root, so single objects remain visible
+        np.sqrt(counts / HEATMAP_SATURATION, out=counts)
+        np.minimum(counts, 1, out=counts)
+        self._heat += counts[..., np.newaxis] * color
+
+    def _render_dynamic(self) -> None:
+        """Compose the static surface with heatmaps, players and areas."""
+        universe = self.universe
+        heat = self._heat
+        heat[...] = self._static_array
+
+        state = universe.export_state()
+        for kinds, color in (
+            (_ASTEROID_KINDS, self.ASTEROID_COLOR),
+            (_ENEMY_KINDS, self.ENEMY_COLOR),
+            (_PROJECTILE_KINDS, self.PROJECTILE_COLOR),
+        ):
+            self._add_heat(state.pos[np.isin(state.kind, kinds)], color)
+        np.minimum(heat, 255, out=heat)
+        pygame.surfarray.blit_array(self._composed_surface, heat.astype(np.uint8))
+
+        zoom = self.camera.zoom
+        px, py = self.camera.pos
+        for area in universe.areas:
+            topleft = ((area.left - px) * zoom, (area.top - py) * zoom)
+            size = (max(1, area.width * zoom), max(1, area.height * zoom))
+            pygame.draw.rect(self._composed_surface, area.color, (topleft, size), 1)
+        for ship in universe.player_ships:
+            x, y = int((ship.pos.x - px) * zoom), int((ship.pos.y - py) * zoom)
+            self._composed_surface.fill(ship.color, ((x - 1, y - 1), (3, 3)))
@@ -0,0 +1,394 @@
+"""The protocol between the simulation-server and its clients.
+
+Every message is framed by its length and type. The server sends a welcome,
+with the seed the client builds its own copy of the world from, then a snapshot
+per step. The client sends its player's input and the last step it received.
+
+A snapshot holds a quantized record per moving entity, delta-compressed against
+the latest snapshot the client acknowledged: only changed records are sent, as
+differences to their acknowledged values, plus the new ones and the ids of the
+removed ones, all compressed. Planets, areas and everything else that never
+changes isn't sent at all.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import struct
+import zlib
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pygame import Rect
+from pygame.math import Vector2 as Vec2
+
+from projectiles import Bullet, Rocket
+from state_export import ENTITY_KINDS
+
+if TYPE_CHECKING:
+    from ship import Ship
+    from universe import Universe
+
+# Length of the rest of the message, and its type
+FRAME_HEADER = struct.Struct("<IB")
+MESSAGE_WELCOME = 1  # Server to client, see WELCOME
+MESSAGE_INPUT = 2  # Client to server, see INPUT
+MESSAGE_SNAPSHOT = 3  # Server to client, see SNAPSHOT_HEADER
+# Protocol version, world seed, number of player-ships, the client's player-ship,
+# and the server's steps per second
+WELCOME = struct.Struct("<HqHHd")
+PROTOCOL_VERSION = 2
+# Last step whose snapshot was received, the input-state as bits, and half the
+# worldspace-width and -height of the client's camera-view
+INPUT = struct.Struct("<IBHH")
+# Step, step of the baseline the entities are delta-compressed against, and the
+# client's own fuel and ammo, followed by the compressed entities
+SNAPSHOT_HEADER = struct.Struct("<IIfI")
+# Numbers of changed, new and removed entities, in front of the entities
+DELTA_HEADER = struct.Struct("<III")
+# Stands in for a step when there's none, e.g. a snapshot without a baseline
+NO_TICK = 0xFFFF_FFFF
+# Snapshots the server keeps per client to delta-compress against. Older
+# acknowledgements get a full snapshot.
+SNAPSHOT_HISTORY = 64
+
+# Positions are sent in 1/POSITION_SCALE worldspace-units, velocities in
+# worldspace-units per second, angles in 1/ANGLE_SCALE degrees
+POSITION_SCALE = 16
+ANGLE_SCALE = 65_536 / 360
+
+# Record of an entity. Every field is an integer, so that differences wrap around.
+ENTITY_DTYPE = np.dtype(
+    [
+        ("id", "<u4"),
+        ("kind", "u1"),  # Index into ENTITY_KINDS
+        ("owner", "<u4"),  # Id of a projectile's ship, 0 for everything else
+        ("x", "<i4"),
+        ("y", "<i4"),
+        ("vx", "<i2"),
+        ("vy", "<i2"),
+        ("angle", "<u2"),
+        ("health", "u1"),
+        # Rotate-left-, rotate-right-, forward- and backward-thrusters, and trophy
+        # of ships, whether rockets are homing
+        ("flags", "u1"),
+    ],
+)
+DELTA_FIELDS = [name for name in ENTITY_DTYPE.names if name != "id"]
+_BULLET = ENTITY_KINDS.index("Bullet")
+_ROCKET = ENTITY_KINDS.index("Rocket")
+
+
+def frame(message_type: int, payload: bytes) -> bytes:
+    """Frame a message for sending.
+
+    Args:
+    ----
+        message_type (int): One of the MESSAGE_* types
+        payload (bytes): Message
+
+    Returns:
+    -------
+        bytes: Framed message
+
+    """
+    return FRAME_HEADER.pack(len(payload), message_type) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """Read a framed message.
+
+    Args:
+    ----
+        reader (asyncio.StreamReader): Stream to read from
+
+    Returns:
+    -------
+        tuple[int, bytes]: Type of the message, and the message
+
+    Raises:
+    ------
+        asyncio.IncompleteReadError: If the stream ended
+
+    """
+    length, message_type = FRAME_HEADER.unpack(
+        await reader.readexactly(FRAME_HEADER.size),
+    )
+    return message_type, await reader.readexactly(length)
+
+
+def ship_flags(ship: Ship) -> int:
+    """Pack the state of a ship's thrusters and trophy into bits.
+
+    Args:
+    ----
+        ship (Ship): Ship to pack
+
+    Returns:
+    -------
+        int: Bits, in the order of ENTITY_DTYPE's flags
+
+    """
+    return (
+        ship.thruster_rot_left
+        | ship.thruster_rot_right << 1
+        | ship.thruster_forward << 2
+        | ship.thruster_backward << 3
+        | ship.has_trophy << 4
+    )
+
+
+class EntityIds:
+    """Ids of a world's entities, which stay the same while they're alive.
+
+    Asteroids, player-ships and the initial enemies are numbered in that order,
+    which a client building the same world numbers the same. Projectiles are
+    numbered as they're first seen.
+    """
+
+    def __init__(self, universe: Universe) -> None:
+        """Number the entities of a freshly built universe.
+
+        Args:
+        ----
+            universe (Universe): Universe to number
+
+        """
+        self.universe = universe
+        ships = universe.player_ships + universe.enemy_ships
+        first_ship_id = len(universe.asteroids)
+        self.ship_ids = {
+            id(ship): first_ship_id + ix for ix, ship in enumerate(ships)
+        }
+        self._next_projectile_id = first_ship_id + len(ships)
+        self._projectile_ids: dict[int, int] = {}
+
+    def records(self) -> np.ndarray:
+        """Quantize the state of every moving entity.
+
+        Returns
+        -------
+            np.ndarray: Records of ENTITY_DTYPE, sorted by id
+
+        """
+        universe = self.universe
+        state = universe.export_state()
+        records = np.zeros(len(state), ENTITY_DTYPE)
+        records["kind"] = state.kind
+        records["x"] = np.rint(state.pos[:, 0] * POSITION_SCALE)
+        records["y"] = np.rint(state.pos[:, 1] * POSITION_SCALE)
+        velocities = np.clip(np.rint(state.vel), -32_768, 32_767)
+        records["vx"] = velocities[:, 0]
+        records["vy"] = velocities[:, 1]
+
+        asteroid_count = len(universe.asteroids)
+        records["id"][:asteroid_count] = np.arange(asteroid_count)
+        ships = universe.player_ships + universe.enemy_ships
+        ship_stop = asteroid_count + len(ships)
+        ship_ids = [self.ship_ids[id(ship)] for ship in ships]
+        records["id"][asteroid_count:ship_stop] = ship_ids
+        records["angle"][asteroid_count:ship_stop] = [
+            round(ship.angle % 360 * ANGLE_SCALE) % 65_536 for ship in ships
+        ]
+        records["health"][asteroid_count:ship_stop] = np.clip(
+            state.health[asteroid_count:ship_stop], 0, 255,
+        )
+        records["flags"][asteroid_count:ship_stop] = [
+            ship_flags(ship) for ship in ships
+        ]
+
+        # Projectiles follow in the order of their ships
+        projectile_ids = {}
+        projectile_rows = []
+        for ship, ship_id in zip(ships, ship_ids):
+            for projectile in ship.projectiles:
+                key = id(projectile)
+                projectile_id = self._projectile_ids.get(key)
+                if projectile_id is None:
+                    projectile_id = self._next_projectile_id
+                    self._next_projectile_id += 1
+                projectile_ids[key] = projectile_id
+                homing = (
+                    isinstance(projectile, Rocket)
+                    and projectile.homing_timer <= projectile.homing_duration
+                )
+                projectile_rows.append((projectile_id, ship_id, homing))
+        self._projectile_ids = projectile_ids
+        if projectile_rows:
+            rows = np.array(projectile_rows, dtype=np.uint32)
+            records["id"][ship_stop:] = rows[:, 0]
+            records["owner"][ship_stop:] = rows[:, 1]
+            records["flags"][ship_stop:] = rows[:, 2]
+
+        records.sort(order="id")
+        return records
+
+
+def encode_delta(records: np.ndarray, baseline: np.ndarray) -> bytes:
+    """Delta-compress entity-records against the ones a client already has.
+
+    Args:
+    ----
+        records (np.ndarray): Records to send, sorted by id
+        baseline (np.ndarray): Records the client has, sorted by id,
+            empty to send everything
+
+    Returns:
+    -------
+        bytes: Compressed changes, new records, and ids of removed ones
+
+    """
+    ixs = np.searchsorted(baseline["id"], records["id"])
+    in_baseline = ixs < len(baseline)
+    in_baseline[in_baseline] = (
+        baseline["id"][ixs[in_baseline]] == records["id"][in_baseline]
+    )
+    previous = baseline[ixs[in_baseline]]
+    kept = records[in_baseline]
+    changed = kept != previous
+    deltas = kept[changed]
+    for name in DELTA_FIELDS:
+        # Integer-differences wrap around, and are undone by adding them back
+        deltas[name] -= previous[name][changed]
+    added = records[~in_baseline]
+    removed = baseline["id"][~np.isin(baseline["id"], records["id"])]
+    payload = b"".join(
+        (
+            DELTA_HEADER.pack(len(deltas), len(added), len(removed)),
+            deltas.tobytes(),
+            added.tobytes(),
+            removed.tobytes(),
+        ),
+    )
+    return zlib.compress(payload, 1)
+
+
+def decode_delta(data: bytes, baseline: np.ndarray) -> np.ndarray:
+    """Undo `encode_delta`.
+
+    Args:
+    ----
+        data (bytes): Compressed changes, as encoded against `baseline`
+        baseline (np.ndarray): Records the changes are relative to
+
+    Returns:
+    -------
+        np.ndarray: The encoded records, sorted by id
+
+    """
+    payload = zlib.decompress(data)
+    changed_count, added_count, removed_count = DELTA_HEADER.unpack_from(payload)
+    offset = DELTA_HEADER.size
+    deltas = np.frombuffer(payload, ENTITY_DTYPE, changed_count, offset)
+    offset += deltas.nbytes
+    added = np.frombuffer(payload, ENTITY_DTYPE, added_count, offset)
+    offset += added.nbytes
+    removed = np.frombuffer(payload, "<u4", removed_count, offset)
+
+    records = baseline[~np.isin(baseline["id"], removed)]
+    ixs = np.searchsorted(records["id"], deltas["id"])
+    for name in DELTA_FIELDS:
+        records[name][ixs] += deltas[name]
+    records = np.concatenate((records, added))
+    records.sort(order="id")
+    return records
+
+
+class WorldMirror:
+    """Mirrors received entity-records into a client's copy of the world.
+
+    The copy must have been built like the server's, so that its entities are
+    numbered the same. It's only drawn, never stepped. Entities without a
+    record, e.g. ones the client isn't interested in, are left out of it.
+    """
+
+    def __init__(self, universe: Universe) -> None:
+        """Mirror into `universe`.
+
+        Args:
+        ----
+            universe (Universe): Freshly built copy of the server's world
+
+        """
+        self.universe = universe
+        self.bodies = [
+            *universe.asteroids,
+            *universe.player_ships,
+            *universe.enemy_ships,
+        ]
+        self._first_player = len(universe.asteroids)
+        self._first_enemy = self._first_player + len(universe.player_ships)
+        self._projectiles: dict[int, Bullet] = {}
+
+    def apply(self, records: np.ndarray, visible_rect: Rect | None = None) -> None:
+        """Move the world's entities to the received state.
+
+        Args:
+        ----
+            records (np.ndarray): Records of ENTITY_DTYPE
+            visible_rect (Rect | None, optional): Worldspace-rectangle the
+                client sees. Enemies vanishing within it were destroyed, and
+                explode, others may have just left the client's interest.
+                None if every vanishing enemy was destroyed. Defaults to None.
+
+        """
+        universe = self.universe
+        for ship in self.bodies[self._first_player :]:
+            ship.projectiles.clear()
+        asteroids = []
+        player_ships = []
+        enemy_ships = []
+        projectiles = {}
+        for entity_id, kind, owner, x, y, vx, vy, angle, health, flags in zip(
+            *(records[name].tolist() for name in ENTITY_DTYPE.names),
+        ):
+            pos = (x / POSITION_SCALE, y / POSITION_SCALE)
+            if kind in (_BULLET, _ROCKET):
+                ship = self.bodies[owner]
+                projectile = self._projectiles.get(entity_id)
+                if projectile is None:
+                    projectile = (
+                        Rocket(Vec2(pos), Vec2(vx, vy), ship.color, ship)
+                        if kind == _ROCKET
+                        else Bullet(Vec2(pos), Vec2(vx, vy), ship.bullet_color)
+                    )
+                projectile.pos.update(pos)
+                projectile.vel.update(vx, vy)
+                projectile.prev_pos.update(pos)
+                if kind == _ROCKET:
+                    # Only decides whether the rocket is drawn homing
+                    projectile.homing_timer = (
+                        0 if flags & 1 else projectile.homing_duration + 1
+                    )
+                ship.projectiles.append(projectile)
+                projectiles[entity_id] = projectile
+                continue
+            body = self.bodies[entity_id]
+            body.pos.update(pos)
+            body.vel.update(vx, vy)
+            body.prev_pos.update(pos)
+            if entity_id < self._first_player:
+                asteroids.append(body)
+            else:
+                body.angle = angle / ANGLE_SCALE
+                body.health = health
+                body.thruster_rot_left = bool(flags & 1)
+                body.thruster_rot_right = bool(flags & 2)
+                body.thruster_forward = bool(flags & 4)
+                body.thruster_backward = bool(flags & 8)
+                body.has_trophy = bool(flags & 16)
+                if entity_id >= self._first_enemy:
+                    enemy_ships.append(body)
+                else:
+                    player_ships.append(body)
+        self._projectiles = projectiles
+        vanished = set(map(id, universe.enemy_ships)) - set(map(id, enemy_ships))
+        for ship in universe.enemy_ships:
+            if id(ship) in vanished and (
+                visible_rect is None or visible_rect.collidepoint(ship.pos)
+            ):
+                universe.explode(ship)
+        universe.asteroids[:] = asteroids
+        universe.player_ships[:] = player_ships
+        universe.enemy_ships[:] = enemy_ships
+        universe.mark_moved()
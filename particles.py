@@ -0,0 +1,229 @@
+"""Short-lived, purely cosmetic particles, like thruster exhaust and explosions.
+
+Particles live in preallocated NumPy arrays, and are stepped and drawn in
+batches, so there are no Python objects per particle. Temporaries are written
+into preallocated scratch-arrays too, so emitting, stepping and drawing don't
+allocate arrays per frame.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pygame
+import pygame.surfarray
+from pygame import Color
+from pygame.math import Vector2 as Vec2
+
+if TYPE_CHECKING:
+    from camera import Camera
+
+
+class _DrawScratch:
+    """Scratch-arrays for drawing, one set per drawing thread."""
+
+    def __init__(self, capacity: int) -> None:
+        """Allocate scratch-arrays for drawing up to `capacity` particles.
+
+        Args:
+        ----
+            capacity (int): Maximum number of particles alive at once
+
+        """
+        self.screen = np.zeros((capacity, 2), dtype=np.float64)
+        self.pixel = np.zeros((capacity, 2), dtype=np.intp)
+        self.visible = np.zeros(capacity, dtype=bool)
+        self.in_range = np.zeros(capacity, dtype=bool)
+        self.fade = np.zeros(capacity, dtype=np.float64)
+        self.xs = np.zeros(capacity, dtype=np.intp)
+        self.ys = np.zeros(capacity, dtype=np.intp)
+        self.visible_fade = np.zeros(capacity, dtype=np.float64)
+        self.colors = np.zeros((capacity, 3), dtype=np.float64)
+
+
+class ParticleSystem:
+    """A fixed-capacity ring buffer of particles.
+
+    Emitting more particles than fit overwrites the oldest ones.
+    A particle's brightness fades out over its lifetime.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Create a new particle system without any living particles.
+
+        Args:
+        ----
+            capacity (int): Maximum number of particles alive at once
+
+        """
+        self.capacity = capacity
+        self.pos = np.zeros((capacity, 2), dtype=np.float64)
+        self.vel = np.zeros((capacity, 2), dtype=np.float64)
+        # Remaining and total lifetime in seconds, dead once `life` <= 0
+        self.life = np.zeros(capacity, dtype=np.float64)
+        self.max_life = np.ones(capacity, dtype=np.float64)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+
+        # Particles have their own random numbers, so that they
+        # never change the outcome of the seeded simulation
+        self._rng = np.random.default_rng()
+        self._next = 0
+        self._slots = np.arange(capacity)
+        self._step_scratch = np.zeros((capacity, 2), dtype=np.float64)
+        self._emit_slots = np.zeros(capacity, dtype=np.intp)
+        self._emit_angles = np.zeros(capacity, dtype=np.float64)
+        self._emit_speeds = np.zeros(capacity, dtype=np.float64)
+        self._emit_scratch = np.zeros(capacity, dtype=np.float64)
+        self._emit_colors = np.zeros((capacity, 3), dtype=np.float64)
+        # Viewports may be drawn on several threads at once
+        self._draw_scratch = threading.local()
+
+    def emit(
+        self,
+        count: float,
+        pos: Vec2,
+        vel: Vec2,
+        direction: Vec2 | None,
+        spread: float,
+        speed: float,
+        life: float,
+        color: Color,
+    ) -> None:
+        """Emit particles from a single point.
+
+        Args:
+        ----
+            count (float): Number of particles. Fractions are rounded randomly,
+                so emitting `rate * dt` particles per step averages to `rate`.
+            pos (Vec2): Worldspace-position to emit from
+            vel (Vec2): Velocity of the emitter, added to the particles'
+            direction (Vec2 | None): Direction to emit towards,
+                None for all directions
+            spread (float): Maximum deviation from `direction`, in degrees
+            speed (float): Maximum speed relative to the emitter
+            life (float): Maximum lifetime in seconds
+            color (Color): Color at full brightness
+
+        """
+        whole_count = min(int(count + self._rng.random()), self.capacity)
+        if whole_count == 0:
+            return
+        slots = self._emit_slots[:whole_count]
+        np.add(self._slots[:whole_count], self._next, out=slots)
+        slots %= self.capacity
+        self._next = (self._next + whole_count) % self.capacity
+
+        if direction is None:
+            angles = self._uniform(0, 2 * math.pi, self._emit_angles[:whole_count])
+        else:
+            center = math.atan2(direction.y, direction.x)
+            deviation = math.radians(spread)
+            angles = self._uniform(
+                center - deviation, center + deviation, self._emit_angles[:whole_count],
+            )
+        speeds = self._uniform(0.2 * speed, speed, self._emit_speeds[:whole_count])
+        scratch = self._emit_scratch[:whole_count]
+        self.pos[slots] = (pos.x, pos.y)
+        np.cos(angles, out=scratch)
+        scratch *= speeds
+        scratch += vel.x
+        self.vel[slots, 0] = scratch
+        np.sin(angles, out=scratch)
+        scratch *= speeds
+        scratch += vel.y
+        self.vel[slots, 1] = scratch
+        lives = self._uniform(0.5 * life, life, scratch)
+        self.life[slots] = lives
+        self.max_life[slots] = lives
+        # Slight variations in brightness, so clouds of particles look less flat
+        brightness = self._uniform(0.7, 1.0, scratch)
+        colors = self._emit_colors[:whole_count]
+        colors[:] = (color.r, color.g, color.b)
+        colors *= brightness[:, np.newaxis]
+        self.color[slots] = colors
+
+    def _uniform(self, low: float, high: float, out: np.ndarray) -> np.ndarray:
+        """Fill `out` with random numbers, uniformly distributed in [low, high).
+
+        Args:
+        ----
+            low (float): Lower bound
+            high (float): Upper bound, excluded
+            out (np.ndarray): Array to fill
+
+        Returns:
+        -------
+            np.ndarray: `out`
+
+        """
+        self._rng.random(out=out)
+        out *= high - low
+        out += low
+        return out
+
+    def step(self, dt: float) -> None:
+        """Move and age all particles.
+
+        Args:
+        ----
+            dt (float): Passed time
+
+        """
+        np.multiply(self.vel, dt, out=self._step_scratch)
+        self.pos += self._step_scratch
+        self.life -= dt
+
+    def alive_count(self) -> int:
+        """Count the living particles.
+
+        Returns
+        -------
+            int: Number of living particles
+
+        """
+        return int(np.count_nonzero(self.life > 0))
+
+    def draw(self, camera: Camera) -> None:
+        """Draw all living particles visible on `camera` as single pixels, at once.
+
+        Args:
+        ----
+            camera (Camera): Camera to draw on
+
+        """
+        scratch = getattr(self._draw_scratch, "arrays", None)
+        if scratch is None:
+            scratch = self._draw_scratch.arrays = _DrawScratch(self.capacity)
+        visible, in_range = scratch.visible, scratch.in_range
+        np.greater(self.life, 0, out=visible)
+        if not visible.any():
+            return
+        width, height = camera.surface.get_size()
+        screen, pixel = scratch.screen, scratch.pixel
+        np.subtract(self.pos, (camera.pos.x, camera.pos.y), out=screen)
+        screen *= camera.zoom
+        # Truncates towards zero, like `astype`
+        np.copyto(pixel, screen, casting="unsafe")
+        for axis, size in ((0, width), (1, height)):
+            np.greater_equal(pixel[:, axis], 0, out=in_range)
+            visible &= in_range
+            np.less(pixel[:, axis], size, out=in_range)
+            visible &= in_range
+        count = int(np.count_nonzero(visible))
+        if count == 0:
+            return
+        xs = np.compress(visible, pixel[:, 0], out=scratch.xs[:count])
+        ys = np.compress(visible, pixel[:, 1], out=scratch.ys[:count])
+        np.divide(self.life, self.max_life, out=scratch.fade)
+        fade = np.compress(visible, scratch.fade, out=scratch.visible_fade[:count])
+        colors = np.compress(visible, self.color, 0, scratch.colors[:count])
+        colors *= fade[:, np.newaxis]
+
+        pixels = pygame.surfarray.pixels3d(camera.surface)
+        # Truncated to whole color-values on assignment
+        pixels[xs, ys] = colors
+        # Unlock the surface right away
+        del pixels
@@ -5,14 +5,20 @@ from __future__ import annotations
 import math
 from typing import TYPE_CHECKING
 
-from pygame import Color
+from pygame import Color, Rect
 from pygame.math import Vector2 as Vec2
 
+from camera import LOD_DOT
+
 if TYPE_CHECKING:
     from camera import Camera
 
 GRAVITATIONAL_CONSTANT = 0.03
 
+# 0 <= bounciness <= 1.
+# At bounciness == 1.0, collisions cause no damage.
+BOUNCINESS = 0.97
+
 
 class PhysicalObject:
     """A physical object with dynamic position, dynamic velocity,
@@ -32,6 +38,8 @@ class PhysicalObject:
         self.pos = Vec2(pos)
         self.mass = mass
         self.vel = Vec2(vel)
+        # Position before the last step, for interpolating between steps
+        self.prev_pos = Vec2(pos)
 
     def step(self, dt: float) -> None:
         """Apply its velocity to `self`.
@@ -41,6 +49,7 @@ class PhysicalObject:
             dt (float): Passed time
 
         """
+        self.prev_pos.update(self.pos)
         self.pos += dt * self.vel
 
     def add_impulse(self, impulse: Vec2) -> None:
@@ -82,6 +91,16 @@ class PhysicalObject:
         normalised_delta = delta / math.sqrt(dist_squared)
         return normalised_delta * force_magnitude
 
+    def get_bounding_rect(self) -> Rect:
+        """Get a worldspace-rectangle enclosing everything `draw` might draw.
+
+        Returns
+        -------
+            Rect: Worldspace-bounding-rectangle
+
+        """
+        return Rect(self.pos, (0, 0)).inflate(2, 2)
+
     def draw(self, camera: Camera) -> None:
         """Draw `self` on `camera`. Implemented by subclasses.
 
@@ -131,7 +150,21 @@ class Disk(PhysicalObject):
             camera (Camera): Camera to draw on
 
         """
-        camera.draw_circle(self.color, self.pos, self.radius)
+        if camera.get_lod(2 * self.radius) == LOD_DOT:
+            camera.draw_dot(self.color, self.pos)
+        else:
+            camera.draw_circle(self.color, self.pos, self.radius)
+
+    def get_bounding_rect(self) -> Rect:
+        """Get a worldspace-rectangle enclosing `self`.
+
+        Returns
+        -------
+            Rect: Worldspace-bounding-rectangle
+
+        """
+        diameter = 2 * self.radius
+        return Rect(self.pos - Vec2(self.radius), (diameter, diameter)).inflate(2, 2)
 
     def intersects_point(self, vec: Vec2) -> bool:
         """Determine whether `vec` is in `self`.
@@ -183,9 +216,7 @@ class Disk(PhysicalObject):
         # When rewriting this: The pygame.math module already has
         # methods for normal-vector calculation.
 
-        # 0 <= bounciness <= 1.
-        # At bounciness == 1.0, collisions cause no damage.
-        bounciness = 0.97
+        bounciness = BOUNCINESS
 
         # Calculate normal vector
         delta = self.pos - disk.pos
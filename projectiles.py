@@ -2,10 +2,10 @@
 
 from typing import TYPE_CHECKING
 
-from pygame import Color
+from pygame import Color, Rect
 from pygame.math import Vector2 as Vec2
 
-from camera import Camera
+from camera import LOD_FULL, Camera
 from physics import PhysicalObject
 
 if TYPE_CHECKING:
@@ -15,6 +15,9 @@ if TYPE_CHECKING:
 class Bullet(PhysicalObject):
     """A triangular bullet."""
 
+    # Worldspace-distance from `pos` to the outermost drawn point
+    draw_radius: float = 4
+
     def __init__(self, pos: Vec2, vel: Vec2, color: Color) -> None:
         """Create a new basic Bullet.
 
@@ -28,6 +31,17 @@ class Bullet(PhysicalObject):
         super().__init__(pos, vel, 1.0)
         self.color = Color(color)
 
+    def get_bounding_rect(self) -> Rect:
+        """Get a worldspace-rectangle enclosing `self`.
+
+        Returns
+        -------
+            Rect: Worldspace-bounding-rectangle
+
+        """
+        size = 2 * self.draw_radius
+        return Rect(self.pos - Vec2(self.draw_radius), (size, size)).inflate(2, 2)
+
     def draw(self, camera: Camera) -> None:
         """Draw `self` on `camera`.
 
@@ -36,6 +50,10 @@ class Bullet(PhysicalObject):
             camera (Camera): Camera to draw on
 
         """
+        if camera.get_lod(2 * self.draw_radius) != LOD_FULL:
+            # Too small to make out its shape anyways
+            camera.draw_dot(self.color, self.pos)
+            return
         forward = self.vel.normalize() if self.vel != Vec2(0, 0) else Vec2(1, 0)
         camera.draw_polygon(
             self.color,
@@ -50,6 +68,8 @@ class Bullet(PhysicalObject):
 class Rocket(Bullet):
     """A pentagonal bullet, homing on a target-ship."""
 
+    draw_radius: float = 6
+
     def __init__(self, pos: Vec2, vel: Vec2, color: Color, target_ship: "Ship") -> None:
         """Create a new rocket targeting `target_ship`.
 
@@ -98,6 +118,9 @@ class Rocket(Bullet):
             camera (Camera): Camera to draw on
 
         """
+        if camera.get_lod(2 * self.draw_radius) != LOD_FULL:
+            camera.draw_dot(self.color, self.pos)
+            return
         forward = self.vel.normalize() if self.vel != Vec2(0, 0) else Vec2(1, 0)
         left = Vec2(-forward.y, forward.x)
         right = -left
@@ -0,0 +1,405 @@
+"""Backends rasterizing a Camera's screenspace-primitives.
+
+All coordinates passed to a backend are screenspace-coordinates
+relative to the surface being drawn on.
+"""
+
+from __future__ import annotations
+
+import math
+
+import pygame
+import pygame.gfxdraw
+from pygame import Color, Rect
+from pygame._sdl2.video import Renderer, Texture, Window
+
+type Point = tuple[float, float]
+
+# Diameter of the pre-rendered circle-texture, scaled to draw any circle
+CIRCLE_TEXTURE_SIZE = 128
+
+
+class RenderBackend:
+    """Base-class for backends. Draws nothing."""
+
+    def circle(
+        self, surface: pygame.Surface, x: int, y: int, r: int, color: Color,
+    ) -> None:
+        """Draw a filled circle.
+
+        Args:
+        ----
+            surface (pygame.Surface): Surface to draw on
+            x (int): Center's x-coordinate
+            y (int): Center's y-coordinate
+            r (int): Radius
+            color (Color): Border- and fill-color
+
+        """
+
+    def polygon(
+        self, surface: pygame.Surface, points: list[Point], color: Color,
+    ) -> None:
+        """Draw a filled polygon.
+
+        Args:
+        ----
+            surface (pygame.Surface): Surface to draw on
+            points (list[Point]): Corners
+            color (Color): Border- and fill-color
+
+        """
+
+    def box(self, surface: pygame.Surface, rect: Rect, color: Color) -> None:
+        """Draw a filled rectangle.
+
+        Args:
+        ----
+            surface (pygame.Surface): Surface to draw on
+            rect (Rect): Rectangle
+            color (Color): Fill-color
+
+        """
+
+    def line(
+        self, surface: pygame.Surface, x1: int, y1: int, x2: int, y2: int, color: Color,
+    ) -> None:
+        """Draw a line of single-pixel-thickness.
+
+        Args:
+        ----
+            surface (pygame.Surface): Surface to draw on
+            x1 (int): Start's x-coordinate
+            y1 (int): Start's y-coordinate
+            x2 (int): End's x-coordinate
+            y2 (int): End's y-coordinate
+            color (Color): Line's color
+
+        """
+
+    def pixel(self, surface: pygame.Surface, x: int, y: int, color: Color) -> None:
+        """Draw a single pixel.
+
+        Args:
+        ----
+            surface (pygame.Surface): Surface to draw on
+            x (int): Pixel's x-coordinate
+            y (int): Pixel's y-coordinate
+            color (Color): Pixel's color
+
+        """
+
+    def text(
+        self, surface: pygame.Surface, rendered: pygame.Surface, pos: Point,
+    ) -> None:
+        """Draw rendered text above everything drawn on `surface` so far.
+
+        Args:
+        ----
+            surface (pygame.Surface): Surface to draw on
+            rendered (pygame.Surface): Text, rendered by a font
+            pos (Point): Text's top-left-corner
+
+        """
+
+    def present(
+        self,
+        screen: pygame.Surface,
+        overlays: list[Rect],
+        dirty_rects: list[Rect] | None = None,
+    ) -> None:
+        """Show the finished frame on the display.
+
+        Args:
+        ----
+            screen (pygame.Surface): Surface holding the whole frame
+            overlays (list[Rect]): Regions of `screen` that must end up above
+                everything the backend drew, e.g. the minimap
+            dirty_rects (list[Rect] | None, optional): Regions of `screen` that
+                changed since the last frame, only these are pushed to the
+                display. Defaults to None, pushing the whole frame.
+
+        """
+        if dirty_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
+
+
+class GfxdrawBackend(RenderBackend):
+    """Anti-aliased drawing with `pygame.gfxdraw`. Pretty, but slowest."""
+
+    def circle(
+        self, surface: pygame.Surface, x: int, y: int, r: int, color: Color,
+    ) -> None:
+        """Draw an anti-aliased filled circle, see `RenderBackend.circle`."""
+        pygame.gfxdraw.aacircle(surface, x, y, r, color)
+        pygame.gfxdraw.filled_circle(surface, x, y, r, color)
+
+    def polygon(
+        self, surface: pygame.Surface, points: list[Point], color: Color,
+    ) -> None:
+        """Draw an anti-aliased filled polygon, see `RenderBackend.polygon`."""
+        pygame.gfxdraw.aapolygon(surface, points, color)
+        pygame.gfxdraw.filled_polygon(surface, points, color)
+
+    def box(self, surface: pygame.Surface, rect: Rect, color: Color) -> None:
+        """Draw a filled rectangle, see `RenderBackend.box`."""
+        pygame.gfxdraw.box(surface, rect, color)
+
+    def line(
+        self, surface: pygame.Surface, x1: int, y1: int, x2: int, y2: int, color: Color,
+    ) -> None:
+        """Draw a line, see `RenderBackend.line`."""
+        if x1 == x2:
+            pygame.gfxdraw.vline(surface, x1, y1, y2, color)
+        elif y1 == y2:
+            pygame.gfxdraw.hline(surface, x1, x2, y1, color)
+        else:
+            pygame.gfxdraw.line(surface, x1, y1, x2, y2, color)
+
+    def pixel(self, surface: pygame.Surface, x: int, y: int, color: Color) -> None:
+        """Draw a single pixel, see `RenderBackend.pixel`."""
+        # Pixels outside of the surface are ignored by `set_at`
+        surface.set_at((x, y), color)
+
+    def text(
+        self, surface: pygame.Surface, rendered: pygame.Surface, pos: Point,
+    ) -> None:
+        """Blit rendered text, see `RenderBackend.text`."""
+        surface.blit(rendered, pos)
+
+
+class DrawBackend(GfxdrawBackend):
+    """Aliased drawing with `pygame.draw`. Jagged edges, but faster."""
+
+    def circle(
+        self, surface: pygame.Surface, x: int, y: int, r: int, color: Color,
+    ) -> None:
+        """Draw a filled circle, see `RenderBackend.circle`."""
+        pygame.draw.circle(surface, color, (x, y), r)
+
+    def polygon(
+        self, surface: pygame.Surface, points: list[Point], color: Color,
+    ) -> None:
+        """Draw a filled polygon, see `RenderBackend.polygon`."""
+        pygame.draw.polygon(surface, color, points)
+
+    def box(self, surface: pygame.Surface, rect: Rect, color: Color) -> None:
+        """Draw a filled rectangle, see `RenderBackend.box`."""
+        surface.fill(color, rect)
+
+    def line(
+        self, surface: pygame.Surface, x1: int, y1: int, x2: int, y2: int, color: Color,
+    ) -> None:
+        """Draw a line, see `RenderBackend.line`."""
+        pygame.draw.line(surface, color, (x1, y1), (x2, y2))
+
+
+class Sdl2RendererBackend(DrawBackend):
+    """Drawing with an SDL-renderer, which may or may not use a GPU.
+
+    Primitives drawn onto (subsurfaces of) the screen are queued and only
+    drawn by `present`, on top of the screen's uploaded content, and text
+    is queued to be drawn on top of them. Primitives and text drawn onto any
+    other surface fall back to `DrawBackend`.
+    """
+
+    def __init__(
+        self, window: Window, screen: pygame.Surface, accelerated: int = -1,
+    ) -> None:
+        """Create a new renderer for `window`.
+
+        Args:
+        ----
+            window (Window): Window to present to, must be the size of `screen`
+            screen (pygame.Surface): Offscreen surface holding the whole frame
+            accelerated (int, optional): 1 for a GPU-renderer, 0 for a software-
+                renderer, -1 to prefer a GPU if there is one. Defaults to -1.
+
+        """
+        self.renderer = Renderer(window, accelerated=accelerated)
+        self.screen = screen
+        self._screen_texture = Texture(self.renderer, screen.get_size(), streaming=True)
+
+        circle_surface = pygame.Surface(
+            (CIRCLE_TEXTURE_SIZE, CIRCLE_TEXTURE_SIZE), pygame.SRCALPHA,
+        )
+        radius = CIRCLE_TEXTURE_SIZE // 2 - 1
+        GfxdrawBackend().circle(circle_surface, radius, radius, radius, Color("white"))
+        self._circle_texture = Texture.from_surface(self.renderer, circle_surface)
+
+        # (viewport, kind, args, color), executed by `present`
+        self._queue: list[tuple[Rect, str, tuple, Color]] = []
+        # (viewport, rendered, pos), drawn by `present` above the primitives.
+        # Turned into textures there, as only the renderer's thread may do that.
+        self._text_queue: list[tuple[Rect, pygame.Surface, Point]] = []
+
+    def _viewport(self, surface: pygame.Surface) -> Rect | None:
+        """Get the screen-region of `surface`, if it's part of the screen.
+
+        Args:
+        ----
+            surface (pygame.Surface): Surface to look up
+
+        Returns:
+        -------
+            Rect | None: Screenspace-region, None if not part of the screen
+
+        """
+        if surface is not self.screen and surface.get_abs_parent() is not self.screen:
+            return None
+        return Rect(surface.get_abs_offset(), surface.get_size())
+
+    def circle(
+        self, surface: pygame.Surface, x: int, y: int, r: int, color: Color,
+    ) -> None:
+        """Queue a filled circle, see `RenderBackend.circle`."""
+        viewport = self._viewport(surface)
+        if viewport is None:
+            super().circle(surface, x, y, r, color)
+        else:
+            self._queue.append((viewport, "circle", (x, y, r), color))
+
+    def polygon(
+        self, surface: pygame.Surface, points: list[Point], color: Color,
+    ) -> None:
+        """Queue a filled polygon, see `RenderBackend.polygon`."""
+        viewport = self._viewport(surface)
+        if viewport is None:
+            super().polygon(surface, points, color)
+        else:
+            self._queue.append((viewport, "polygon", (list(points),), color))
+
+    def box(self, surface: pygame.Surface, rect: Rect, color: Color) -> None:
+        """Queue a filled rectangle, see `RenderBackend.box`."""
+        viewport = self._viewport(surface)
+        if viewport is None:
+            super().box(surface, rect, color)
+        else:
+            self._queue.append((viewport, "box", (Rect(rect),), color))
+
+    def line(
+        self, surface: pygame.Surface, x1: int, y1: int, x2: int, y2: int, color: Color,
+    ) -> None:
+        """Queue a line, see `RenderBackend.line`."""
+        viewport = self._viewport(surface)
+        if viewport is None:
+            super().line(surface, x1, y1, x2, y2, color)
+        else:
+            self._queue.append((viewport, "line", (x1, y1, x2, y2), color))
+
+    def pixel(self, surface: pygame.Surface, x: int, y: int, color: Color) -> None:
+        """Queue a single pixel, see `RenderBackend.pixel`."""
+        viewport = self._viewport(surface)
+        if viewport is None:
+            super().pixel(surface, x, y, color)
+        else:
+            self._queue.append((viewport, "pixel", (x, y), color))
+
+    def text(
+        self, surface: pygame.Surface, rendered: pygame.Surface, pos: Point,
+    ) -> None:
+        """Queue rendered text, see `RenderBackend.text`."""
+        viewport = self._viewport(surface)
+        if viewport is None:
+            super().text(surface, rendered, pos)
+        else:
+            self._text_queue.append((viewport, rendered, pos))
+
+    def _fill_polygon(self, points: list[Point]) -> None:
+        """Fill a polygon with horizontal spans, as the renderer has no polygons.
+
+        Args:
+        ----
+            points (list[Point]): Corners, relative to the current viewport
+
+        """
+        ys = [y for _, y in points]
+        edges = list(zip(points, points[1:] + points[:1]))
+        for y in range(math.ceil(min(ys)), math.floor(max(ys)) + 1):
+            # x-coordinates where the scanline crosses the polygon's edges
+            crossings = sorted(
+                x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+                for (x1, y1), (x2, y2) in edges
+                if (y1 <= y < y2) or (y2 <= y < y1)
+            )
+            for start, end in zip(crossings[::2], crossings[1::2]):
+                self.renderer.draw_line((round(start), y), (round(end), y))
+
+    def present(
+        self,
+        screen: pygame.Surface,
+        overlays: list[Rect],
+        dirty_rects: list[Rect] | None = None,
+    ) -> None:
+        """Upload `screen`, draw queued primitives on top, then text and overlays.
+
+        Args:
+        ----
+            screen (pygame.Surface): Surface holding the whole frame
+            overlays (list[Rect]): Regions of `screen` that must end up above
+                everything the backend drew, e.g. the minimap
+            dirty_rects (list[Rect] | None, optional): Ignored, as the renderer
+                presents whole frames. Defaults to None.
+
+        """
+        renderer = self.renderer
+        self._screen_texture.update(screen)
+        renderer.set_viewport(None)
+        renderer.blit(self._screen_texture)
+
+        current_viewport = None
+        for viewport, kind, args, color in self._queue:
+            if viewport != current_viewport:
+                renderer.set_viewport(viewport)
+                current_viewport = viewport
+            renderer.draw_color = color
+            if kind == "polygon":
+                self._fill_polygon(args[0])
+            elif kind == "circle":
+                x, y, r = args
+                self._circle_texture.color = color
+                self._circle_texture.draw(dstrect=(x - r, y - r, 2 * r + 1, 2 * r + 1))
+            elif kind == "box":
+                renderer.fill_rect(args[0])
+            elif kind == "line":
+                x1, y1, x2, y2 = args
+                renderer.draw_line((x1, y1), (x2, y2))
+            else:
+                renderer.draw_point(args)
+        self._queue.clear()
+
+        for viewport, rendered, (x, y) in self._text_queue:
+            renderer.set_viewport(viewport)
+            Texture.from_surface(renderer, rendered).draw(
+                dstrect=(x, y, rendered.get_width(), rendered.get_height()),
+            )
+        self._text_queue.clear()
+
+        renderer.set_viewport(None)
+        for overlay in overlays:
+            self._screen_texture.draw(srcrect=overlay, dstrect=overlay)
+        renderer.present()
+
+
+def create_backend(name: str) -> RenderBackend:
+    """Create a backend drawing onto ordinary surfaces by its name.
+
+    Args:
+    ----
+        name (str): "gfxdraw" or "draw". The "sdl2" backend needs a window,
+            and is created directly.
+
+    Returns:
+    -------
+        RenderBackend: The backend
+
+    """
+    match name:
+        case "gfxdraw":
+            return GfxdrawBackend()
+        case "draw":
+            return DrawBackend()
+    msg = f"Unknown render backend {name!r}"
+    raise ValueError(msg)
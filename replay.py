@@ -0,0 +1,300 @@
+"""Recording the players' input, and replaying it headless as fast as possible.
+
+A recording holds the world's seed, the simulation's fixed step, and for every
+step the input applied right before it, if any, and a checksum of the state
+after it. Replaying rebuilds the world from the seed, re-runs every step, and
+compares the checksums, so a replay either reproduces the session exactly, or
+tells the first step it diverged at.
+
+Replay a recording with `py replay.py <recording>`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import struct
+import sys
+import time
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from variables import build_universe
+
+if TYPE_CHECKING:
+    from universe import Universe
+
+RECORDING_MAGIC = b"SGRP"
+RECORDING_VERSION = 1
+# Magic, version, seed, step-duration, number of players, number of steps,
+# and the checksum of the state before the first step
+RECORDING_HEADER = struct.Struct("<4sHqdHIL")
+
+
+def tick_dtype(player_count: int) -> np.dtype:
+    """Get the layout of a recorded step.
+
+    Args:
+    ----
+        player_count (int): Number of players
+
+    Returns:
+    -------
+        np.dtype: Whether input was applied before the step, each player's
+            input-state as bits, and the state's checksum after the step
+
+    """
+    return np.dtype(
+        [
+            ("applied", np.uint8),
+            ("inputs", np.uint8, (player_count,)),
+            ("checksum", "<u4"),
+        ],
+    )
+
+
+def pack_input(state: tuple[bool, ...]) -> int:
+    """Pack an input-state, as read by `PlayerShip.read_input`, into bits.
+
+    Args:
+    ----
+        state (tuple[bool, ...]): Whether each key is pressed
+
+    Returns:
+    -------
+        int: Bit `ix` set iff key `ix` is pressed
+
+    """
+    return sum(pressed << ix for ix, pressed in enumerate(state))
+
+
+def unpack_input(bits: int, key_count: int = 5) -> tuple[bool, ...]:
+    """Unpack an input-state packed by `pack_input`.
+
+    Args:
+    ----
+        bits (int): Packed input-state
+        key_count (int, optional): Number of keys. Defaults to 5.
+
+    Returns:
+    -------
+        tuple[bool, ...]: Whether each key is pressed
+
+    """
+    return tuple(bool(bits >> ix & 1) for ix in range(key_count))
+
+
+class Recording:
+    """A recorded session, as saved to a file."""
+
+    def __init__(
+        self,
+        seed: int,
+        tick_dt: float,
+        player_count: int,
+        initial_checksum: int,
+        ticks: np.ndarray,
+    ) -> None:
+        """Create a new recording.
+
+        Args:
+        ----
+            seed (int): Seed the world was built from
+            tick_dt (float): Duration of every step
+            player_count (int): Number of players
+            initial_checksum (int): Checksum of the world before the first step
+            ticks (np.ndarray): Recorded steps, of `tick_dtype(player_count)`
+
+        """
+        self.seed = seed
+        self.tick_dt = tick_dt
+        self.player_count = player_count
+        self.initial_checksum = initial_checksum
+        self.ticks = ticks
+
+    def save(self, path: str) -> None:
+        """Write `self` to a file.
+
+        Args:
+        ----
+            path (str): Path of the file
+
+        """
+        header = RECORDING_HEADER.pack(
+            RECORDING_MAGIC,
+            RECORDING_VERSION,
+            self.seed,
+            self.tick_dt,
+            self.player_count,
+            len(self.ticks),
+            self.initial_checksum,
+        )
+        with open(path, "wb") as file:
+            file.write(header)
+            file.write(self.ticks.tobytes())
+
+
+def load_recording(path: str) -> Recording:
+    """Read a recording written by `Recording.save`.
+
+    Args:
+    ----
+        path (str): Path of the file
+
+    Returns:
+    -------
+        Recording: The recording
+
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    (
+        magic,
+        version,
+        seed,
+        tick_dt,
+        player_count,
+        tick_count,
+        initial_checksum,
+    ) = RECORDING_HEADER.unpack_from(data)
+    if magic != RECORDING_MAGIC or version != RECORDING_VERSION:
+        msg = f"{path} is no recording of version {RECORDING_VERSION}"
+        raise ValueError(msg)
+    ticks = np.frombuffer(
+        data,
+        dtype=tick_dtype(player_count),
+        count=tick_count,
+        offset=RECORDING_HEADER.size,
+    )
+    return Recording(seed, tick_dt, player_count, initial_checksum, ticks)
+
+
+class InputRecorder:
+    """Records a universe's input and steps, standing in for it while playing.
+
+    Steps are run one at a time, to checksum the state after each of them.
+    """
+
+    def __init__(self, universe: Universe, seed: int, tick_dt: float) -> None:
+        """Start recording `universe`, which must have been freshly built.
+
+        Args:
+        ----
+            universe (Universe): Universe to record, built from `seed`
+            seed (int): Seed `universe` was built from
+            tick_dt (float): Duration of every step
+
+        """
+        self.universe = universe
+        self.seed = seed
+        self.tick_dt = tick_dt
+        self.initial_checksum = universe.checksum()
+        self._ticks: list[tuple[bool, list[int], int]] = []
+        self._pending_inputs: list[int] | None = None
+
+    def apply_inputs(self, inputs: list[tuple[bool, ...]]) -> None:
+        """Apply input-states to the universe, recorded with the next step.
+
+        Args:
+        ----
+            inputs (list[tuple[bool, ...]]): Input-state of each player-ship
+
+        """
+        self.universe.apply_inputs(inputs)
+        self._pending_inputs = [pack_input(state) for state in inputs]
+
+    def step_ticks(self, dt: float, ticks: int) -> None:
+        """Step the universe, recording every step.
+
+        Args:
+        ----
+            dt (float): Passed time per step, must be the recorded one
+            ticks (int): Number of steps
+
+        """
+        if dt != self.tick_dt:
+            msg = f"Recording steps of {self.tick_dt} s, not {dt} s"
+            raise ValueError(msg)
+        player_count = len(self.universe.player_ships)
+        for _ in range(ticks):
+            self.universe.step_ticks(dt, 1)
+            applied = self._pending_inputs is not None
+            inputs = self._pending_inputs if applied else [0] * player_count
+            self._ticks.append((applied, inputs, self.universe.checksum()))
+            self._pending_inputs = None
+
+    def save(self, path: str) -> Recording:
+        """Write everything recorded so far to a file.
+
+        Args:
+        ----
+            path (str): Path of the file
+
+        Returns:
+        -------
+            Recording: The saved recording
+
+        """
+        player_count = len(self.universe.player_ships)
+        recording = Recording(
+            self.seed,
+            self.tick_dt,
+            player_count,
+            self.initial_checksum,
+            np.array(self._ticks, dtype=tick_dtype(player_count)),
+        )
+        recording.save(path)
+        return recording
+
+
+def replay(recording: Recording) -> tuple[int | None, int, float]:
+    """Re-run a recording from scratch, as fast as possible.
+
+    Args:
+    ----
+        recording (Recording): Recording to replay
+
+    Returns:
+    -------
+        tuple[int | None, int, float]: Index of the first step whose checksum
+            differs, -1 if the world differs before the first step, None if all
+            match, the number of steps run, and the time it took in seconds
+
+    """
+    universe = build_universe(recording.seed, [])
+    if universe.checksum() != recording.initial_checksum:
+        return -1, 0, 0.0
+    start = time.perf_counter()
+    for tick_ix, (applied, inputs, checksum) in enumerate(recording.ticks.tolist()):
+        if applied:
+            universe.apply_inputs([unpack_input(bits) for bits in inputs])
+        universe.step_ticks(recording.tick_dt, 1)
+        if universe.checksum() != checksum:
+            return tick_ix, tick_ix + 1, time.perf_counter() - start
+    return None, len(recording.ticks), time.perf_counter() - start
+
+
+def main() -> None:
+    """Parse arguments, replay a recording and report."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("recording", help="path of a recording")
+    args = parser.parse_args()
+
+    recording = load_recording(args.recording)
+    mismatch, tick_count, seconds = replay(recording)
+    if mismatch == -1:
+        print("The world differs before the first step, is the configuration the same?")
+        sys.exit(1)
+    recorded_seconds = tick_count * recording.tick_dt
+    print(
+        f"Replayed {tick_count} steps ({recorded_seconds:.1f} s) in {seconds:.2f} s,"
+        f" {recorded_seconds / max(seconds, 1e-9):.1f}x real time",
+    )
+    if mismatch is not None:
+        print(f"Diverged from the recording at step {mismatch}")
+        sys.exit(1)
+    print("Every step matches the recording")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""An authoritative simulation-server, run with `py server.py`.
+
+The server owns the world, and steps it at a fixed rate. Every client, see
+client.py, controls a player-ship of its own, and gets a delta-compressed
+snapshot after every step, see netcode.py. Clients beyond the number of
+player-ships are turned away.
+
+With a byte budget, every client is only sent the entities around its ship,
+nearest and longest-changed first, see interest.py.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from netcode import (
+    ENTITY_DTYPE,
+    INPUT,
+    MESSAGE_INPUT,
+    MESSAGE_SNAPSHOT,
+    MESSAGE_WELCOME,
+    NO_TICK,
+    PROTOCOL_VERSION,
+    SNAPSHOT_HEADER,
+    SNAPSHOT_HISTORY,
+    WELCOME,
+    EntityIds,
+    encode_delta,
+    frame,
+    read_frame,
+)
+from interest import ClientInterest
+from replay import unpack_input
+from universe import Universe
+from variables import (
+    INTEREST_BYTE_BUDGET,
+    INTEREST_ENTER_MARGIN,
+    INTEREST_EXIT_MARGIN,
+    SCREEN_SIZE,
+    SERVER_HOST,
+    SERVER_PORT,
+    SIMULATION_TICK_RATE,
+    WORLD_SEED,
+    build_universe,
+)
+
+# A client's snapshot is skipped while more than this many bytes are still queued
+# for it, so that a slow client doesn't make the server buffer without bound
+MAX_QUEUED_BYTES = 1 << 20
+# Once the server falls behind by more than this many seconds, it stops catching up
+MAX_LAG = 0.25
+
+_NO_RECORDS = np.zeros(0, ENTITY_DTYPE)
+
+
+class ClientConnection:
+    """A connected client, and what it was sent."""
+
+    def __init__(
+        self,
+        slot: int,
+        writer: asyncio.StreamWriter,
+        interest: ClientInterest | None,
+    ) -> None:
+        """Create a new connection.
+
+        Args:
+        ----
+            slot (int): Index of the client's player-ship
+            writer (asyncio.StreamWriter): Stream to the client
+            interest (ClientInterest | None): Chooses the entities the client
+                is sent, None to send all of them
+
+        """
+        self.slot = slot
+        self.writer = writer
+        self.interest = interest
+        self.input_bits = 0
+        # Half the worldspace-size of the client's camera-view
+        self.half_extent = (SCREEN_SIZE.x / 2, SCREEN_SIZE.y / 2)
+        self.acked_tick = NO_TICK
+        # Records sent per step, while the client may still acknowledge them
+        self.sent: dict[int, np.ndarray] = {}
+        self.bytes_sent = 0
+        self.snapshots_sent = 0
+        self.snapshots_skipped = 0
+        self.entities_sent = 0
+        self.entities_deferred = 0
+
+    def acknowledge(self, tick: int) -> None:
+        """Note that the client received the snapshot of step `tick`.
+
+        Args:
+        ----
+            tick (int): Step of the snapshot
+
+        """
+        if tick not in self.sent:
+            return
+        if self.acked_tick != NO_TICK and tick <= self.acked_tick:
+            return
+        self.acked_tick = tick
+        for sent_tick in [t for t in self.sent if t < tick]:
+            del self.sent[sent_tick]
+
+
+class SimulationServer:
+    """Steps a world, taking every client's input and sending it snapshots."""
+
+    def __init__(
+        self,
+        universe: Universe,
+        seed: int,
+        tick_rate: float,
+        byte_budget: int | None,
+    ) -> None:
+        """Serve `universe`.
+
+        Args:
+        ----
+            universe (Universe): Freshly built world
+            seed (int): Seed the world was built from, for clients to do the same
+            tick_rate (float): Steps per second
+            byte_budget (int | None): Bytes of entities sent to a client per
+                step, before compression, None to send every entity
+
+        """
+        self.universe = universe
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.byte_budget = byte_budget
+        self.tick_dt = 1 / tick_rate
+        self.ids = EntityIds(universe)
+        self.clients: dict[int, ClientConnection] = {}
+        self.tick = 0
+        # Totals since the last report
+        self._report_ticks = 0
+        self._step_seconds = 0.0
+        self._snapshot_seconds = 0.0
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+    ) -> None:
+        """Serve a client until it disconnects.
+
+        Args:
+        ----
+            reader (asyncio.StreamReader): Stream from the client
+            writer (asyncio.StreamWriter): Stream to the client
+
+        """
+        player_count = len(self.universe.player_ships)
+        free_slots = [ix for ix in range(player_count) if ix not in self.clients]
+        if not free_slots:
+            writer.close()
+            return
+        interest = None
+        if self.byte_budget is not None:
+            interest = ClientInterest(
+                self.byte_budget, INTEREST_ENTER_MARGIN, INTEREST_EXIT_MARGIN,
+            )
+        client = ClientConnection(free_slots[0], writer, interest)
+        self.clients[client.slot] = client
+        writer.write(
+            frame(
+                MESSAGE_WELCOME,
+                WELCOME.pack(
+                    PROTOCOL_VERSION,
+                    self.seed,
+                    player_count,
+                    client.slot,
+                    self.tick_rate,
+                ),
+            ),
+        )
+        try:
+            while True:
+                message_type, payload = await read_frame(reader)
+                if message_type == MESSAGE_INPUT:
+                    acked_tick, client.input_bits, half_width, half_height = (
+                        INPUT.unpack(payload)
+                    )
+                    client.half_extent = (half_width, half_height)
+                    client.acknowledge(acked_tick)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self.clients[client.slot]
+            # The abandoned ship drifts on, without firing its thrusters
+            self.universe.player_ships[client.slot].apply_input((False,) * 5)
+            writer.close()
+
+    def step(self) -> None:
+        """Apply the clients' input, step the world, and send snapshots."""
+        start = time.perf_counter()
+        for client in self.clients.values():
+            ship = self.universe.player_ships[client.slot]
+            ship.apply_input(unpack_input(client.input_bits))
+        self.universe.step(self.tick_dt)
+        self.tick += 1
+        snapshot_start = time.perf_counter()
+        self.send_snapshots()
+        end = time.perf_counter()
+        self._report_ticks += 1
+        self._step_seconds += snapshot_start - start
+        self._snapshot_seconds += end - snapshot_start
+
+    def send_snapshots(self) -> None:
+        """Send every client a snapshot of the current step."""
+        if not self.clients:
+            return
+        records = self.ids.records()
+        # Clients which acknowledged the same step get the same snapshot,
+        # unless they're sent only what they're interested in
+        encoded: dict[int, bytes] = {}
+        for client in self.clients.values():
+            transport = client.writer.transport
+            if transport.get_write_buffer_size() > MAX_QUEUED_BYTES:
+                client.snapshots_skipped += 1
+                continue
+            baseline_tick = client.acked_tick
+            if baseline_tick not in client.sent:
+                baseline_tick = NO_TICK
+            baseline = client.sent.get(baseline_tick, _NO_RECORDS)
+            ship = self.universe.player_ships[client.slot]
+            if client.interest is not None:
+                view = client.interest.update(
+                    records,
+                    (ship.pos.x, ship.pos.y),
+                    client.half_extent,
+                    baseline,
+                    self.ids.ship_ids[id(ship)],
+                )
+                data = encode_delta(view, baseline)
+                client.entities_deferred += client.interest.deferred_count
+            else:
+                view = records
+                if baseline_tick not in encoded:
+                    encoded[baseline_tick] = encode_delta(records, baseline)
+                data = encoded[baseline_tick]
+            message = frame(
+                MESSAGE_SNAPSHOT,
+                SNAPSHOT_HEADER.pack(self.tick, baseline_tick, ship.fuel, ship.ammo)
+                + data,
+            )
+            client.writer.write(message)
+            client.sent[self.tick] = view
+            client.entities_sent += len(view)
+            if len(client.sent) > SNAPSHOT_HISTORY:
+                del client.sent[next(iter(client.sent))]
+            client.bytes_sent += len(message)
+            client.snapshots_sent += 1
+
+    def report(self) -> str:
+        """Describe the cost of the steps and snapshots since the last report.
+
+        Returns
+        -------
+            str: Human-readable statistics
+
+        """
+        ticks = max(self._report_ticks, 1)
+        clients = list(self.clients.values())
+        sent = sum(client.snapshots_sent for client in clients)
+        bytes_sent = sum(client.bytes_sent for client in clients)
+        skipped = sum(client.snapshots_skipped for client in clients)
+        entities = sum(client.entities_sent for client in clients)
+        deferred = sum(client.entities_deferred for client in clients)
+        bytes_per_snapshot = bytes_sent / max(sent, 1)
+        line = (
+            f"Step {self.tick}: {len(clients)} clients,"
+            f" {self._step_seconds * 1000 / ticks:.2f} ms/step simulating,"
+            f" {self._snapshot_seconds * 1000 / ticks:.2f} ms/step snapshotting,"
+            f" {bytes_per_snapshot:.0f} bytes/step"
+            f" ({bytes_per_snapshot * self.tick_rate / 1024:.1f} KiB/s) per client,"
+            f" {entities / max(sent, 1):.0f} entities in view,"
+            f" {deferred / max(sent, 1):.0f} deferred,"
+            f" {skipped} snapshots skipped"
+        )
+        for client in clients:
+            client.bytes_sent = client.snapshots_sent = client.snapshots_skipped = 0
+            client.entities_sent = client.entities_deferred = 0
+        self._report_ticks = 0
+        self._step_seconds = self._snapshot_seconds = 0.0
+        return line
+
+    async def run(self, seconds: float | None, report_interval: float) -> None:
+        """Step the world at the tick rate.
+
+        Args:
+        ----
+            seconds (float | None): Time to run for, None to run forever
+            report_interval (float): Seconds between printed reports
+
+        """
+        loop = asyncio.get_running_loop()
+        start = next_tick = last_report = loop.time()
+        while seconds is None or loop.time() - start < seconds:
+            self.step()
+            now = loop.time()
+            if now >= last_report + report_interval:
+                print(self.report())
+                last_report = now
+            next_tick += self.tick_dt
+            if now - next_tick > MAX_LAG:
+                next_tick = now
+            # Sleeping, even for no time, lets the clients' input be read
+            await asyncio.sleep(max(next_tick - now, 0))
+
+
+async def serve(
+    server: SimulationServer,
+    host: str,
+    port: int,
+    seconds: float | None,
+    report_interval: float,
+) -> None:
+    """Accept clients, and run the server.
+
+    Args:
+    ----
+        server (SimulationServer): Server to run
+        host (str): Address to listen on
+        port (int): Port to listen on
+        seconds (float | None): Time to run for, None to run forever
+        report_interval (float): Seconds between printed reports
+
+    """
+    listener = await asyncio.start_server(server.handle_client, host, port)
+    print(f"Serving seed {server.seed} on {host}:{port}")
+    async with listener:
+        await server.run(seconds, report_interval)
+
+
+def main() -> None:
+    """Parse arguments and run the server."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=SERVER_HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--seed", type=int, default=WORLD_SEED, help="world's seed")
+    parser.add_argument(
+        "--players", type=int, help="player-ships, defaults to the world's",
+    )
+    parser.add_argument("--tick-rate", type=float, default=SIMULATION_TICK_RATE)
+    parser.add_argument("--seconds", type=float, help="time to run for")
+    parser.add_argument(
+        "--report", type=float, default=5, help="seconds between reports",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=INTEREST_BYTE_BUDGET,
+        help="bytes of entities per client and step, 0 sends every entity",
+    )
+    args = parser.parse_args()
+
+    seed = args.seed if args.seed is not None else random.randrange(2**32)
+    universe = build_universe(seed, [], args.players)
+    server = SimulationServer(universe, seed, args.tick_rate, args.budget or None)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.seconds, args.report))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
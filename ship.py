@@ -8,14 +8,16 @@ from enum import Enum
 from typing import TYPE_CHECKING
 
 import pygame
-from pygame import Color
+from pygame import Color, Rect
 from pygame.math import Vector2 as Vec2
 
+from camera import LOD_DOT, LOD_SIMPLE
 from physics import Disk
 from projectiles import Bullet, Rocket
 
 if TYPE_CHECKING:
     from camera import Camera
+    from particles import ParticleSystem
 
 
 BULLET_SPEED = 1500
@@ -26,6 +28,11 @@ ENEMY_SHOOT_RANGE = 1900
 # How long a ship should glow after taking damage
 DAMAGE_INDICATOR_TIME = 0.75
 
+# Exhaust-particles emitted per second by an active thruster
+EXHAUST_RATE = 400
+EXHAUST_SPEED = 300  # relative to the ship
+EXHAUST_LIFE = 0.6
+
 
 class Ship(Disk):
     """A basic spaceship."""
@@ -74,6 +81,19 @@ class Ship(Disk):
 
         self.damage_indicator_timer: float = 0
 
+    def get_bounding_rect(self) -> Rect:
+        """Get a worldspace-rectangle enclosing `self`'s body, thrusters and gun.
+
+        Projectiles are not included, they are separate objects.
+
+        Returns
+        -------
+            Rect: Worldspace-bounding-rectangle
+
+        """
+        reach = self.radius * (GUNBARREL_LENGTH + GUNBARREL_WIDTH)
+        return Rect(self.pos - Vec2(reach), (2 * reach, 2 * reach)).inflate(2, 2)
+
     def get_faced_direction(self) -> Vec2:
         """Get `self`'s faced direction from its `angle`.
 
@@ -144,8 +164,43 @@ class Ship(Disk):
 
         self.gun_cooldown = max(0, self.gun_cooldown - dt)
 
+    def emit_exhaust(self, particles: ParticleSystem, dt: float) -> None:
+        """Emit exhaust-particles from `self`'s active forward- and backward-thrusters.
+
+        Args:
+        ----
+            particles (ParticleSystem): Particle system to emit into
+            dt (float): Passed time
+
+        """
+        if self.fuel <= 0:
+            return
+        forward = self.get_faced_direction()
+        if self.thruster_forward:
+            particles.emit(
+                EXHAUST_RATE * dt,
+                self.pos - forward * self.radius * 1.25,
+                self.vel,
+                -forward,
+                15,
+                EXHAUST_SPEED,
+                EXHAUST_LIFE,
+                Color("orange"),
+            )
+        if self.thruster_backward:
+            particles.emit(
+                EXHAUST_RATE / 2 * dt,
+                self.pos + forward * self.radius * 2,
+                self.vel,
+                forward,
+                25,
+                EXHAUST_SPEED / 2,
+                EXHAUST_LIFE / 2,
+                Color("orange"),
+            )
+
     def draw(self, camera: Camera) -> None:
-        """Draw `self` on `camera.
+        """Draw `self` on `camera`, without its projectiles.
 
         Args:
         ----
@@ -158,6 +213,23 @@ class Ship(Disk):
         backward = -forward
 
         base_color: Color = self.color.lerp(Color("red"), self.damage_indicator_timer)
+
+        lod = camera.get_lod(2 * self.radius)
+        if lod == LOD_DOT:
+            camera.draw_dot(base_color, self.pos)
+            return
+        if lod == LOD_SIMPLE:
+            # Arrowhead-silhouette pointing where the ship faces
+            camera.draw_polygon(
+                base_color,
+                [
+                    self.pos + self.radius * 2 * forward,
+                    self.pos + self.radius * (1.5 * left + backward),
+                    self.pos + self.radius * (1.5 * right + backward),
+                ],
+            )
+            return
+
         darker_color: Color = base_color.lerp(Color("black"), 0.5)
 
         # Helper function for drawing polygons relative to the ship-position
@@ -240,14 +312,9 @@ class Ship(Disk):
             ],
         )
 
-        # Ugly hack
-        backup_self_color = Color(self.color)
-        self.color = base_color
-        super().draw(camera)  # Draw circular body ("hitbox")
-        self.color = backup_self_color
-
-        for projectile in self.projectiles:
-            projectile.draw(camera)
+        # Circular body ("hitbox"), always big enough not to be a dot at this LOD.
+        # Drawn without touching `self.color`, as cameras may draw concurrently.
+        camera.draw_circle(base_color, self.pos, self.radius)
 
 
 class ShipInput:
@@ -320,11 +387,45 @@ class PlayerShip(Ship):
             keys (pygame.key.ScancodeWrapper): Pressed keys
 
         """
-        self.thruster_rot_left = keys[self.spaceship_input.thruster_rot_left]
-        self.thruster_rot_right = keys[self.spaceship_input.thruster_rot_right]
-        self.thruster_forward = keys[self.spaceship_input.thruster_forward]
-        self.thruster_backward = keys[self.spaceship_input.thruster_backward]
-        if keys[self.spaceship_input.shoot]:
+        self.apply_input(self.read_input(keys))
+
+    def read_input(self, keys: pygame.key.ScancodeWrapper) -> tuple[bool, ...]:
+        """Read the state of `self`'s keys from ScancodeWrapper `keys`.
+
+        Args:
+        ----
+            keys (pygame.key.ScancodeWrapper): Pressed keys
+
+        Returns:
+        -------
+            tuple[bool, ...]: Whether the rotate-left-, rotate-right-, forward-,
+                backward- and shoot-keys are pressed, in that order
+
+        """
+        return (
+            bool(keys[self.spaceship_input.thruster_rot_left]),
+            bool(keys[self.spaceship_input.thruster_rot_right]),
+            bool(keys[self.spaceship_input.thruster_forward]),
+            bool(keys[self.spaceship_input.thruster_backward]),
+            bool(keys[self.spaceship_input.shoot]),
+        )
+
+    def apply_input(self, state: tuple[bool, ...]) -> None:
+        """Control `self` by an input-state, as read by `read_input`.
+
+        Args:
+        ----
+            state (tuple[bool, ...]): State of `self`'s keys
+
+        """
+        (
+            self.thruster_rot_left,
+            self.thruster_rot_right,
+            self.thruster_forward,
+            self.thruster_backward,
+            shoot,
+        ) = state
+        if shoot:
             self.shoot()
 
 
@@ -345,9 +446,10 @@ class BulletEnemy(Ship):
         pos: Vec2,
         vel: Vec2,
         target_ship: Ship,
-        shoot_cooldown: float = 0.0125,
+        shoot_cooldown: float = 1 / 60,
         color: Color = Color("lime"),
         bullet_color: Color = Color("hotpink"),
+        rng: random.Random | None = None,
     ) -> None:
         """Create a new enemy ship.
 
@@ -356,13 +458,17 @@ class BulletEnemy(Ship):
             pos (Vec2): Initial position
             vel (Vec2): Initial velocity
             target_ship (Ship): Ship to target
-            shoot_cooldown (float, optional): Minimum time between shots.
-                Defaults to 0.125.
-            color (Color, optional): Material color. Defaults to Color("purple").
+            shoot_cooldown (float, optional): Minimum time between shots,
+                in seconds. Defaults to 1 / 60.
+            color (Color, optional): Material color. Defaults to Color("lime").
             bullet_color (Color): Color of shot projectiles
+            rng (random.Random | None, optional): Random numbers for the "AI",
+                shared with the rest of the world to make it reproducible.
+                Defaults to None, for random numbers of its own.
 
         """
         super().__init__(pos, vel, 1, 8, color, bullet_color)
+        self.rng = rng if rng is not None else random.Random()
         self.thrust *= 0.04
         self.time_until_next_shot = 0
         self.action_timer = 6
@@ -384,7 +490,7 @@ class BulletEnemy(Ship):
         """
         self.action_timer -= dt
         if self.action_timer <= 0:
-            [self.current_action] = random.choices(
+            [self.current_action] = self.rng.choices(
                 population=list(BulletEnemy.Action), weights=[0.9, 0.05, 0.05]
             )
             self.action_timer = 6
@@ -396,7 +502,9 @@ class BulletEnemy(Ship):
             case BulletEnemy.Action.accelerate_to_player:
                 force_direction = delta_target_ship
             case BulletEnemy.Action.accelerate_randomly:
-                force_direction = Vec2(random.uniform(-1, 1), random.uniform(-1, 1))
+                force_direction = Vec2(
+                    self.rng.uniform(-1, 1), self.rng.uniform(-1, 1),
+                )
             case BulletEnemy.Action.decelerate:
                 force_direction = -self.vel
         force = force_direction * self.thrust / force_direction.magnitude()
@@ -406,7 +514,7 @@ class BulletEnemy(Ship):
         self.angle = math.degrees(math.atan2(self.vel.y, self.vel.x))
 
         # Shooting logic
-        self.time_until_next_shot -= 1
+        self.time_until_next_shot -= dt
         if (
             delta_target_ship.magnitude_squared() < ENEMY_SHOOT_RANGE**2
             and self.time_until_next_shot <= 0
@@ -423,8 +531,9 @@ class RocketEnemy(BulletEnemy):
         pos: Vec2,
         vel: Vec2,
         target_ship: Ship,
-        shoot_cooldown: float = 10,
+        shoot_cooldown: float = 1 / 6,
         color: Color = Color("plum"),
+        rng: random.Random | None = None,
     ) -> None:
         """Create a new Rocket-Ship.
 
@@ -433,12 +542,14 @@ class RocketEnemy(BulletEnemy):
             pos (Vec2): Initial position
             vel (Vec2): Initial velocity
             target_ship (Ship): Ship to target
-            shoot_cooldown (float, optional): Minimum time between shots.
-                Defaults to 0.5.
-            color (Color, optional): Material color. Defaults to Color("red").
+            shoot_cooldown (float, optional): Minimum time between shots,
+                in seconds. Defaults to 1 / 6.
+            color (Color, optional): Material color. Defaults to Color("plum").
+            rng (random.Random | None, optional): Random numbers for the "AI".
+                Defaults to None, for random numbers of its own.
 
         """
-        super().__init__(pos, vel, target_ship, shoot_cooldown, color)
+        super().__init__(pos, vel, target_ship, shoot_cooldown, color, rng=rng)
 
     def shoot(self) -> None:
         """Shoot a Rocket."""
@@ -0,0 +1,424 @@
+"""Running the simulation in a worker process, next to the rendering one.
+
+The worker steps its own copy of the universe, and publishes the state of every
+moving object into a double-buffered block of shared memory. The render process
+mirrors the latest complete state into its universe, which it only draws, and
+sends the players' input back to the worker over a pipe.
+
+The worker is forked, as a spawned one would re-run the game's script.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pygame.math import Vector2 as Vec2
+
+from game_loop import FixedTimestepLoop
+from particles import ParticleSystem
+from projectiles import Bullet, Rocket
+from ship import RocketEnemy
+from universe import Universe
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+    from ship import Ship
+
+# Most projectiles published per step, the rest aren't drawn
+MAX_SHARED_PROJECTILES = 16_384
+
+# Columns of the published arrays
+ASTEROID_FIELDS = 4  # x, y, vx, vy
+SHIP_FIELDS = 15  # alive, x, y, vx, vy, angle, health, fuel, ammo, has_trophy,
+# damage_indicator_timer, and the rotate-left-, rotate-right-, forward- and
+# backward-thrusters
+PROJECTILE_FIELDS = 6  # index of the shooting ship, x, y, vx, vy,
+# and the homing-timer of rockets, 0 for bullets
+
+# Slots of the int64-header, in front of both buffers
+HEADER_LATEST = 0  # Buffer holding the latest complete state, -1 before the first
+HEADER_SEQUENCE = 1  # Per buffer, odd while the buffer is being written
+HEADER_TICK = 3  # Per buffer, the simulation's tick count
+HEADER_PROJECTILES = 5  # Per buffer, the number of published projectiles
+HEADER_SIZE = 7
+
+# Give up on a torn read after this many attempts, and keep the last state
+MAX_READ_ATTEMPTS = 8
+
+
+class SharedStateLayout:
+    """Sizes and offsets of the state published for a given world."""
+
+    def __init__(
+        self, asteroid_count: int, ship_count: int, projectile_capacity: int,
+    ) -> None:
+        """Create a new layout.
+
+        Args:
+        ----
+            asteroid_count (int): Number of asteroids
+            ship_count (int): Number of ships, players first, alive or not
+            projectile_capacity (int): Most projectiles published at once
+
+        """
+        self.asteroid_count = asteroid_count
+        self.ship_count = ship_count
+        self.projectile_capacity = projectile_capacity
+        self.buffer_floats = (
+            asteroid_count * ASTEROID_FIELDS
+            + ship_count * SHIP_FIELDS
+            + projectile_capacity * PROJECTILE_FIELDS
+        )
+        self.header_bytes = HEADER_SIZE * np.dtype(np.int64).itemsize
+        self.buffer_bytes = self.buffer_floats * np.dtype(np.float64).itemsize
+        self.nbytes = self.header_bytes + 2 * self.buffer_bytes
+
+    def views(
+        self, buffer: memoryview, buffer_ix: int,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Get arrays viewing one of both buffers in shared memory, without copying.
+
+        Args:
+        ----
+            buffer (memoryview): The whole shared memory
+            buffer_ix (int): 0 or 1
+
+        Returns:
+        -------
+            tuple[np.ndarray, np.ndarray, np.ndarray]: Asteroid-, ship- and
+                projectile-rows
+
+        """
+        flat = np.ndarray(
+            (self.buffer_floats,),
+            dtype=np.float64,
+            buffer=buffer,
+            offset=self.header_bytes + buffer_ix * self.buffer_bytes,
+        )
+        ships_start = self.asteroid_count * ASTEROID_FIELDS
+        projectiles_start = ships_start + self.ship_count * SHIP_FIELDS
+        return (
+            flat[:ships_start].reshape(-1, ASTEROID_FIELDS),
+            flat[ships_start:projectiles_start].reshape(-1, SHIP_FIELDS),
+            flat[projectiles_start:].reshape(-1, PROJECTILE_FIELDS),
+        )
+
+
+class SharedState:
+    """Double-buffered world-state in shared memory, for a single writer.
+
+    The writer fills the buffer not marked as latest, then marks it. Each buffer
+    has a sequence-number, odd while it's written, so readers can detect reading
+    a buffer the writer has lapped them on.
+    """
+
+    def __init__(self, layout: SharedStateLayout, name: str | None = None) -> None:
+        """Create a new block of shared memory, or attach to an existing one.
+
+        Args:
+        ----
+            layout (SharedStateLayout): Layout of the state
+            name (str | None, optional): Name of the block to attach to.
+                Defaults to None, creating a new block.
+
+        """
+        self.layout = layout
+        self.memory = shared_memory.SharedMemory(
+            name, create=name is None, size=layout.nbytes,
+        )
+        self.header = np.ndarray((HEADER_SIZE,), dtype=np.int64, buffer=self.memory.buf)
+        if name is None:
+            self.header[:] = 0
+            self.header[HEADER_LATEST] = -1
+        self.buffers = [layout.views(self.memory.buf, ix) for ix in range(2)]
+
+    def write(self, tick: int, universe: Universe, ships: list[Ship]) -> None:
+        """Publish the state of `universe`'s moving objects.
+
+        Args:
+        ----
+            tick (int): Tick count of the simulation
+            universe (Universe): Universe to publish
+            ships (list[Ship]): All ships the universe started with
+
+        """
+        buffer_ix = 1 if self.header[HEADER_LATEST] == 0 else 0
+        asteroid_rows, ship_rows, projectile_rows = self.buffers[buffer_ix]
+        self.header[HEADER_SEQUENCE + buffer_ix] += 1
+
+        asteroid_rows[:] = [
+            (a.pos.x, a.pos.y, a.vel.x, a.vel.y) for a in universe.asteroids
+        ]
+        alive_ships = set(map(id, universe.player_ships + universe.enemy_ships))
+        ship_rows[:] = [
+            (
+                id(ship) in alive_ships,
+                ship.pos.x,
+                ship.pos.y,
+                ship.vel.x,
+                ship.vel.y,
+                ship.angle,
+                ship.health,
+                ship.fuel,
+                ship.ammo,
+                ship.has_trophy,
+                ship.damage_indicator_timer,
+                ship.thruster_rot_left,
+                ship.thruster_rot_right,
+                ship.thruster_forward,
+                ship.thruster_backward,
+            )
+            for ship in ships
+        ]
+        projectiles = [
+            (
+                ship_ix,
+                p.pos.x,
+                p.pos.y,
+                p.vel.x,
+                p.vel.y,
+                p.homing_timer if isinstance(p, Rocket) else 0,
+            )
+            for ship_ix, ship in enumerate(ships)
+            if id(ship) in alive_ships
+            for p in ship.projectiles
+        ][: self.layout.projectile_capacity]
+        projectile_count = len(projectiles)
+        if projectile_count > 0:
+            projectile_rows[:projectile_count] = projectiles
+
+        self.header[HEADER_TICK + buffer_ix] = tick
+        self.header[HEADER_PROJECTILES + buffer_ix] = projectile_count
+        self.header[HEADER_SEQUENCE + buffer_ix] += 1
+        self.header[HEADER_LATEST] = buffer_ix
+
+    def read(self) -> tuple[int, list, list, list] | None:
+        """Copy the latest complete state out of shared memory.
+
+        Only the rows in use are copied, as plain lists are far faster to apply
+        to Python objects than array-rows are.
+
+        Returns
+        -------
+            tuple[int, list, list, list] | None: Tick count,
+                and asteroid-, ship- and projectile-rows as nested lists, or None
+                before the first state, or if every attempt read a torn state
+
+        """
+        for _ in range(MAX_READ_ATTEMPTS):
+            buffer_ix = int(self.header[HEADER_LATEST])
+            if buffer_ix < 0:
+                return None
+            sequence = int(self.header[HEADER_SEQUENCE + buffer_ix])
+            if sequence % 2 == 1:
+                continue
+            asteroid_rows, ship_rows, projectile_rows = self.buffers[buffer_ix]
+            tick = int(self.header[HEADER_TICK + buffer_ix])
+            projectile_count = int(self.header[HEADER_PROJECTILES + buffer_ix])
+            state = (
+                tick,
+                asteroid_rows.tolist(),
+                ship_rows.tolist(),
+                projectile_rows[:projectile_count].tolist(),
+            )
+            if self.header[HEADER_SEQUENCE + buffer_ix] == sequence:
+                return state
+        return None
+
+    def close(self) -> None:
+        """Detach from the shared memory."""
+        # Views into the memory must be gone before it can be closed
+        self.header = None
+        self.buffers = []
+        self.memory.close()
+
+
+def run_simulation(
+    name: str,
+    layout: SharedStateLayout,
+    universe: Universe,
+    connection: Connection,
+    tick_rate: float,
+    max_steps_per_frame: int,
+) -> None:
+    """Step `universe` in real time, until told to stop. Runs in the worker.
+
+    Args:
+    ----
+        name (str): Name of the shared memory to publish to
+        layout (SharedStateLayout): Layout of the shared memory
+        universe (Universe): The worker's copy of the universe
+        connection (Connection): Receives input-states, and None to stop
+        tick_rate (float): Simulation steps per second
+        max_steps_per_frame (int): Most steps run at once, after a stall
+
+    """
+    state = SharedState(layout, name)
+    ships: list[Ship] = universe.player_ships + universe.enemy_ships
+    # Particles are drawn by the render process only
+    universe.particles = ParticleSystem(0)
+    game_loop = FixedTimestepLoop(tick_rate, max_steps_per_frame)
+    inputs: list[tuple[bool, ...]] = []
+
+    def step(dt: float, ticks: int) -> None:
+        universe.apply_inputs(inputs)
+        universe.step_ticks(dt, ticks)
+
+    last_time = time.perf_counter()
+    try:
+        while True:
+            while connection.poll():
+                message = connection.recv()
+                if message is None:
+                    return
+                inputs = message
+            now = time.perf_counter()
+            if game_loop.advance(now - last_time, step) > 0:
+                state.write(game_loop.tick_count, universe, ships)
+            last_time = now
+            # Sleep until the next step is due
+            time.sleep((1 - game_loop.alpha) * game_loop.tick_dt)
+    finally:
+        state.close()
+
+
+class SimulationProcess:
+    """Steps a universe in a worker process, mirroring its state for drawing."""
+
+    def __init__(
+        self, universe: Universe, tick_rate: float, max_steps_per_frame: int,
+    ) -> None:
+        """Fork the worker, with a copy of `universe` as it is now.
+
+        Args:
+        ----
+            universe (Universe): Universe to simulate, mirrored to from then on
+            tick_rate (float): Simulation steps per second
+            max_steps_per_frame (int): Most steps run at once, after a stall
+
+        """
+        if "fork" not in multiprocessing.get_all_start_methods():
+            msg = "Running the simulation in a process needs the fork start method"
+            raise RuntimeError(msg)
+        self.universe = universe
+        self.ships: list[Ship] = universe.player_ships + universe.enemy_ships
+        self.layout = SharedStateLayout(
+            len(universe.asteroids), len(self.ships), MAX_SHARED_PROJECTILES,
+        )
+        self.state = SharedState(self.layout)
+        self.tick = -1
+        self._last_inputs: list[tuple[bool, ...]] | None = None
+        # Projectile-objects of each ship, reused from state to state
+        self._projectile_pools: list[list[Bullet]] = [[] for _ in self.ships]
+
+        context = multiprocessing.get_context("fork")
+        self._connection, worker_connection = context.Pipe()
+        self.process = context.Process(
+            target=run_simulation,
+            args=(
+                self.state.memory.name,
+                self.layout,
+                universe,
+                worker_connection,
+                tick_rate,
+                max_steps_per_frame,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+        worker_connection.close()
+
+    def send_input(self, inputs: list[tuple[bool, ...]]) -> None:
+        """Send the players' input-states to the worker, if they changed.
+
+        Args:
+        ----
+            inputs (list[tuple[bool, ...]]): Input-state of each player-ship
+
+        """
+        if inputs != self._last_inputs:
+            self._connection.send(inputs)
+            self._last_inputs = inputs
+
+    def sync(self) -> bool:
+        """Mirror the latest published state into the universe, if it's new.
+
+        Enemies destroyed since the last state explode.
+
+        Returns
+        -------
+            bool: True iff a new state was mirrored
+
+        """
+        state = self.state.read()
+        if state is None or state[0] == self.tick:
+            return False
+        self.tick, asteroid_rows, ship_rows, projectile_rows = state
+        universe = self.universe
+
+        for asteroid, (x, y, vx, vy) in zip(universe.asteroids, asteroid_rows):
+            asteroid.pos.update(x, y)
+            asteroid.vel.update(vx, vy)
+            asteroid.prev_pos.update(x, y)
+
+        enemy_ids = set(map(id, universe.enemy_ships))
+        alive_enemies = []
+        for ship, row in zip(self.ships, ship_rows):
+            ship.pos.update(row[1], row[2])
+            ship.vel.update(row[3], row[4])
+            ship.prev_pos.update(ship.pos)
+            ship.angle = row[5]
+            ship.health = row[6]
+            ship.fuel = row[7]
+            ship.ammo = int(row[8])
+            ship.has_trophy = bool(row[9])
+            ship.damage_indicator_timer = row[10]
+            ship.thruster_rot_left = bool(row[11])
+            ship.thruster_rot_right = bool(row[12])
+            ship.thruster_forward = bool(row[13])
+            ship.thruster_backward = bool(row[14])
+            if id(ship) in enemy_ids:
+                if row[0]:
+                    alive_enemies.append(ship)
+                else:
+                    universe.explode(ship)
+        universe.enemy_ships[:] = alive_enemies
+        universe.generation += 1
+
+        for ship in self.ships:
+            ship.projectiles.clear()
+        used = [0] * len(self.ships)
+        for ship_ix, x, y, vx, vy, homing_timer in projectile_rows:
+            ship_ix = int(ship_ix)
+            ship = self.ships[ship_ix]
+            pool = self._projectile_pools[ship_ix]
+            if used[ship_ix] == len(pool):
+                if isinstance(ship, RocketEnemy):
+                    pool.append(
+                        Rocket(Vec2(x, y), Vec2(0, 0), ship.color, ship.target_ship),
+                    )
+                else:
+                    pool.append(Bullet(Vec2(x, y), Vec2(0, 0), ship.bullet_color))
+            projectile = pool[used[ship_ix]]
+            used[ship_ix] += 1
+            projectile.pos.update(x, y)
+            projectile.prev_pos.update(x, y)
+            projectile.vel.update(vx, vy)
+            if isinstance(projectile, Rocket):
+                # Decides whether the rocket is drawn homing
+                projectile.homing_timer = homing_timer
+            ship.projectiles.append(projectile)
+        return True
+
+    def close(self) -> None:
+        """Stop the worker, and free the shared memory."""
+        self._connection.send(None)
+        self.process.join()
+        self._connection.close()
+        self.state.close()
+        self.state.memory.unlink()
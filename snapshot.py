@@ -0,0 +1,440 @@
+"""Saving the state of a universe to a compact binary file, and loading it.
+
+A snapshot starts with a header, followed by sections of fixed-size records,
+one section per kind of object. Records are NumPy structured arrays, written
+and read in one piece, so loading parses no fields one by one. Every section
+is prefixed by its name and size, so readers can skip sections they don't know.
+
+Backgrounds and particles aren't part of a snapshot.
+"""
+
+from __future__ import annotations
+
+import math
+import random
+import struct
+from typing import TYPE_CHECKING
+
+import numpy as np
+from pygame import Color, Rect
+from pygame.math import Vector2 as Vec2
+
+from particles import ParticleSystem
+from projectiles import Bullet, Rocket
+from ship import BulletEnemy, PlayerShip, RocketEnemy, Ship, ShipInput
+from universe import MAX_PARTICLES, Area, Asteroid, Planet, RefuelArea, TrophyArea
+
+if TYPE_CHECKING:
+    from universe import Universe
+
+SNAPSHOT_MAGIC = b"SGSN"
+SNAPSHOT_VERSION = 1
+# Magic, version, number of sections, and the world's width and height
+SNAPSHOT_HEADER = struct.Struct("<4sHHdd")
+# Name, number of records, and size in bytes of a section
+SECTION_HEADER = struct.Struct("<8sQQ")
+
+# Indices stored in place of classes
+ENEMY_KINDS: list[type[BulletEnemy]] = [BulletEnemy, RocketEnemy]
+PROJECTILE_KINDS: list[type[Bullet]] = [Bullet, Rocket]
+AREA_KINDS: list[type[Area]] = [Area, RefuelArea, TrophyArea]
+ENEMY_ACTIONS = list(BulletEnemy.Action)
+AREA_CAPTION_BYTES = 32
+
+_DISK_FIELDS = [
+    ("pos", "<f8", 2),
+    ("vel", "<f8", 2),
+    ("radius", "<f8"),
+    ("mass", "<f8"),
+    ("color", "u1", 4),
+    ("bullet_color", "u1", 4),
+]
+_SHIP_FIELDS = [
+    *_DISK_FIELDS,
+    ("angle", "<f8"),
+    ("health", "<f8"),
+    ("fuel", "<f8"),
+    ("ammo", "<i4"),
+    ("gun_cooldown", "<f8"),
+    ("has_trophy", "u1"),
+    ("damage_indicator_timer", "<f8"),
+    # Rotate-left-, rotate-right-, forward- and backward-thrusters
+    ("thrusters", "u1", 4),
+]
+
+PLANET_DTYPE = np.dtype(_DISK_FIELDS)
+ASTEROID_DTYPE = np.dtype(_DISK_FIELDS)
+# Keys are the ones of ShipInput, in the order of its constructor
+PLAYER_DTYPE = np.dtype([*_SHIP_FIELDS, ("keys", "<i4", 5)])
+ENEMY_DTYPE = np.dtype(
+    [
+        *_SHIP_FIELDS,
+        ("kind", "u1"),
+        ("target", "<i4"),
+        ("shoot_cooldown", "<f8"),
+        ("time_until_next_shot", "<f8"),
+        ("action_timer", "<f8"),
+        ("action", "u1"),
+    ],
+)
+PROJECTILE_DTYPE = np.dtype(
+    [
+        # Index of the shooting ship, counting players first, then enemies
+        ("owner", "<i4"),
+        ("kind", "u1"),
+        ("pos", "<f8", 2),
+        ("vel", "<f8", 2),
+        ("color", "u1", 4),
+        ("homing_timer", "<f8"),
+    ],
+)
+AREA_DTYPE = np.dtype(
+    [
+        ("kind", "u1"),
+        ("rect", "<i4", 4),
+        ("color", "u1", 4),
+        ("caption", f"S{AREA_CAPTION_BYTES}"),
+    ],
+)
+# State of the enemies' random numbers, as by `random.Random.getstate`,
+# with a NaN for a missing `gauss_next`
+RNG_DTYPE = np.dtype([("state", "<u4", 625), ("gauss_next", "<f8")])
+
+
+def _disk_record(disk: Planet | Asteroid | Ship) -> tuple:
+    """Get the fields every disk has, in the order of _DISK_FIELDS.
+
+    Args:
+    ----
+        disk (Planet | Asteroid | Ship): Disk to describe
+
+    Returns:
+    -------
+        tuple: Fields of a record
+
+    """
+    return (
+        tuple(disk.pos),
+        tuple(disk.vel),
+        disk.radius,
+        disk.mass,
+        tuple(disk.color),
+        tuple(disk.bulletcolor),
+    )
+
+
+def _ship_record(ship: Ship) -> tuple:
+    """Get the fields every ship has, in the order of _SHIP_FIELDS.
+
+    Args:
+    ----
+        ship (Ship): Ship to describe
+
+    Returns:
+    -------
+        tuple: Fields of a record
+
+    """
+    return (
+        *_disk_record(ship),
+        ship.angle,
+        ship.health,
+        ship.fuel,
+        ship.ammo,
+        ship.gun_cooldown,
+        ship.has_trophy,
+        ship.damage_indicator_timer,
+        (
+            ship.thruster_rot_left,
+            ship.thruster_rot_right,
+            ship.thruster_forward,
+            ship.thruster_backward,
+        ),
+    )
+
+
+def _density(radius: float, mass: float) -> float:
+    """Get the density of a disk with `radius` weighing `mass`, see `Disk`.
+
+    Args:
+    ----
+        radius (float): Radius
+        mass (float): Mass
+
+    Returns:
+    -------
+        float: Density
+
+    """
+    return mass / (radius**3 * math.pi * 4 / 3)
+
+
+def _restore_ship(ship: Ship, record: tuple) -> None:
+    """Set the fields of `_ship_record` on a newly created ship.
+
+    Args:
+    ----
+        ship (Ship): Ship to restore
+        record (tuple): Record, as by `tolist`
+
+    """
+    (
+        _,
+        vel,
+        _,
+        ship.mass,
+        _,
+        _,
+        ship.angle,
+        ship.health,
+        ship.fuel,
+        ship.ammo,
+        ship.gun_cooldown,
+        has_trophy,
+        ship.damage_indicator_timer,
+        thrusters,
+    ) = record[: len(_SHIP_FIELDS)]
+    ship.vel.update(vel)
+    ship.has_trophy = bool(has_trophy)
+    (
+        ship.thruster_rot_left,
+        ship.thruster_rot_right,
+        ship.thruster_forward,
+        ship.thruster_backward,
+    ) = map(bool, thrusters)
+
+
+def write_snapshot(universe: Universe, path: str) -> None:
+    """Save the state of `universe` to a file.
+
+    Args:
+    ----
+        universe (Universe): Universe to save
+        path (str): Path of the file
+
+    """
+    players = universe.player_ships
+    enemies = universe.enemy_ships
+    player_ixs = {id(player): ix for ix, player in enumerate(players)}
+
+    sections = [
+        (
+            b"PLANETS",
+            np.array([_disk_record(p) for p in universe.planets], PLANET_DTYPE),
+        ),
+        (
+            b"ASTEROID",
+            np.array([_disk_record(a) for a in universe.asteroids], ASTEROID_DTYPE),
+        ),
+        (
+            b"PLAYERS",
+            np.array(
+                [
+                    (
+                        *_ship_record(player),
+                        (
+                            player.spaceship_input.thruster_rot_left,
+                            player.spaceship_input.thruster_rot_right,
+                            player.spaceship_input.thruster_forward,
+                            player.spaceship_input.thruster_backward,
+                            player.spaceship_input.shoot,
+                        ),
+                    )
+                    for player in players
+                ],
+                PLAYER_DTYPE,
+            ),
+        ),
+        (
+            b"ENEMIES",
+            np.array(
+                [
+                    (
+                        *_ship_record(enemy),
+                        ENEMY_KINDS.index(type(enemy)),
+                        player_ixs[id(enemy.target_ship)],
+                        enemy.shoot_cooldown,
+                        enemy.time_until_next_shot,
+                        enemy.action_timer,
+                        ENEMY_ACTIONS.index(enemy.current_action),
+                    )
+                    for enemy in enemies
+                ],
+                ENEMY_DTYPE,
+            ),
+        ),
+        (
+            b"PROJECTL",
+            np.array(
+                [
+                    (
+                        owner_ix,
+                        PROJECTILE_KINDS.index(type(projectile)),
+                        tuple(projectile.pos),
+                        tuple(projectile.vel),
+                        tuple(projectile.color),
+                        getattr(projectile, "homing_timer", 0.0),
+                    )
+                    for owner_ix, ship in enumerate(players + enemies)
+                    for projectile in ship.projectiles
+                ],
+                PROJECTILE_DTYPE,
+            ),
+        ),
+        (
+            b"AREAS",
+            np.array(
+                [
+                    (
+                        AREA_KINDS.index(type(area)),
+                        tuple(area),
+                        tuple(area.color),
+                        area.caption.encode()[:AREA_CAPTION_BYTES],
+                    )
+                    for area in universe.areas
+                ],
+                AREA_DTYPE,
+            ),
+        ),
+    ]
+    if enemies:
+        # Enemies built together share their random numbers, see `build_universe`
+        _, state, gauss_next = enemies[0].rng.getstate()
+        rng_state = (state, math.nan if gauss_next is None else gauss_next)
+        sections.append((b"RNG", np.array([rng_state], RNG_DTYPE)))
+
+    with open(path, "wb") as file:
+        file.write(
+            SNAPSHOT_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_VERSION,
+                len(sections),
+                universe.size.x,
+                universe.size.y,
+            ),
+        )
+        for name, records in sections:
+            file.write(SECTION_HEADER.pack(name, len(records), records.nbytes))
+            file.write(records.tobytes())
+
+
+def read_snapshot(universe: Universe, path: str) -> None:
+    """Replace the state of `universe` by one saved to a file.
+
+    Args:
+    ----
+        universe (Universe): Universe to load into, keeping its backgrounds
+        path (str): Path of the file
+
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, section_count, width, height = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+        msg = f"{path} is no snapshot of version {SNAPSHOT_VERSION}"
+        raise ValueError(msg)
+
+    dtypes = {
+        b"PLANETS": PLANET_DTYPE,
+        b"ASTEROID": ASTEROID_DTYPE,
+        b"PLAYERS": PLAYER_DTYPE,
+        b"ENEMIES": ENEMY_DTYPE,
+        b"PROJECTL": PROJECTILE_DTYPE,
+        b"AREAS": AREA_DTYPE,
+        b"RNG": RNG_DTYPE,
+    }
+    sections: dict[bytes, list] = {}
+    offset = SNAPSHOT_HEADER.size
+    for _ in range(section_count):
+        name, count, nbytes = SECTION_HEADER.unpack_from(data, offset)
+        offset += SECTION_HEADER.size
+        name = name.rstrip(b"\0")
+        if name in dtypes:
+            records = np.frombuffer(data, dtypes[name], count, offset)
+            # Converted column by column, as `tolist` leaves sub-arrays as arrays
+            columns = [records[field].tolist() for field in records.dtype.names]
+            sections[name] = list(zip(*columns))
+        offset += nbytes
+
+    # Masses are set after creating disks, to not lose precision through density
+    planets = []
+    for pos, _, radius, mass, color, bullet_color in sections.get(b"PLANETS", []):
+        planet = Planet(Vec2(pos), _density(radius, mass), radius, color, bullet_color)
+        planet.mass = mass
+        planets.append(planet)
+    asteroids = []
+    for pos, vel, radius, mass, _, bullet_color in sections.get(b"ASTEROID", []):
+        asteroid = Asteroid(
+            Vec2(pos), Vec2(vel), _density(radius, mass), radius, bullet_color,
+        )
+        asteroid.mass = mass
+        asteroids.append(asteroid)
+
+    player_ships = []
+    for record in sections.get(b"PLAYERS", []):
+        pos, _, radius, mass, color, bullet_color = record[:6]
+        player = PlayerShip(
+            Vec2(pos),
+            Vec2(0, 0),
+            _density(radius, mass),
+            radius,
+            Color(color),
+            Color(bullet_color),
+            ShipInput(*record[-1]),
+        )
+        _restore_ship(player, record)
+        player_ships.append(player)
+
+    rng = random.Random()
+    if b"RNG" in sections:
+        [(state, gauss_next)] = sections[b"RNG"]
+        rng.setstate((3, tuple(state), None if math.isnan(gauss_next) else gauss_next))
+    enemy_ships = []
+    for record in sections.get(b"ENEMIES", []):
+        pos, _, _, _, color, bullet_color = record[:6]
+        kind, target, shoot_cooldown, time_until_next_shot, action_timer, action = (
+            record[len(_SHIP_FIELDS) :]
+        )
+        enemy = ENEMY_KINDS[kind](
+            Vec2(pos),
+            Vec2(0, 0),
+            player_ships[target],
+            shoot_cooldown,
+            Color(color),
+            rng=rng,
+        )
+        enemy.bullet_color = Color(bullet_color)
+        enemy.bulletcolor = Color(bullet_color)
+        _restore_ship(enemy, record)
+        enemy.time_until_next_shot = time_until_next_shot
+        enemy.action_timer = action_timer
+        enemy.current_action = ENEMY_ACTIONS[action]
+        enemy_ships.append(enemy)
+
+    ships: list[Ship] = [*player_ships, *enemy_ships]
+    for owner, kind, pos, vel, color, homing_timer in sections.get(b"PROJECTL", []):
+        ship = ships[owner]
+        if PROJECTILE_KINDS[kind] is Rocket:
+            projectile = Rocket(Vec2(pos), Vec2(0, 0), Color(color), ship.target_ship)
+            projectile.homing_timer = homing_timer
+        else:
+            projectile = Bullet(Vec2(pos), Vec2(0, 0), Color(color))
+        projectile.vel.update(vel)
+        ship.projectiles.append(projectile)
+
+    areas: list[Area] = []
+    for kind, rect, color, caption in sections.get(b"AREAS", []):
+        if AREA_KINDS[kind] is Area:
+            areas.append(Area(Rect(rect), Color(color), caption.decode()))
+        else:
+            areas.append(AREA_KINDS[kind](Rect(rect)))
+
+    universe.size = Vec2(width, height)
+    universe.planets = planets
+    universe.asteroids = asteroids
+    universe.player_ships = player_ships
+    universe.enemy_ships = enemy_ships
+    universe.areas = areas
+    universe.particles = ParticleSystem(MAX_PARTICLES)
+    universe.mark_static_changed()
+    universe.generation += 1
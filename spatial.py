@@ -0,0 +1,144 @@
+"""A uniform-grid spatial index, for quickly finding things in a worldspace-area."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from pygame import Rect
+
+
+class SpatialHash:
+    """Buckets objects into square worldspace-cells by their bounding rectangle.
+
+    Objects are returned from queries in the order they were inserted,
+    so the index can be used to preserve drawing order.
+    """
+
+    def __init__(self, cell_size: float) -> None:
+        """Create a new, empty spatial hash.
+
+        Args:
+        ----
+            cell_size (float): Worldspace-width and -height of a single cell
+
+        """
+        self.cell_size = cell_size
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        self._objects: list[Any] = []
+        self._rects: list[Rect] = []
+
+    def __len__(self) -> int:
+        """Get the number of inserted objects.
+
+        Returns
+        -------
+            int: Number of inserted objects
+
+        """
+        return len(self._objects)
+
+    def clear(self) -> None:
+        """Remove all objects."""
+        self._cells.clear()
+        self._objects.clear()
+        self._rects.clear()
+
+    def _cell_range(self, rect: Rect) -> tuple[range, range]:
+        """Get the cell-indices covered by a worldspace-rectangle.
+
+        Args:
+        ----
+            rect (Rect): Worldspace-rectangle
+
+        Returns:
+        -------
+            tuple[range, range]: Horizontal and vertical cell-indices
+
+        """
+        cell_size = self.cell_size
+        left, right = rect.left // cell_size, rect.right // cell_size
+        top, bottom = rect.top // cell_size, rect.bottom // cell_size
+        return range(int(left), int(right) + 1), range(int(top), int(bottom) + 1)
+
+    def insert(self, obj: Any, rect: Rect) -> None:
+        """Insert an object with a worldspace-bounding-rectangle.
+
+        Args:
+        ----
+            obj (Any): Object to insert
+            rect (Rect): Worldspace-rectangle enclosing `obj`
+
+        """
+        ix = len(self._objects)
+        self._objects.append(obj)
+        self._rects.append(rect)
+        cells = self._cells
+        xs, ys = self._cell_range(rect)
+        for x in xs:
+            for y in ys:
+                bucket = cells.get((x, y))
+                if bucket is None:
+                    cells[(x, y)] = [ix]
+                else:
+                    bucket.append(ix)
+
+    def query_indices(self, rect: Rect) -> set[int]:
+        """Get the insertion-indices of all objects overlapping a worldspace-rectangle.
+
+        Args:
+        ----
+            rect (Rect): Worldspace-rectangle to search
+
+        Returns:
+        -------
+            set[int]: Insertion-indices of matching objects
+
+        """
+        xs, ys = self._cell_range(rect)
+        cells = self._cells
+        if len(xs) * len(ys) >= len(cells):
+            # Cheaper to just look at every occupied cell
+            candidates = (
+                bucket
+                for (x, y), bucket in cells.items()
+                if x in xs and y in ys
+            )
+        else:
+            candidates = (
+                cells[(x, y)] for x in xs for y in ys if (x, y) in cells
+            )
+
+        found: set[int] = set()
+        for bucket in candidates:
+            found.update(bucket)
+        rects = self._rects
+        return {ix for ix in found if rect.colliderect(rects[ix])}
+
+    def get_entry(self, ix: int) -> tuple[Any, Rect]:
+        """Get an inserted object and its bounding rectangle.
+
+        Args:
+        ----
+            ix (int): Insertion-index of the object
+
+        Returns:
+        -------
+            tuple[Any, Rect]: The object and its worldspace-bounding-rectangle
+
+        """
+        return self._objects[ix], self._rects[ix]
+
+    def query(self, rect: Rect) -> list[Any]:
+        """Get all objects whose bounding rectangles overlap a worldspace-rectangle.
+
+        Args:
+        ----
+            rect (Rect): Worldspace-rectangle to search
+
+        Returns:
+        -------
+            list[Any]: Matching objects, in insertion-order
+
+        """
+        objects = self._objects
+        return [objects[ix] for ix in sorted(self.query_indices(rect))]
@@ -0,0 +1,180 @@
+"""Exporting the state of everything that moves as read-only NumPy arrays.
+
+Tools that sample the universe, e.g. for analytics or visualization, read flat
+arrays instead of walking its objects one by one. The arrays are views on
+buffers owned by the universe, and are refreshed at most once per generation,
+however many tools read them. A refresh still walks every object once, as the
+state lives in the objects, not in the buffers.
+"""
+
+from __future__ import annotations
+
+from itertools import chain
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from universe import Universe
+
+# Kinds of entities, the code of a kind is its index. Named by class, as
+# `universe.py` builds on this module.
+ENTITY_KINDS = [
+    "Asteroid",
+    "PlayerShip",
+    "BulletEnemy",
+    "RocketEnemy",
+    "Bullet",
+    "Rocket",
+]
+_KIND_CODES = {name: code for code, name in enumerate(ENTITY_KINDS)}
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """View `array` through a read-only buffer.
+
+    Unlike clearing the writeable-flag, this can't be undone by the viewer.
+
+    Args:
+    ----
+        array (np.ndarray): C-contiguous array to view
+
+    Returns:
+    -------
+        np.ndarray: Read-only view sharing the memory of `array`
+
+    """
+    return np.asarray(memoryview(array).toreadonly())
+
+
+class StateView:
+    """Read-only arrays of the state of every asteroid, ship and projectile.
+
+    Entities are ordered asteroids first, then player-ships, enemies, and every
+    ship's projectiles. Row `ix` of every array belongs to the same entity.
+    The arrays are only valid while `generation` equals the universe's, a
+    later export may overwrite them in place.
+    """
+
+    def __init__(
+        self,
+        generation: int,
+        pos: np.ndarray,
+        vel: np.ndarray,
+        kind: np.ndarray,
+        health: np.ndarray,
+    ) -> None:
+        """Create a new view.
+
+        Args:
+        ----
+            generation (int): Generation of the universe the arrays show
+            pos (np.ndarray): Positions, of shape (count, 2)
+            vel (np.ndarray): Velocities, of shape (count, 2)
+            kind (np.ndarray): Indices into ENTITY_KINDS, of shape (count,)
+            health (np.ndarray): Health of ships, NaN for everything else,
+                of shape (count,)
+
+        """
+        self.generation = generation
+        self.pos = pos
+        self.vel = vel
+        self.kind = kind
+        self.health = health
+
+    def __len__(self) -> int:
+        """Count the entities.
+
+        Returns
+        -------
+            int: Number of rows in every array
+
+        """
+        return len(self.kind)
+
+
+class StateExport:
+    """Growable buffers the state of a universe is exported into."""
+
+    def __init__(self, capacity: int = 1_024) -> None:
+        """Create empty buffers.
+
+        Args:
+        ----
+            capacity (int, optional): Number of entities room is made for
+                up front. Defaults to 1_024.
+
+        """
+        self._allocate(capacity)
+        self.view: StateView | None = None
+
+    def _allocate(self, capacity: int) -> None:
+        """Replace the buffers by bigger ones. Existing views keep the old ones.
+
+        Args:
+        ----
+            capacity (int): Number of entities to make room for
+
+        """
+        self.capacity = capacity
+        self._pos = np.zeros((capacity, 2), dtype=np.float64)
+        self._vel = np.zeros((capacity, 2), dtype=np.float64)
+        self._kind = np.zeros(capacity, dtype=np.uint8)
+        self._health = np.zeros(capacity, dtype=np.float64)
+
+    def export(self, universe: Universe) -> StateView:
+        """Get the state of `universe`, refreshing the buffers if it changed.
+
+        Args:
+        ----
+            universe (Universe): Universe to export
+
+        Returns:
+        -------
+            StateView: Read-only views of the buffers
+
+        """
+        if self.view is not None and self.view.generation == universe.generation:
+            return self.view
+
+        ships = universe.player_ships + universe.enemy_ships
+        projectiles = [
+            projectile for ship in ships for projectile in ship.projectiles
+        ]
+        entities = [*universe.asteroids, *ships, *projectiles]
+        count = len(entities)
+        if count > self.capacity:
+            self._allocate(max(count, 2 * self.capacity))
+
+        pos = self._pos[:count]
+        vel = self._vel[:count]
+        kind = self._kind[:count]
+        health = self._health[:count]
+        # Vectors iterate over their coordinates, filling rows of x and y
+        pos.reshape(-1)[:] = np.fromiter(
+            chain.from_iterable([entity.pos for entity in entities]),
+            dtype=np.float64,
+            count=2 * count,
+        )
+        vel.reshape(-1)[:] = np.fromiter(
+            chain.from_iterable([entity.vel for entity in entities]),
+            dtype=np.float64,
+            count=2 * count,
+        )
+        ship_start = len(universe.asteroids)
+        ship_stop = ship_start + len(ships)
+        kind[:ship_start] = _KIND_CODES["Asteroid"]
+        kind[ship_start:] = [
+            _KIND_CODES[type(entity).__name__] for entity in entities[ship_start:]
+        ]
+        health[:] = np.nan
+        health[ship_start:ship_stop] = [ship.health for ship in ships]
+
+        self.view = StateView(
+            universe.generation,
+            _read_only(pos),
+            _read_only(vel),
+            _read_only(kind),
+            _read_only(health),
+        )
+        return self.view
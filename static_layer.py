@@ -0,0 +1,182 @@
+"""A cache of pre-rendered tiles of a universe's unmoving content."""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+import pygame
+from pygame import Rect
+from pygame.math import Vector2 as Vec2
+
+from camera import Camera
+
+if TYPE_CHECKING:
+    from universe import Universe
+
+# Number of zoom-buckets per doubling of the zoom
+ZOOM_BUCKETS_PER_OCTAVE = 4
+
+
+class StaticLayerCache:
+    """Renders a universe's grid, areas and planets into fixed-size tiles.
+
+    Tiles are rendered lazily for the zoom-bucket just below a camera's zoom,
+    and scaled to the exact zoom when blitted. Scaled tiles are reused while
+    the zoom is steady, but a drifting zoom scales every visible tile again
+    each frame, which costs several times drawing the content directly.
+    The least recently used tiles are evicted once more than `max_tiles`
+    are cached.
+    Tiles without any content are remembered as such, and never blitted.
+    Cameras may draw from several threads at once.
+    """
+
+    def __init__(self, universe: Universe, tile_size: int, max_tiles: int) -> None:
+        """Create a new, empty cache.
+
+        Args:
+        ----
+            universe (Universe): Universe whose static content is cached
+            tile_size (int): Screenspace-width and -height of a tile
+            max_tiles (int): Maximum number of tiles kept in memory
+
+        """
+        self.universe = universe
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self._tiles: OrderedDict[tuple[int, int, int], pygame.Surface | None] = (
+            OrderedDict()
+        )
+        # Tiles scaled to a camera's exact zoom, reused while the zoom is steady
+        self._scaled: OrderedDict[tuple, pygame.Surface] = OrderedDict()
+        self._static_version = universe.static_version
+        # Guards both caches, whose LRU-order changes on every lookup
+        self._lock = threading.RLock()
+
+    def invalidate(self) -> None:
+        """Discard all tiles, e.g. because the static content changed."""
+        with self._lock:
+            self._tiles.clear()
+            self._scaled.clear()
+
+    def _get_tile(self, bucket: int, tx: int, ty: int) -> pygame.Surface | None:
+        """Get a tile, rendering it if it isn't cached.
+
+        Args:
+        ----
+            bucket (int): Zoom-bucket
+            tx (int): Horizontal tile-index
+            ty (int): Vertical tile-index
+
+        Returns:
+        -------
+            pygame.Surface | None: The tile, with transparent background,
+                or None if the tile is entirely transparent
+
+        """
+        key = (bucket, tx, ty)
+        if key in self._tiles:
+            self._tiles.move_to_end(key)
+            return self._tiles[key]
+
+        zoom = 2 ** (bucket / ZOOM_BUCKETS_PER_OCTAVE)
+        tile_world_size = self.tile_size / zoom
+        tile = pygame.Surface((self.tile_size, self.tile_size), pygame.SRCALPHA)
+        tile_center = (Vec2(tx, ty) + Vec2(0.5, 0.5)) * tile_world_size
+        self.universe.draw_static(Camera(tile_center, zoom, tile))
+        if not tile.get_bounding_rect():
+            tile = None
+
+        self._tiles[key] = tile
+        if len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return tile
+
+    def _get_scaled_tile(
+        self, bucket: int, tx: int, ty: int, size: tuple[int, int],
+    ) -> pygame.Surface | None:
+        """Get a tile scaled to a screenspace-size.
+
+        Args:
+        ----
+            bucket (int): Zoom-bucket
+            tx (int): Horizontal tile-index
+            ty (int): Vertical tile-index
+            size (tuple[int, int]): Screenspace-size to scale to
+
+        Returns:
+        -------
+            pygame.Surface | None: The scaled tile, None if it's entirely transparent
+
+        """
+        with self._lock:
+            tile = self._get_tile(bucket, tx, ty)
+            if tile is None:
+                return None
+            key = (bucket, tx, ty, size)
+            scaled = self._scaled.get(key)
+            if scaled is not None:
+                self._scaled.move_to_end(key)
+                # Run-length-encoding makes blitting the mostly transparent tile
+                # as cheap as drawing its content, but only pays off if reused
+                if not scaled.get_flags() & pygame.RLEACCELOK:
+                    scaled.set_alpha(255, pygame.RLEACCEL)
+                return scaled
+            # Copied even if unscaled, as tiles being scaled mustn't be encoded
+            if size == tile.get_size():
+                scaled = tile.copy()
+            else:
+                scaled = pygame.transform.scale(tile, size)
+            self._scaled[key] = scaled
+            if len(self._scaled) > self.max_tiles:
+                self._scaled.popitem(last=False)
+            return scaled
+
+    def draw(self, camera: Camera) -> int:
+        """Blit all tiles visible on `camera`.
+
+        Args:
+        ----
+            camera (Camera): Camera to draw on
+
+        Returns:
+        -------
+            int: Number of blitted tiles
+
+        """
+        with self._lock:
+            if self._static_version != self.universe.static_version:
+                self.invalidate()
+                self._static_version = self.universe.static_version
+
+        zoom = camera.zoom
+        # Round down, so tiles are only ever scaled up and hairlines never vanish
+        bucket = math.floor(math.log2(zoom) * ZOOM_BUCKETS_PER_OCTAVE)
+        tile_world_size = self.tile_size / 2 ** (bucket / ZOOM_BUCKETS_PER_OCTAVE)
+
+        world_rect = camera.get_world_rect().clip(
+            Rect((0, 0), self.universe.size).inflate(2, 2),
+        )
+        if not world_rect:
+            return 0
+        first_tx = math.floor(world_rect.left / tile_world_size)
+        last_tx = math.floor(world_rect.right / tile_world_size)
+        first_ty = math.floor(world_rect.top / tile_world_size)
+        last_ty = math.floor(world_rect.bottom / tile_world_size)
+
+        px, py = camera.pos
+        blits = []
+        for tx in range(first_tx, last_tx + 1):
+            # Round tile-edges, not sizes, so neighbouring tiles never leave seams
+            x0 = round((tx * tile_world_size - px) * zoom)
+            x1 = round(((tx + 1) * tile_world_size - px) * zoom)
+            for ty in range(first_ty, last_ty + 1):
+                y0 = round((ty * tile_world_size - py) * zoom)
+                y1 = round(((ty + 1) * tile_world_size - py) * zoom)
+                tile = self._get_scaled_tile(bucket, tx, ty, (x1 - x0, y1 - y0))
+                if tile is not None:
+                    blits.append((tile, (x0, y0)))
+        camera.surface.blits(blits, doreturn=False)
+        return len(blits)
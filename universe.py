@@ -5,17 +5,35 @@ everything else, you must first invent the universe.
 from __future__ import annotations
 
 import math
+import zlib
+from array import array
+from contextlib import contextmanager
 from typing import TYPE_CHECKING
 
 import pygame
 from pygame import Color, Rect
 from pygame.math import Vector2 as Vec2
 
+from particles import ParticleSystem
 from physics import Disk, PhysicalObject
+from projectiles import Bullet
+from ship import PlayerShip, Ship
+from spatial import SpatialHash
+from state_export import StateExport
 
 if TYPE_CHECKING:
+    from collections.abc import Iterator
+
     from camera import Camera
-    from ship import BulletEnemy, PlayerShip, Ship
+    from display_list import DisplayList
+    from ship import BulletEnemy
+    from state_export import StateView
+
+# Worldspace-size of a cell in the spatial index used for culling
+SPATIAL_CELL_SIZE = 1000
+
+# Maximum number of particles alive at once, the oldest are replaced first
+MAX_PARTICLES = 65_536
 
 
 class Planet(Disk):
@@ -90,6 +108,16 @@ class Area(Rect):
         self.color = color
         self.caption = caption
 
+    def get_bounding_rect(self) -> Rect:
+        """Get a worldspace-rectangle enclosing `self`.
+
+        Returns
+        -------
+            Rect: Worldspace-bounding-rectangle
+
+        """
+        return Rect(self)
+
     def draw(self, camera: Camera) -> None:
         """Draw `self` on `camera`.
 
@@ -202,6 +230,14 @@ class Universe:
             pygame.image.load(path).convert_alpha()
             for path in parallax_background_paths
         ]
+        # Rebuilt lazily, once per step, on the first draw needing it
+        self._spatial_index: SpatialHash | None = None
+        # Incremented whenever grid, areas or planets change
+        self.static_version: int = 0
+        # Incremented whenever anything that moves may have changed, e.g. by a step
+        self.generation: int = 0
+        self._state_export = StateExport()
+        self.particles = ParticleSystem(MAX_PARTICLES)
 
     def apply_gravity_to_obj(self, dt: float, pobj: PhysicalObject) -> None:
         """Affect pobj by `self`'s entire gravity.
@@ -289,6 +325,7 @@ class Universe:
                     if enemy_ship.intersects_point(projectile.pos):
                         self.enemy_ships.remove(enemy_ship)
                         player_ship.projectiles.remove(projectile)
+                        self.explode(enemy_ship)
                         break
         for enemy_ship in self.enemy_ships:
             for projectile in enemy_ship.projectiles:
@@ -303,6 +340,55 @@ class Universe:
                         enemy_ship.projectiles.remove(projectile)
                         break
 
+    def explode(self, ship: Ship) -> None:
+        """Emit an explosion's particles where `ship` was destroyed.
+
+        Args:
+        ----
+            ship (Ship): Destroyed ship
+
+        """
+        for color, count, speed in [
+            (Color("orange"), 300, 250),
+            (Color("yellow"), 150, 120),
+            (ship.color, 100, 180),
+        ]:
+            self.particles.emit(count, ship.pos, ship.vel, None, 0, speed, 1.2, color)
+
+    @contextmanager
+    def interpolated(self, alpha: float) -> Iterator[None]:
+        """Move all moving objects between their last two steps, for drawing.
+
+        Positions are restored on leaving the context, so the simulation
+        never sees interpolated positions. Entering and leaving both bump
+        `generation`, so exports made inside show interpolated positions,
+        and aren't taken for current ones outside, or the other way round.
+
+        Args:
+        ----
+            alpha (float): 0 for the positions before the last step,
+                1 for the current positions
+
+        """
+        moving_objects: list[PhysicalObject] = [
+            *self.asteroids,
+            *self.enemy_ships,
+            *self.player_ships,
+        ]
+        for ship in self.enemy_ships + self.player_ships:
+            moving_objects.extend(ship.projectiles)
+        current_positions = [obj.pos for obj in moving_objects]
+        for obj in moving_objects:
+            obj.pos = obj.prev_pos.lerp(obj.pos, alpha)
+        # The spatial index and exports must match the positions they're used with
+        self.mark_moved()
+        try:
+            yield
+        finally:
+            for obj, pos in zip(moving_objects, current_positions):
+                obj.pos = pos
+            self.mark_moved()
+
     def handle_input(self, keys: pygame.key.ScancodeWrapper) -> None:
         """Run input-logic for player-ships.
 
@@ -311,8 +397,38 @@ class Universe:
             keys (pygame.key.ScancodeWrapper): Pressed keys
 
         """
-        for player_ship in self.player_ships:
-            player_ship.handle_input(keys)
+        self.apply_inputs(self.read_inputs(keys))
+
+    def read_inputs(
+        self, keys: pygame.key.ScancodeWrapper,
+    ) -> list[tuple[bool, ...]]:
+        """Read every player's input-state, without applying it.
+
+        Args:
+        ----
+            keys (pygame.key.ScancodeWrapper): Pressed keys
+
+        Returns:
+        -------
+            list[tuple[bool, ...]]: Input-state of each player-ship
+
+        """
+        return [player_ship.read_input(keys) for player_ship in self.player_ships]
+
+    def apply_inputs(self, inputs: list[tuple[bool, ...]]) -> None:
+        """Apply input-states, as read by `read_inputs`, to the player-ships.
+
+        Args:
+        ----
+            inputs (list[tuple[bool, ...]]): Input-state of each player-ship
+
+        """
+        projectile_count = sum(len(ship.projectiles) for ship in self.player_ships)
+        for player_ship, state in zip(self.player_ships, inputs):
+            player_ship.apply_input(state)
+        # Shots add projectiles outside of a step
+        if sum(len(ship.projectiles) for ship in self.player_ships) != projectile_count:
+            self.mark_moved()
 
     def move_camera(self, camera: Camera, player_ix: int, dt: float) -> None:
         """Move the camera to `self.player_ships[player_ix]`.
@@ -339,30 +455,169 @@ class Universe:
             dt (float): Passed time
 
         """
-        # Call `step` on everything
-        for ship in self.player_ships + self.enemy_ships:
-            ship.step(dt)
+        self.step_ticks(dt, 1)
+
+    def step_ticks(self, dt: float, ticks: int) -> None:
+        """Run the universe-logic several times in a row, e.g. when warping time.
+
+        Purely cosmetic bookkeeping, like particles, is done once for all steps.
+
+        Args:
+        ----
+            dt (float): Passed time per step
+            ticks (int): Number of steps
+
+        """
+        self._spatial_index = None
+        self.generation += 1
+
+        for _ in range(ticks):
+            # Call `step` on everything
+            for ship in self.player_ships + self.enemy_ships:
+                ship.step(dt)
+            for asteroid in self.asteroids:
+                asteroid.step(dt)
+
+            # Physics
+            self.apply_gravity(dt)
+            self.apply_bounce()
+
+            # Areas
+            for area in self.areas:
+                for player_ship in self.player_ships:
+                    if area.collidepoint(player_ship.pos):
+                        area.event(player_ship)
+
+            self.collide_bullets()
+
+        self.step_particles(dt * ticks)
+
+    def checksum(self) -> int:
+        """Hash the state of everything that moves, e.g. to compare two runs.
+
+        Returns
+        -------
+            int: CRC-32 of all positions and velocities, and the ships' vitals
+
+        """
+        values = array("d")
         for asteroid in self.asteroids:
-            asteroid.step(dt)
+            values.extend((asteroid.pos.x, asteroid.pos.y))
+            values.extend((asteroid.vel.x, asteroid.vel.y))
+        for ship in self.player_ships + self.enemy_ships:
+            values.extend(
+                (
+                    ship.pos.x,
+                    ship.pos.y,
+                    ship.vel.x,
+                    ship.vel.y,
+                    ship.angle,
+                    ship.health,
+                    ship.fuel,
+                    ship.ammo,
+                ),
+            )
+            for projectile in ship.projectiles:
+                values.extend((projectile.pos.x, projectile.pos.y))
+                values.extend((projectile.vel.x, projectile.vel.y))
+        return zlib.crc32(values.tobytes())
+
+    def export_state(self) -> StateView:
+        """Get a cached copy of the positions, velocities, kinds and health
+        of everything that moves.
+
+        The arrays are read-only, and refreshed at most once per generation.
+        A refresh copies every entity's state out of its object, which costs
+        about 6 ms per 10k entities, so it's cheap for every reader but the
+        first of a generation. Compare their generation to `self.generation`
+        to tell whether they're still current, see state_export.py.
+
+        Returns
+        -------
+            StateView: Arrays of every asteroid, ship and projectile
+
+        """
+        return self._state_export.export(self)
 
-        # Physics
-        self.apply_gravity(dt)
-        self.apply_bounce()
+    def save_snapshot(self, path: str) -> None:
+        """Save the state of `self` to a file, see snapshot.py.
 
-        # Areas
-        for area in self.areas:
-            for player_ship in self.player_ships:
-                if area.collidepoint(player_ship.pos):
-                    area.event(player_ship)
+        Args:
+        ----
+            path (str): Path of the file
+
+        """
+        # Imported here, as snapshot.py builds on this module
+        from snapshot import write_snapshot
+
+        write_snapshot(self, path)
+
+    def load_snapshot(self, path: str) -> None:
+        """Replace the state of `self` by one saved by `save_snapshot`.
+
+        Backgrounds are kept, particles are cleared.
+
+        Args:
+        ----
+            path (str): Path of the file
+
+        """
+        from snapshot import read_snapshot
+
+        read_snapshot(self, path)
+
+    def max_time_warp(self, factors: list[int], safe_distance: float) -> int:
+        """Get the highest warp-factor that's safe for every player-ship.
+
+        A factor is safe while no planet or enemy is within `safe_distance`
+        times the factor of a player-ship, so players get to react
+        before anything happens.
 
-        self.collide_bullets()
+        Args:
+        ----
+            factors (list[int]): Warp-factors in ascending order, starting at 1
+            safe_distance (float): Worldspace-distance kept free per factor
 
-    def draw_background(self, camera: Camera) -> None:
+        Returns:
+        -------
+            int: Highest safe factor
+
+        """
+        disks: list[Disk] = [*self.planets, *self.enemy_ships]
+        nearest = math.inf
+        for player_ship in self.player_ships:
+            for disk in disks:
+                gap = (
+                    player_ship.pos.distance_to(disk.pos)
+                    - player_ship.radius
+                    - disk.radius
+                )
+                nearest = min(nearest, gap)
+        safe_factors = [f for f in factors if f * safe_distance <= nearest]
+        return max(safe_factors, default=factors[0])
+
+    def step_particles(self, dt: float) -> None:
+        """Emit the ships' exhaust, and move and age all particles.
+
+        Args:
+        ----
+            dt (float): Passed time
+
+        """
+        for ship in self.player_ships + self.enemy_ships:
+            ship.emit_exhaust(self.particles, dt)
+        self.particles.step(dt)
+
+    def draw_background(
+        self, camera: Camera, max_layers: int | None = None,
+    ) -> None:
         """Draw `self`'s parallaxing background on `camera`.
 
         Args:
         ----
             camera (Camera): Camera to draw on
+            max_layers (int | None, optional): Number of layers to draw,
+                skipping the farthest ones. Defaults to None, drawing all.
 
         """
         zoom = camera.zoom
@@ -371,7 +626,11 @@ class Universe:
         camera_pos_y = -camera.pos.y * zoom
         background_count = len(self.parallax_backgrounds)
 
+        first_layer = 0 if max_layers is None else background_count - max_layers
+
         for ix, background in enumerate(self.parallax_backgrounds):
+            if ix < first_layer:
+                continue
             scaled_background = pygame.transform.smoothscale_by(background, zoom)
             (bg_width, bg_height) = Vec2(background.get_size()) * zoom
 
@@ -390,22 +649,140 @@ class Universe:
                     y = int(draw_start_y + j * bg_height)
                     camera.surface.blit(scaled_background, (x, y))
 
-    def draw(self, camera: Camera) -> None:
-        """Draw all of `self` on `camera`.
+    def mark_static_changed(self) -> None:
+        """Announce that the grid, areas or planets changed, to invalidate caches.
+
+        Nothing in the game changes them once the universe is built, so only
+        loading a snapshot calls this. Code changing them must call it too.
+        """
+        self.static_version += 1
+        self._spatial_index = None
+
+    def mark_moved(self) -> None:
+        """Announce that moving objects changed outside of a step, e.g. mirrored."""
+        self.generation += 1
+        self._spatial_index = None
+
+    def get_spatial_index(self) -> SpatialHash:
+        """Get a spatial index of everything drawable in `self`.
+
+        The index is inserted into in drawing-order, and is only
+        rebuilt after `self` has changed by stepping.
+
+        Returns
+        -------
+            SpatialHash: Index of areas, bodies, ships and projectiles
+
+        """
+        # Cameras drawing concurrently may both build the index, which is harmless
+        if self._spatial_index is None:
+            index = SpatialHash(SPATIAL_CELL_SIZE)
+            for obj in self.areas + self.asteroids + self.planets:
+                index.insert(obj, obj.get_bounding_rect())
+            for ship in self.enemy_ships + self.player_ships:
+                index.insert(ship, ship.get_bounding_rect())
+                for projectile in ship.projectiles:
+                    index.insert(projectile, projectile.get_bounding_rect())
+            self._spatial_index = index
+        return self._spatial_index
+
+    def draw(self, camera: Camera, include_static: bool = True) -> tuple[int, int]:
+        """Draw all of `self` that is visible on `camera`.
+
+        Uses the camera's visibility-information if a visibility-pass
+        provided it, and queries the spatial index otherwise.
 
         Args:
         ----
             camera (Camera): Camera to draw on
+            include_static (bool, optional): Whether to draw areas and planets,
+                set to False if they are drawn by `draw_static`. Defaults to True.
+
+        Returns:
+        -------
+            tuple[int, int]: Number of drawn objects and number of culled objects
+
+        """
+        index = self.get_spatial_index()
+        visible = camera.visible_objects
+        if visible is None:
+            visible = index.query(camera.get_world_rect())
+        if not include_static:
+            visible = [obj for obj in visible if not isinstance(obj, Area | Planet)]
+        for obj in visible:
+            camera.begin_object(obj)
+            obj.draw(camera)
+        camera.end_object()
+        return len(visible), len(index) - len(visible)
+
+    def record(
+        self,
+        camera: Camera,
+        display_list: DisplayList,
+        objects: list | None = None,
+        include_static: bool = True,
+    ) -> None:
+        """Record `objects` into `display_list`, to be replayed to several cameras.
+
+        Each kind of object gets its own layer, so the replayed result
+        is layered like `draw`'s. Only ships keep their drawing-order,
+        as their parts overlap. Areas and planets are recorded into
+        static layers.
+
+        Args:
+        ----
+            camera (Camera): Camera to record through
+            display_list (DisplayList): Display list to record into
+            objects (list | None, optional): Objects to record, in drawing-order,
+                typically `FrameVisibility.union`. Defaults to everything.
+            include_static (bool, optional): Whether to record areas and planets.
+                Defaults to True.
 
         """
-        for pobj in (
-            self.areas
-            + self.asteroids
-            + self.planets
-            + self.enemy_ships
-            + self.player_ships
+        if objects is None:
+            objects = self.get_spatial_index().query(
+                Rect((0, 0), self.size).inflate(2, 2),
+            )
+
+        areas: list[Area] = []
+        planets: list[Planet] = []
+        bodies: list[PhysicalObject] = []
+        ships: dict[bool, list[Ship]] = {False: [], True: []}
+        projectiles: dict[bool, list[Bullet]] = {False: [], True: []}
+        player_projectile_ids = {
+            id(projectile)
+            for player_ship in self.player_ships
+            for projectile in player_ship.projectiles
+        }
+        for obj in objects:
+            if isinstance(obj, Ship):
+                ships[isinstance(obj, PlayerShip)].append(obj)
+            elif isinstance(obj, Bullet):
+                projectiles[id(obj) in player_projectile_ids].append(obj)
+            elif isinstance(obj, Area):
+                areas.append(obj)
+            elif isinstance(obj, Planet):
+                planets.append(obj)
+            else:
+                bodies.append(obj)
+        if not include_static:
+            areas.clear()
+            planets.clear()
+
+        camera.start_recording(display_list)
+        for layer, batchable, static in (
+            (areas, True, True),
+            (bodies, True, False),
+            (planets, True, True),
+            (ships[False], False, False),
+            (projectiles[False], True, False),
+            (ships[True], False, False),
+            (projectiles[True], True, False),
         ):
-            pobj.draw(camera)
+            display_list.begin_layer(batchable, static)
+            for obj in layer:
+                obj.draw(camera)
+        camera.stop_recording()
 
     def draw_text(self, camera: Camera, player_ix: int) -> None:
         """Draw "debugging" text on `camera`.
@@ -419,17 +796,19 @@ class Universe:
         font_size = 32
         font = pygame.font.Font(None, font_size)
 
-        self.text_vertical_offset = 10
+        # Local, not an attribute, so cameras can draw text concurrently
+        text_vertical_offset = 10
 
         def texty(text: str | None = None) -> None:
+            nonlocal text_vertical_offset
             if text is not None:
                 camera.draw_text(
                     text,
-                    Vec2(10, self.text_vertical_offset),
+                    Vec2(10, text_vertical_offset),
                     font,
                     Color("white"),
                 )
-            self.text_vertical_offset += 1.0 * font_size
+            text_vertical_offset += 1.0 * font_size
 
         player_ship = self.player_ships[player_ix]
         texty(f"({int(player_ship.pos.x)}, {int(player_ship.pos.y)})")
@@ -448,8 +827,6 @@ class Universe:
         enemy_count = len(self.enemy_ships)
         texty(f"Enemies left: {enemy_count}")
 
-        del self.text_vertical_offset
-
     def draw_grid(self, camera: Camera) -> None:
         """Draw grid on `camera`.
 
@@ -469,6 +846,22 @@ class Universe:
         for y in range(0, int(height + 1), gridline_spacing):
             camera.draw_horizontal_hairline(grid_color, 0, width, y)
 
+    def draw_static(self, camera: Camera, include_grid: bool = True) -> None:
+        """Draw everything of `self` that never moves: grid, areas and planets.
+
+        Args:
+        ----
+            camera (Camera): Camera to draw on
+            include_grid (bool, optional): Whether to draw the grid. Defaults to True.
+
+        """
+        if include_grid:
+            self.draw_grid(camera)
+        for area in self.areas:
+            area.draw(camera)
+        for planet in self.planets:
+            planet.draw(camera)
+
     def contains_point(self, vec: Vec2) -> bool:
         """Test whether `vec` is contained in `self`'s boundaries.
 
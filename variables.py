@@ -5,7 +5,7 @@ from pygame import Color
 from pygame.math import Vector2 as Vec2
 
 from ship import PlayerShip, ShipInput, BulletEnemy, RocketEnemy
-from universe import Area, Asteroid, RefuelArea, TrophyArea, Planet
+from universe import Area, Asteroid, RefuelArea, TrophyArea, Planet, Universe
 
 """
 All the unintresting code just defining the variables and differentiating between test and playmode are now here.
@@ -19,109 +19,241 @@ MINIMAP_SIZE = Vec2(350, 350)
 WORLD_SIZE = Vec2(10_000, 10_000) if TEST_MODE else Vec2(30_000, 30_000)
 SPAWNPOINT = Vec2(5_000, 5_000) if TEST_MODE else Vec2(20_000, 20_000)
 
+# Simulation
+# Steps per second, independent of the frame rate
+SIMULATION_TICK_RATE = 60
+# Most steps run per frame. After longer stalls, the rest is skipped, not caught up
+MAX_CATCH_UP_STEPS = 5
+# Frames per second are limited to this, to not burn CPU needlessly. 0 for no limit
+FRAME_RATE_LIMIT = 240
+# Step the simulation in a worker process, publishing its state to shared memory.
+# Needs the fork start method, so it's unavailable on Windows.
+SIMULATION_PROCESS = False
+# Time warp, stepped up and down with the keys below. Runs more steps per frame,
+# so the simulation stays exactly as accurate. Unavailable with SIMULATION_PROCESS.
+TIME_WARP_FACTORS = [1, 4, 16, 64]
+TIME_WARP_UP_KEY = pygame.K_PERIOD
+TIME_WARP_DOWN_KEY = pygame.K_COMMA
+# Warp is capped so that no planet or enemy is within this worldspace-distance,
+# times the warp factor, of a player
+TIME_WARP_SAFE_DISTANCE = 250
+# Read input right before the frame's last step, instead of at the frame's start,
+# so slow frames don't delay it. Latencies are printed on exit either way.
+LATE_INPUT_SAMPLING = False
+# Record the seed and the players' input into this file, to replay the session
+# with `py replay.py`. None records nothing. Unavailable with SIMULATION_PROCESS.
+RECORDING_PATH: str | None = None
+# Start from the state saved in this file by `Universe.save_snapshot`, instead of
+# the freshly built world, e.g. `benchmark.snapshot` by `py benchmark.py snapshot`.
+# None starts fresh. Sessions started from a snapshot aren't recorded.
+SNAPSHOT_PATH: str | None = None
 
-planets_test: list[Planet] = [
-    Planet(Vec2(1_800, 6_700), 1, 370, Color("darkred"), Color("white")),
-    Planet(Vec2(2_300, 900), 1, 280, Color("green"), Color("white")),
-    Planet(Vec2(4_200, 3_700), 1, 280, Color("mediumpurple"), Color("white")),
-    Planet(Vec2(5_000, 9_000), 1, 380, Color("darkorange"), Color("white")),
-    Planet(Vec2(6_000, 400), 1, 350, Color("royalblue"), Color("white")),
-    Planet(Vec2(8_600, 8_700), 1, 880, Color("orange"), Color("white")),
-    Planet(Vec2(6_700, 7_200), 1, 380, Color("darkslategray"), Color("white")),
-    Planet(Vec2(9_200, 4_400), 1, 540, Color("yellow"), Color("white")),
-]
-
-planets_play: list[Planet] = [
-    Planet(Vec2(27_000, 29_000), 1, 700, Color("darkred"), Color("white")),
-    Planet(Vec2(21_000, 28_000), 1, 800, Color("khaki"), Color("white")),
-    Planet(Vec2(2_000, 27_000), 1, 900, Color("royalblue"), Color("white")),
-    Planet(Vec2(17_000, 26_000), 1, 900, Color("mediumpurple"), Color("white")),
-    Planet(Vec2(14_000, 23_000), 1, 900, Color("darkslategray"), Color("white")),
-    Planet(Vec2(17_000, 22_000), 1, 800, Color("darkgreen"), Color("white")),
-    Planet(Vec2(13_000, 21_000), 1, 400, Color("crimson"), Color("white")),
-    Planet(Vec2(10_000, 20_000), 1, 900, Color("hotpink"), Color("white")),
-    Planet(Vec2(18_000, 19_000), 1, 300, Color("coral"), Color("white")),
-    Planet(Vec2(16_000, 18_000), 1, 600, Color("gold"), Color("white")),
-    Planet(Vec2(13_000, 17_000), 1, 400, Color("blue"), Color("white")),
-    Planet(Vec2(8_000, 16_000), 1, 500, Color("turquoise"), Color("white")),
-    Planet(Vec2(24_000, 15_000), 1, 270, Color("green"), Color("white")),
-    Planet(Vec2(25_000, 14_000), 1, 300, Color("deeppink"), Color("white")),
-    Planet(Vec2(18_000, 12_000), 1, 900, Color("darkorange"), Color("white")),
-    Planet(Vec2(3_000, 5_000), 1, 100, Color("yellow"), Color("white")),
-    Planet(Vec2(22_000, 4_000), 1, 850, Color("lightblue"), Color("white")),
-    Planet(Vec2(14_500, 3_000), 1, 600, Color("plum"), Color("white")),
-    Planet(Vec2(28_000, 2_000), 1, 200, Color("slategray"), Color("white")),
-    Planet(Vec2(3_000, 1_000), 1, 700, Color("navy"), Color("white")),
-]
-
-player_ships_test: list[PlayerShip] = [
-    PlayerShip(
-        SPAWNPOINT + Vec2(-50, 0),
-        Vec2(0, 0),
-        1,
-        10,
-        Color("darkslategray"),
-        Color("orange"),
-        ShipInput(
-            pygame.K_RIGHT,
-            pygame.K_LEFT,
-            pygame.K_UP,
-            pygame.K_DOWN,
-            pygame.K_RETURN,
+# Networking, see server.py and client.py
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 50_505
+# Bytes of entities sent to a client per step, before compression, see interest.py.
+# Entities near its ship are sent first. None sends every entity, every step.
+INTEREST_BYTE_BUDGET: int | None = 4_096
+# Worldspace-distances beyond a client's camera-view, within which entities become
+# interesting, and beyond which they stop being interesting
+INTEREST_ENTER_MARGIN = 500
+INTEREST_EXIT_MARGIN = 1_000
+
+# Rendering
+# "gfxdraw" is anti-aliased, "draw" is aliased but faster,
+# "sdl2" draws with an SDL-renderer, using a GPU if there is one
+RENDER_BACKEND = "gfxdraw"
+# Resolution the world is drawn at, relative to the screen. Below 1, every camera
+# draws into a smaller offscreen surface which is upscaled, trading sharpness for
+# fill-rate. The HUD and minimap are always drawn at full resolution.
+RENDER_SCALE = 1.0
+# Render each player's viewport, and the minimap, on a thread of its own.
+# Pays off with several players on a multi-core machine, see benchmark.py
+PARALLEL_RENDERING = False
+# Record the world once per frame into a display list, and replay it to every camera.
+# Recording costs about as much as drawing, so this only pays off with several
+# cameras seeing many objects, e.g. zoomed far out
+RETAINED_RENDERING = False
+# Pre-render grid, areas and planets into tiles, instead of drawing them every frame.
+# Only pays off for static content far costlier to draw than this world's, as tiles
+# are rescaled whenever the camera zooms, see static_layer.py
+STATIC_TILE_CACHE = False
+STATIC_TILE_SIZE = 256
+STATIC_TILE_CACHE_MAX_TILES = 128
+# How often per second moving objects on the minimap are redrawn. 0 for every frame
+MINIMAP_REFRESH_RATE = 10
+# "dots" draws every object on the minimap, "heatmap" draws densities,
+# which stays cheap no matter how many objects there are
+MINIMAP_MODE = "dots"
+# Screenspace-sizes, in pixels, below which ships, bullets and bodies
+# are drawn as a simplified silhouette, and as a single dot
+LOD_THRESHOLDS = (6.0, 1.5)
+# Cameras whose zooms differ by less than an octave divided by this may share the
+# same recording with retained rendering, and with it the same levels of detail
+LOD_SHARING_STEPS = 8
+# Record frames into this directory for later review, None records nothing.
+# Frames are written on worker threads, and dropped if those fall behind.
+# Unavailable with the "sdl2" render backend, which draws the world on its renderer.
+CAPTURE_DIRECTORY: str | None = None
+CAPTURE_EVERY_NTH_FRAME = 1
+# "png" for PNG-files, "raw" for raw RGB-dumps, which are faster to write
+CAPTURE_FORMAT = "png"
+# Lower the rendering-quality step by step while rendering a frame takes longer
+# than the target, and raise it again once there's headroom, see governor.py
+QUALITY_GOVERNOR = True
+QUALITY_TARGET_FRAME_MS = 1_000 / 60
+
+# Images of the background's parallax-layers, from nearest to farthest
+BACKGROUNDS = ["assets/astral-0.png", "assets/astral-1.png", "assets/astral-1.png"]
+# Seed of the world, the same seed builds the same world. None picks one at random
+WORLD_SEED: int | None = None
+
+
+def build_universe(
+    seed: int,
+    backgrounds: list[str] = BACKGROUNDS,
+    player_count: int | None = None,
+) -> Universe:
+    """Build a fresh world. The same seed always builds, and simulates, the same.
+
+    Args:
+    ----
+        seed (int): Seed of all random numbers the world's simulation uses
+        backgrounds (list[str], optional): Paths to the parallax-layers' images,
+            which need a display-mode to be set. Defaults to BACKGROUNDS.
+        player_count (int | None, optional): Number of player-ships, more than
+            the mode's are spawned in rows behind them, all controlled like the
+            first. None for the mode's. Defaults to None.
+
+    Returns:
+    -------
+        Universe: The new world
+
+    """
+    # The world's own random numbers, used by the enemies' "AI" as well
+    rng = random.Random(seed)
+
+    planets_test: list[Planet] = [
+        Planet(Vec2(1_800, 6_700), 1, 370, Color("darkred"), Color("white")),
+        Planet(Vec2(2_300, 900), 1, 280, Color("green"), Color("white")),
+        Planet(Vec2(4_200, 3_700), 1, 280, Color("mediumpurple"), Color("white")),
+        Planet(Vec2(5_000, 9_000), 1, 380, Color("darkorange"), Color("white")),
+        Planet(Vec2(6_000, 400), 1, 350, Color("royalblue"), Color("white")),
+        Planet(Vec2(8_600, 8_700), 1, 880, Color("orange"), Color("white")),
+        Planet(Vec2(6_700, 7_200), 1, 380, Color("darkslategray"), Color("white")),
+        Planet(Vec2(9_200, 4_400), 1, 540, Color("yellow"), Color("white")),
+    ]
+
+    planets_play: list[Planet] = [
+        Planet(Vec2(27_000, 29_000), 1, 700, Color("darkred"), Color("white")),
+        Planet(Vec2(21_000, 28_000), 1, 800, Color("khaki"), Color("white")),
+        Planet(Vec2(2_000, 27_000), 1, 900, Color("royalblue"), Color("white")),
+        Planet(Vec2(17_000, 26_000), 1, 900, Color("mediumpurple"), Color("white")),
+        Planet(Vec2(14_000, 23_000), 1, 900, Color("darkslategray"), Color("white")),
+        Planet(Vec2(17_000, 22_000), 1, 800, Color("darkgreen"), Color("white")),
+        Planet(Vec2(13_000, 21_000), 1, 400, Color("crimson"), Color("white")),
+        Planet(Vec2(10_000, 20_000), 1, 900, Color("hotpink"), Color("white")),
+        Planet(Vec2(18_000, 19_000), 1, 300, Color("coral"), Color("white")),
+        Planet(Vec2(16_000, 18_000), 1, 600, Color("gold"), Color("white")),
+        Planet(Vec2(13_000, 17_000), 1, 400, Color("blue"), Color("white")),
+        Planet(Vec2(8_000, 16_000), 1, 500, Color("turquoise"), Color("white")),
+        Planet(Vec2(24_000, 15_000), 1, 270, Color("green"), Color("white")),
+        Planet(Vec2(25_000, 14_000), 1, 300, Color("deeppink"), Color("white")),
+        Planet(Vec2(18_000, 12_000), 1, 900, Color("darkorange"), Color("white")),
+        Planet(Vec2(3_000, 5_000), 1, 100, Color("yellow"), Color("white")),
+        Planet(Vec2(22_000, 4_000), 1, 850, Color("lightblue"), Color("white")),
+        Planet(Vec2(14_500, 3_000), 1, 600, Color("plum"), Color("white")),
+        Planet(Vec2(28_000, 2_000), 1, 200, Color("slategray"), Color("white")),
+        Planet(Vec2(3_000, 1_000), 1, 700, Color("navy"), Color("white")),
+    ]
+
+    player_ships_test: list[PlayerShip] = [
+        PlayerShip(
+            SPAWNPOINT + Vec2(-50, 0),
+            Vec2(0, 0),
+            1,
+            10,
+            Color("darkslategray"),
+            Color("orange"),
+            ShipInput(
+                pygame.K_RIGHT,
+                pygame.K_LEFT,
+                pygame.K_UP,
+                pygame.K_DOWN,
+                pygame.K_RETURN,
+            ),
         ),
-    ),
-]
-
-player_ships_play: list[PlayerShip] = [
-    PlayerShip(
-        SPAWNPOINT + Vec2(-50, 0),
-        Vec2(0, 0),
-        1,
-        10,
-        Color("darkslategray"),
-        Color("orange"),
-        ShipInput(
-            pygame.K_RIGHT,
-            pygame.K_LEFT,
-            pygame.K_UP,
-            pygame.K_DOWN,
-            pygame.K_RETURN,
+    ]
+
+    player_ships_play: list[PlayerShip] = [
+        PlayerShip(
+            SPAWNPOINT + Vec2(-50, 0),
+            Vec2(0, 0),
+            1,
+            10,
+            Color("darkslategray"),
+            Color("orange"),
+            ShipInput(
+                pygame.K_RIGHT,
+                pygame.K_LEFT,
+                pygame.K_UP,
+                pygame.K_DOWN,
+                pygame.K_RETURN,
+            ),
+        ),
+        PlayerShip(
+            SPAWNPOINT + Vec2(50, 0),
+            Vec2(0, 0),
+            1,
+            10,
+            Color("blue"),
+            Color("yellow"),
+            ShipInput(pygame.K_d, pygame.K_a, pygame.K_w, pygame.K_s, pygame.K_SPACE),
         ),
-    ),
-    PlayerShip(
-        SPAWNPOINT + Vec2(50, 0),
-        Vec2(0, 0),
-        1,
-        10,
-        Color("blue"),
-        Color("yellow"),
-        ShipInput(pygame.K_d, pygame.K_a, pygame.K_w, pygame.K_s, pygame.K_SPACE),
-    ),
-]
-
-
-if TEST_MODE:
-    planets: list[Planet] = planets_test
-    player_ships: list[PlayerShip] = player_ships_test
-    areas: list[Area] = []
-else:
-    planets = planets_play
-    player_ships = player_ships_play
-    areas: list[Area] = [
-        RefuelArea(pygame.Rect((10_000, 20_000), (500, 500))),
-        TrophyArea(pygame.Rect((20_000, 10_000), (500, 500))),
     ]
 
-asteroids: list[Asteroid] = []
-for _ in range(40):
-    pos = Vec2(random.uniform(0, WORLD_SIZE.x), random.uniform(0, WORLD_SIZE.y))
-    radius = random.uniform(10, 200)
-    asteroids.append(Asteroid(pos, Vec2(0, 0), 1, radius, Color("white")))
-
-enemy_ships: list[BulletEnemy] = []
-for _ in range(20):
-    pos = Vec2(random.uniform(0, WORLD_SIZE.x), random.uniform(0, WORLD_SIZE.y))
-    if random.random() > 0.5:
-        enemy_ships.append(BulletEnemy(pos, Vec2(0, 0), random.choice(player_ships)))
+    if TEST_MODE:
+        planets = planets_test
+        player_ships = player_ships_test
+        areas: list[Area] = []
     else:
-        enemy_ships.append(RocketEnemy(pos, Vec2(0, 0), random.choice(player_ships)))
+        planets = planets_play
+        player_ships = player_ships_play
+        areas = [
+            RefuelArea(pygame.Rect((10_000, 20_000), (500, 500))),
+            TrophyArea(pygame.Rect((20_000, 10_000), (500, 500))),
+        ]
+    if player_count is not None:
+        template = player_ships[0]
+        for ix in range(len(player_ships), player_count):
+            player_ships.append(
+                PlayerShip(
+                    SPAWNPOINT + Vec2(100 * (ix % 10) - 450, 100 * (ix // 10) + 100),
+                    Vec2(0, 0),
+                    1,
+                    10,
+                    template.color,
+                    template.bullet_color,
+                    template.spaceship_input,
+                ),
+            )
+        del player_ships[player_count:]
+
+    asteroids: list[Asteroid] = []
+    for _ in range(40):
+        pos = Vec2(rng.uniform(0, WORLD_SIZE.x), rng.uniform(0, WORLD_SIZE.y))
+        radius = rng.uniform(10, 200)
+        asteroids.append(Asteroid(pos, Vec2(0, 0), 1, radius, Color("white")))
+
+    enemy_ships: list[BulletEnemy] = []
+    for _ in range(20):
+        pos = Vec2(rng.uniform(0, WORLD_SIZE.x), rng.uniform(0, WORLD_SIZE.y))
+        target_ship = rng.choice(player_ships)
+        if rng.random() > 0.5:
+            enemy_ships.append(BulletEnemy(pos, Vec2(0, 0), target_ship, rng=rng))
+        else:
+            enemy_ships.append(RocketEnemy(pos, Vec2(0, 0), target_ship, rng=rng))
+
+    return Universe(
+        WORLD_SIZE, planets, asteroids, player_ships, areas, enemy_ships, backgrounds,
+    )
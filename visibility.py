@@ -0,0 +1,69 @@
+"""Per-frame visibility, shared between all cameras looking at a universe."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from pygame import Rect
+
+if TYPE_CHECKING:
+    from camera import Camera
+    from universe import Universe
+
+
+class FrameVisibility:
+    """Which objects each camera can see during a single frame.
+
+    Computing this walks the universe's spatial index once for all
+    cameras together, and transforms every visible object's bounding
+    rectangle to screenspace once per camera that sees it.
+    """
+
+    def __init__(self) -> None:
+        """Create an empty visibility-pass, call `compute` to fill it."""
+        self.union: list[Any] = []
+        self.culled_count: int = 0
+
+    def compute(self, universe: Universe, cameras: list[Camera]) -> None:
+        """Determine what `cameras` see of `universe` and hand it to them.
+
+        Cameras must not be moved afterwards during the same frame,
+        moving a camera discards its visibility-information.
+
+        Args:
+        ----
+            universe (Universe): Universe to look at
+            cameras (list[Camera]): Cameras looking at `universe`
+
+        """
+        index = universe.get_spatial_index()
+        world_rects = [camera.get_world_rect() for camera in cameras]
+
+        union_ixs: set[int] = set()
+        for world_rect in world_rects:
+            union_ixs |= index.query_indices(world_rect)
+
+        per_camera: list[tuple[list[Any], dict[int, Rect]]] = [
+            ([], {}) for _ in cameras
+        ]
+        self.union = []
+        for ix in sorted(union_ixs):
+            obj, bounds = index.get_entry(ix)
+            self.union.append(obj)
+            for camera, world_rect, (visible, screen_bounds) in zip(
+                cameras, world_rects, per_camera,
+            ):
+                if not world_rect.colliderect(bounds):
+                    continue
+                zoom = camera.zoom
+                visible.append(obj)
+                screen_bounds[id(obj)] = Rect(
+                    (bounds.x - camera.pos.x) * zoom,
+                    (bounds.y - camera.pos.y) * zoom,
+                    bounds.width * zoom + 1,
+                    bounds.height * zoom + 1,
+                )
+
+        self.culled_count = len(index) - len(self.union)
+        for camera, (visible, screen_bounds) in zip(cameras, per_camera):
+            camera.set_visibility(visible, screen_bounds)